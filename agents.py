@@ -0,0 +1,207 @@
+import sys
+
+from meld_engine import FULL_DECK
+from player import Bot
+from rules import DISCARD, DRAW_DECK, DRAW_PILE, GIN, KNOCK
+
+# Agents and observers for the rules.py state machine
+#
+# An agent picks the moves of one seat. It is asked for an action twice a
+# turn with the RoundState: choose_draw(state) returns a draw action and
+# choose_discard(state) a discard, knock or gin action. The seat to move is
+# state.to_move.
+#
+# Observers are told what happens, with seats rather than players:
+# on_deal(state), on_draw(seat, card, from_pile), on_discard(seat, card),
+# on_reshuffle(cards) and on_round_end(state), where state.outcome is None
+# for a round abandoned at the turn limit. With no observers the driver
+# makes no calls at all.
+#
+# BotAgent wraps player.Bot or a subclass and ConsoleAgent is the console player;
+# ConsoleObserver prints a round for the console player to follow.
+
+DEFAULT_MAX_TURNS = 500  # A round with no knock after this many turns is abandoned without score
+
+_BOT_ACTIONS = {'discard': DISCARD, 'knock': KNOCK, 'gin': GIN}
+
+
+# Adapter that lets a player.Bot, or a bot built on it, play a seat
+#
+# A bot reads the discard pile and the deck through its game. A bot passed in
+# keeps its own game, which must share the round's pile and deck (as
+# GinRummy.play does); a bot the adapter builds with factory(None, rng) is
+# pointed at each RoundState it plays, which has both.
+class BotAgent:
+    def __init__(self, bot=None, rng=None, factory=Bot):
+        self.owns_bot = bot is None
+        self.bot = bot or factory(None, rng)
+
+    def _take_seat(self, state):
+        bot = self.bot
+        if self.owns_bot:
+            bot.gin_rummy = state
+        bot.hand = state.hands[state.to_move]
+        return bot
+
+    # Draw from the source the bot picks (see Bot.choose_draw_source)
+    def choose_draw(self, state):
+        bot = self._take_seat(state)
+        bot.update_deadwood_sum()
+        if state.discard_pile and bot.choose_draw_source(state.discard_pile, state.deck) == 'pile':
+            return DRAW_PILE, state.discard_pile[-1]
+        return DRAW_DECK, None
+
+    # The bot's discard; a knock or gin the rules refuse is played as a plain discard
+    def choose_discard(self, state):
+        bot = self._take_seat(state)
+        action, card = bot.choose_card_to_discard()
+        kind = _BOT_ACTIONS[action]
+        if kind != DISCARD and not state.is_legal((kind, card)):
+            kind = DISCARD
+        return kind, card
+
+
+# Adapter for a human at the console, with the player assist
+class ConsoleAgent:
+    # read() returns a line of input and write(*values) shows one; input and print by default
+    def __init__(self, read=None, write=None):
+        self.read = read or input
+        self.write = write or print
+
+    # Show the hand's melds and deadwood; the text is only rebuilt after the hand changes
+    def _show_assist(self, hand):
+        self.write(hand.analysis.assist_text)
+
+    # Show what each draw would leave: the top discard, the mean over a deck draw and the unseen cards that help
+    def _show_outs(self, hand, discard_pile):
+        outs = hand.analysis.outs
+        seen = hand.mask
+        for card in discard_pile:
+            seen |= card.bit
+        unseen = FULL_DECK & ~seen
+        if discard_pile:
+            self.write(f'\nTaking {discard_pile[-1]} leaves deadwood {outs.value(discard_pile[-1])}; '
+                       f'a deck draw leaves {outs.expected(unseen):.1f} on average')
+        self.write(f"Outs: {', '.join(f'{card} ({value})' for card, value in outs.outs(unseen)) or 'none'}")
+
+    def _find_card(self, hand, name):
+        for card in hand.cards:
+            if f'{card.rank}{card.suit}' == name:
+                return card
+        return None
+
+    # Prompt for a draw until the player makes a valid one
+    def choose_draw(self, state):
+        hand = state.hands[state.to_move]
+        while True:
+            self.write(f'\nYour hand: {hand}')
+            self._show_assist(hand)
+            self._show_outs(hand, state.discard_pile)
+            self.write(f'\nDiscard pile: {state.discard_pile}')
+            self.write("\n---Draw a card---")
+            self.write("\nEnter 'p' to pick from the discard pile, 'd' to draw from the deck: ")
+            choice = self.read().strip().lower()
+            sys.stdin.flush()
+
+            if choice == 'p':
+                if not state.discard_pile:
+                    self.write("\nDiscard pile is empty! Try picking from the deck('d').")
+                    continue
+                return DRAW_PILE, state.discard_pile[-1]
+            if choice == 'd':
+                if not state.deck.cards:
+                    self.write("\nDeck is empty! Reshuffling discarded pile into the deck.")
+                return DRAW_DECK, None
+            self.write("\nInvalid input! Please try again.")
+
+    # Prompt for a discard, knock or gin until the player makes a valid one
+    def choose_discard(self, state):
+        hand = state.hands[state.to_move]
+        self.write(f'\nYour hand after drawing: {hand}')
+        self._show_assist(hand)
+        while True:
+            self.write("\n---Discard a card---")
+            self.write("\nEnter the card to discard (e.g., 'QH' for Queen of Hearts), 'k' to knock, 'g' to gin: ")
+            choice = self.read().strip().upper()
+
+            if choice in ('K', 'G'):
+                self.write(f"\nChoose a card to discard before {'knocking' if choice == 'K' else 'declaring gin'} "
+                           "(e.g., 'QH' for Queen of Hearts):")
+                card = self._find_card(hand, self.read().strip().upper())
+                if card is None:
+                    self.write("\nInvalid card. Please enter a valid card from your hand.")
+                    continue
+                action = (KNOCK if choice == 'K' else GIN, card)
+                if state.is_legal(action):
+                    self.write("\nYou made a valid knock!" if choice == 'K' else "\nYou have Gin!")
+                    return action
+                self.write("\nInvalid action! Not a valid knock or gin.")
+                continue
+
+            card = self._find_card(hand, choice)
+            if card is not None:
+                return DISCARD, card
+            self.write("\nInvalid card. Please enter a valid card from your hand.")
+
+
+# Prints the bot's moves and the end of each round for the console player
+class ConsoleObserver:
+    def __init__(self, player_seat=0, write=None):
+        self.player_seat = player_seat
+        self.write = write or print
+
+    def on_deal(self, state):
+        pass
+
+    def on_draw(self, seat, card, from_pile):
+        pass
+
+    def on_discard(self, seat, card):
+        if seat == self.player_seat:
+            return
+        self.write(f'\nBot discarded: {card}')
+        self.write("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
+
+    def on_reshuffle(self, cards):
+        pass
+
+    def on_round_end(self, state):
+        outcome = state.outcome
+        if outcome is None:
+            return
+        if outcome.knocker != self.player_seat:
+            self.write("\nBot has Gin!" if outcome.kind == 'gin' else "\nBot made a valid knock!")
+        self.write("\nGame ended!")
+        self.write(f"Bot's hand: {state.hands[1 - self.player_seat]}")
+        self.write(f"Layoff cards: {outcome.layoff_cards}")
+        self.write(f"Knocker Deadwood: {outcome.knocker_deadwood}, Opponent Deadwood: {outcome.opponent_deadwood}")
+
+
+# Deal and play one round to the end or the turn limit; returns its RoundOutcome, or None if abandoned
+def play_round(state, agents, observers=(), max_turns=DEFAULT_MAX_TURNS):
+    state.deal()
+    for observer in observers:
+        observer.on_deal(state)
+
+    while state.outcome is None and state.turns < max_turns:
+        seat = state.to_move
+        agent = agents[seat]
+
+        action = agent.choose_draw(state)
+        if observers:
+            reshuffled = list(state.discard_pile) if action[0] == DRAW_DECK and not state.deck.cards else None
+            card = state.apply(action)
+            for observer in observers:
+                if reshuffled is not None:
+                    observer.on_reshuffle(reshuffled)
+                observer.on_draw(seat, card, action[0] == DRAW_PILE)
+        else:
+            state.apply(action)
+
+        card = state.apply(agent.choose_discard(state))
+        for observer in observers:
+            observer.on_discard(seat, card)
+
+    for observer in observers:
+        observer.on_round_end(state)
+    return state.outcome
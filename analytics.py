@@ -0,0 +1,269 @@
+import argparse
+import multiprocessing
+import os
+import time
+
+from card import CARDS
+from game_log import (DEAD, DISCARD, DRAW, GIN, HEADER, KNOCK, RECORD, SCORE, GameLogReader, GameRecorder,
+                      decode)
+from player import Bot
+from rules import KNOCK_LIMIT
+from simulation import HeadlessGinRummy
+
+# Streaming analytics over game records
+#
+# Records flow through generators in chunks, so memory use is bounded by the
+# chunk size whatever the volume of games:
+#
+#     log_chunks(path)            chunks of a game log (see game_log.py), read
+#                                 through mmap or plain buffered reads
+#     headless_chunks(matches)    chunks of freshly played headless matches
+#
+# and are folded into a GameStats, an incremental aggregator of integer
+# totals. Round outcomes come from the knock, gin and score records, which
+# hold exactly what GinRummy.handle_end_game scored. GameStats objects merge
+# like tournament.TournamentStats, so analyze_logs can split logs into shards
+# at match boundaries, aggregate the shards in a process pool and merge them
+# in shard order with the same totals for any worker count.
+#
+# Summarize a log from the repository root with:
+#     python analytics.py games.log --workers 8
+
+DEFAULT_CHUNK_RECORDS = 1 << 16
+DEFAULT_SHARD_RECORDS = 1 << 20
+
+
+# Integer totals over a stream of game records, mergeable in any grouping
+class GameStats:
+    def __init__(self):
+        self.rounds = 0
+        self.dead_rounds = 0
+        self.turns = 0  # Discards over all rounds
+        self.gins = 0
+        self.knocks = 0  # Knocks that scored for the knocker
+        self.undercuts = 0
+        self.points = 0  # Points awarded over all scored rounds
+        self.knock_deadwood = [0] * (KNOCK_LIMIT + 1)  # Knocks (won or undercut) by knocker deadwood
+        self.picks = [0] * 52  # Discard-pile picks per card
+        self.pick_wins = [0] * 52  # Picks made in rounds the picker went on to win
+        self.pick_points = [0] * 52  # Round points won (or, negative, lost) by the picker
+        self._round = None  # (match, round) being read
+        self._round_picks = []  # (seat, card) picks of that round
+        self._knocker = None  # Seat that knocked (not declared gin) in that round
+        self._outcome = None  # (winner seat, points) once the round is scored
+
+    # Fold a chunk of (match, round, kind, seat, card, extra) records into the totals
+    def add_records(self, records):
+        for record in records:
+            key = record[:2]
+            if key != self._round:
+                self.finish_round()
+                self._round = key
+            kind = record[2]
+            if kind == DISCARD:
+                self.turns += 1
+            elif kind == DRAW:
+                if record[5]:
+                    self._round_picks.append((record[3], record[4]))
+            elif kind == KNOCK:
+                self.knock_deadwood[record[4]] += 1
+                self._knocker = record[3]
+            elif kind == GIN:
+                self.gins += 1
+            elif kind == SCORE:
+                self._outcome = record[3], record[5]
+                self.points += record[5]
+                if self._knocker is not None:
+                    if record[3] == self._knocker:
+                        self.knocks += 1
+                    else:
+                        self.undercuts += 1
+            elif kind == DEAD:
+                self.dead_rounds += 1
+        return self
+
+    # Close the round being read; called at the end of a stream or shard
+    def finish_round(self):
+        if self._round is None:
+            return
+        self.rounds += 1
+        if self._outcome is not None:
+            winner, points = self._outcome
+            for seat, card in self._round_picks:
+                self.picks[card] += 1
+                if seat == winner:
+                    self.pick_wins[card] += 1
+                    self.pick_points[card] += points
+                else:
+                    self.pick_points[card] -= points
+        else:
+            for seat, card in self._round_picks:
+                self.picks[card] += 1
+        self._round = None
+        self._round_picks = []
+        self._outcome = None
+        self._knocker = None
+
+    # Fold every chunk of a stream into the totals and close its last round
+    def consume(self, chunks):
+        for chunk in chunks:
+            self.add_records(chunk)
+        self.finish_round()
+        return self
+
+    # Merge another group's totals into these; both must have finished their rounds
+    def merge(self, other):
+        for name, value in vars(other).items():
+            if name.startswith('_'):
+                continue
+            if isinstance(value, list):
+                mine = getattr(self, name)
+                for index, count in enumerate(value):
+                    mine[index] += count
+            else:
+                setattr(self, name, getattr(self, name) + value)
+
+    # Rates, averages and per-card pick values
+    def summary(self):
+        scored = self.rounds - self.dead_rounds
+        knocked = self.knocks + self.undercuts
+        pick_values = {
+            repr(CARDS[card]): {
+                'picks': self.picks[card],
+                'win_rate': self.pick_wins[card] / self.picks[card],
+                'points_per_pick': self.pick_points[card] / self.picks[card],
+            }
+            for card in range(52) if self.picks[card]
+        }
+        return {
+            'rounds': self.rounds,
+            'dead_rounds': self.dead_rounds,
+            'average_turns': self.turns / self.rounds if self.rounds else 0.0,
+            'gin_rate': self.gins / scored if scored else 0.0,
+            'knock_rate': knocked / scored if scored else 0.0,
+            'undercut_rate': self.undercuts / knocked if knocked else 0.0,
+            'points_per_round': self.points / scored if scored else 0.0,
+            'knock_deadwood': {deadwood: count / knocked if knocked else 0.0
+                               for deadwood, count in enumerate(self.knock_deadwood)},
+            'pick_values': pick_values,
+        }
+
+
+# Stream the records in [start, stop) of a log in chunks; use_mmap=False reads the file with plain reads
+def log_chunks(path, start=0, stop=None, chunk_records=DEFAULT_CHUNK_RECORDS, use_mmap=True):
+    if use_mmap:
+        reader = GameLogReader(path)
+        try:
+            stop = reader.count if stop is None else stop
+            for offset in range(start, stop, chunk_records):
+                yield list(decode(reader.read(offset, min(offset + chunk_records, stop))))
+        finally:
+            reader.close()
+        return
+
+    with open(path, 'rb') as log_file:
+        log_file.seek(HEADER.size + start * RECORD.size)
+        remaining = None if stop is None else stop - start
+        while remaining is None or remaining > 0:
+            count = chunk_records if remaining is None else min(chunk_records, remaining)
+            data = log_file.read(count * RECORD.size)
+            data = data[:len(data) - len(data) % RECORD.size]
+            if not data:
+                break
+            if remaining is not None:
+                remaining -= len(data) // RECORD.size
+            yield list(decode(data))
+
+
+# Play seeded headless matches and stream their records, one chunk per match
+def headless_chunks(matches, seed=0, agents=(Bot, Bot)):
+    game = HeadlessGinRummy(None, agents)
+    recorder = GameRecorder()
+    game.add_listener(recorder)
+    for index in range(matches):
+        game.reset(seed + index)
+        recorder.start_match(index)
+        game.play_match()
+        yield list(decode(recorder.take()))
+
+
+# Split a log into (path, start, stop) shards of about shard_records records, cut at match boundaries
+def log_shards(path, shard_records=DEFAULT_SHARD_RECORDS):
+    reader = GameLogReader(path)
+    try:
+        bounds = [0]
+        for index in range(shard_records, reader.count, shard_records):
+            bound = reader.find(reader.record(index)[0])
+            if bound > bounds[-1]:
+                bounds.append(bound)
+        bounds.append(reader.count)
+    finally:
+        reader.close()
+    return [(path, start, stop) for start, stop in zip(bounds, bounds[1:]) if stop > start]
+
+
+# Pool task: aggregate one shard
+def _analyze_shard(task):
+    path, start, stop, use_mmap = task
+    return GameStats().consume(log_chunks(path, start, stop, use_mmap=use_mmap))
+
+
+# Aggregate one or more logs, fanning their shards out over a process pool
+def analyze_logs(paths, workers=None, shard_records=DEFAULT_SHARD_RECORDS, use_mmap=True):
+    workers = workers or os.cpu_count() or 1
+    tasks = [shard + (use_mmap,) for path in paths for shard in log_shards(path, shard_records)]
+    stats = GameStats()
+    if workers == 1 or len(tasks) < 2:
+        for task in tasks:
+            stats.merge(_analyze_shard(task))
+        return stats
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    with context.Pool(min(workers, len(tasks))) as pool:
+        for shard_stats in pool.imap(_analyze_shard, tasks):
+            stats.merge(shard_stats)
+    return stats
+
+
+# Print a summary, with the most and least valuable discard-pile picks
+def print_summary(summary, top=5):
+    print(f"{summary['rounds']:,} rounds ({summary['dead_rounds']:,} dead), "
+          f"{summary['average_turns']:.1f} turns per round")
+    print(f"gin rate {summary['gin_rate']:.3f}, knock rate {summary['knock_rate']:.3f}, "
+          f"undercut rate {summary['undercut_rate']:.3f}, {summary['points_per_round']:.1f} points per scored round")
+    print('knock deadwood: ' + ', '.join(f'{deadwood}: {share:.3f}'
+                                          for deadwood, share in summary['knock_deadwood'].items()))
+
+    picks = sorted(summary['pick_values'].items(), key=lambda item: item[1]['points_per_pick'], reverse=True)
+    for title, cards in (('best', picks[:top]), ('worst', picks[::-1][:top])):
+        print(f'{title} discard-pile picks: ' + ', '.join(
+            f"{card} {value['points_per_pick']:+.1f} ({value['picks']})" for card, value in cards))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate statistics over game logs or headless matches.')
+    parser.add_argument('logs', nargs='*', help='game logs written by tournament.py --log')
+    parser.add_argument('--headless', type=int, metavar='MATCHES', help='play this many matches instead of reading logs')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first headless match')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--shard-records', type=int, default=DEFAULT_SHARD_RECORDS, help='records per pool task')
+    parser.add_argument('--no-mmap', action='store_true', help='read logs with plain reads instead of mmap')
+    args = parser.parse_args()
+    if not args.logs and not args.headless:
+        parser.error('give one or more logs or --headless MATCHES')
+
+    start = time.perf_counter()
+    if args.headless:
+        stats = GameStats().consume(headless_chunks(args.headless, args.seed))
+    else:
+        stats = analyze_logs(args.logs, args.workers, args.shard_records, not args.no_mmap)
+    elapsed = time.perf_counter() - start
+
+    print_summary(stats.summary())
+    if elapsed:
+        print(f'{stats.rounds / elapsed:,.0f} rounds/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+import itertools
+
+import numpy as np
+
+from meld_engine import SUIT_BITS, SUIT_FIELD, _SUIT_DEADWOOD, _SUIT_RUNS
+
+# NumPy batch evaluator
+#
+# Scores many hands at once with the same per-suit run tables as the scalar
+# engine in meld_engine.py. Hands are given either as an (N, 52) boolean
+# array in card-index order or as N packed uint64 masks. Every hand is solved
+# in its suit-canonical form (see meld_engine.canonicalize) and mapped back,
+# so results agree exactly with the scalar path: the same minimum deadwood
+# and melded cards as deadwood_cache.evaluate_uncached, and the same melds,
+# in the same order, as meld_engine.solve_canonical, including how ties
+# between set choices are broken. With dedupe=True each distinct canonical
+# hand in a batch is solved only once.
+
+# Runs-only deadwood and melded cards for every 13-bit suit field
+SUIT_DEADWOOD = np.array(_SUIT_DEADWOOD, dtype=np.int16)
+SUIT_MELDED = np.array([sum(runs) for runs in _SUIT_RUNS], dtype=np.int64)
+
+# The runs chosen for every 13-bit suit field, in meld_engine's order and padded with zeros
+_MAX_SUIT_RUNS = max(len(runs) for runs in _SUIT_RUNS)
+SUIT_RUNS = np.array([runs + (0,) * (_MAX_SUIT_RUNS - len(runs)) for runs in _SUIT_RUNS], dtype=np.int64)
+SUIT_RUN_COUNTS = np.array([len(runs) for runs in _SUIT_RUNS], dtype=np.int64)
+
+_SUIT_SHIFTS = np.arange(4, dtype=np.uint64) * np.uint64(SUIT_BITS)
+_CARD_SHIFTS = np.arange(52, dtype=np.uint64)
+_FIELD_WEIGHTS = (1 << np.arange(SUIT_BITS, dtype=np.int64))
+
+# Set choice codes per rank, in the order meld_engine.solve tries them:
+# no set, the four three-card sets of a full rank, then every card of the rank
+_NO_SET = 0
+_FULL_SET = 5
+_THREE_OF_FOUR = (1, 2, 3, 4)
+
+
+# Pack an (N, 52) boolean array into N uint64 hand masks
+def pack_hands(hands):
+    hands = np.asarray(hands, dtype=bool)
+    return (hands.astype(np.uint64) << _CARD_SHIFTS).sum(axis=1, dtype=np.uint64)
+
+
+# Unpack N uint64 hand masks into an (N, 52) boolean array
+def unpack_hands(masks):
+    masks = np.asarray(masks, dtype=np.uint64)
+    return (masks[:, None] >> _CARD_SHIFTS & np.uint64(1)).astype(bool)
+
+
+# Split hands into an (N, 4) array of 13-bit suit fields
+def suit_fields(hands):
+    hands = np.asarray(hands)
+    if hands.ndim == 2:
+        return hands.reshape(len(hands), 4, SUIT_BITS).astype(np.int64) @ _FIELD_WEIGHTS
+    masks = hands.astype(np.uint64)
+    return (masks[:, None] >> _SUIT_SHIFTS & np.uint64(SUIT_FIELD)).astype(np.int64)
+
+
+# Get the ranks held in at least three suits as a 13-bit field per hand
+def set_ranks(fields):
+    h, d, c, s = fields.T
+    return (h & d & (c | s)) | (c & s & (h | d))
+
+
+# Combine (N, 4) suit fields back into uint64 masks
+def _join_fields(fields):
+    return (fields.astype(np.uint64) << _SUIT_SHIFTS).sum(axis=1, dtype=np.uint64)
+
+
+# Sort each hand's suit fields into canonical order; returns (canonical fields, order)
+# where order[n, i] is the real suit placed at canonical suit i, as in meld_engine.canonicalize
+def canonicalize_fields(fields):
+    order = np.argsort(-fields, axis=1, kind='stable')
+    return np.take_along_axis(fields, order, axis=1), order
+
+
+# Map (N, 4) fields in canonical suits back to the real suits as uint64 masks,
+# given the shift of the real suit placed at each canonical suit
+def _restore_fields(fields, shifts):
+    return np.bitwise_or.reduce(fields.astype(np.uint64) << shifts, axis=1)
+
+
+# Get the minimum deadwood, melded-card mask and melds of every hand
+#
+# Returns (deadwood, melded, melds). melds is an (N, K) uint64 array: row n
+# holds hand n's meld masks in the order meld_engine.solve_canonical gives
+# them, followed by zeros, and K is the largest meld count in the batch.
+def evaluate_batch(hands, dedupe=False):
+    fields, order = canonicalize_fields(suit_fields(hands))
+    if dedupe:
+        # Solve each distinct canonical hand once and fan the results back out
+        unique, inverse = np.unique(_join_fields(fields), return_inverse=True)
+        deadwood, rest, sets = _evaluate_fields(suit_fields(unique))
+        deadwood, rest, sets = deadwood[inverse], rest[inverse], sets[inverse]
+    else:
+        deadwood, rest, sets = _evaluate_fields(fields)
+
+    shifts = order.astype(np.uint64) * np.uint64(SUIT_BITS)
+    melded = SUIT_MELDED[rest] | (fields & ~rest)
+    return deadwood, _restore_fields(melded, shifts), _meld_masks(rest, sets, shifts)
+
+
+# Lay out every hand's melds in real suits and in meld_engine.solve's order:
+# the runs of each canonical suit, then the sets by ascending rank
+def _meld_masks(rest, sets, shifts):
+    run_counts = SUIT_RUN_COUNTS[rest]
+    counts = run_counts.sum(axis=1) + (sets != 0).sum(axis=1)
+    melds = np.zeros((len(rest), counts.max(initial=0)), dtype=np.uint64)
+    filled = np.zeros(len(rest), dtype=np.int64)
+    for suit in range(4):
+        for slot in range(_MAX_SUIT_RUNS):
+            rows = np.flatnonzero(run_counts[:, suit] > slot)
+            if not len(rows):
+                break
+            # A run stays in one suit, so it only needs that suit's shift
+            melds[rows, filled[rows]] = SUIT_RUNS[rest[rows, suit], slot].astype(np.uint64) << shifts[rows, suit]
+            filled[rows] += 1
+    for slot in range(sets.shape[1]):
+        rows = np.flatnonzero(sets[:, slot])
+        melds[rows, filled[rows]] = _restore_fields(suit_fields(sets[rows, slot]), shifts[rows])
+        filled[rows] += 1
+    return melds
+
+
+# Solve (N, 4) canonical suit fields; returns deadwood, the (N, 4) fields
+# left to the runs and an (N, S) array of the set chosen per set rank
+def _evaluate_fields(fields):
+    deadwood = SUIT_DEADWOOD[fields].sum(axis=1, dtype=np.int16)
+    rest = fields.copy()
+    sets = np.zeros((len(fields), 0), dtype=np.uint64)
+
+    ranks = set_ranks(fields)
+    pending = np.flatnonzero(ranks)
+    if len(pending):
+        rank_counts = np.zeros(len(pending), dtype=np.int64)
+        for rank in range(SUIT_BITS):
+            rank_counts += ranks[pending] >> rank & 1
+        quads = np.bitwise_and.reduce(fields[pending], axis=1) & ranks[pending] != 0
+        sets = np.zeros((len(fields), rank_counts.max()), dtype=np.uint64)
+
+        # Hands with the same number of set ranks, with or without a full
+        # rank, share one enumeration of set choices
+        for count in np.unique(rank_counts):
+            for has_quad in (False, True):
+                group = pending[(rank_counts == count) & (quads == has_quad)]
+                if len(group):
+                    group_deadwood, group_rest, group_sets = _solve_sets(fields[group], ranks[group], int(count),
+                                                                         has_quad)
+                    deadwood[group] = group_deadwood
+                    rest[group] = group_rest
+                    sets[group, :count] = group_sets
+
+    return deadwood, rest, sets
+
+
+# Enumerate the set choices for a group of hands holding `count` set ranks;
+# returns deadwood, the fields left to the runs and the set chosen per rank slot
+def _solve_sets(fields, ranks, count, has_quad):
+    size = len(fields)
+
+    # The set ranks of each hand in ascending order, one column per slot
+    slot_ranks = np.zeros((size, count), dtype=np.int64)
+    remaining = ranks.copy()
+    for slot in range(count):
+        low = remaining & -remaining
+        slot_ranks[:, slot] = np.log2(low).astype(np.int64)
+        remaining ^= low
+
+    rank_bits = np.int64(1) << slot_ranks
+    present = (fields[:, None, :] >> slot_ranks[:, :, None]) & 1  # (size, count, 4)
+    full = present.all(axis=2)
+
+    best = np.full(size, np.iinfo(np.int16).max, dtype=np.int16)
+    best_rest = fields.copy()
+    best_codes = np.zeros((size, count), dtype=np.int64)
+
+    codes = (_NO_SET,) + (_THREE_OF_FOUR if has_quad else ()) + (_FULL_SET,)
+    for combo in itertools.product(codes, repeat=count):
+        used = np.zeros_like(fields)
+        valid = np.ones(size, dtype=bool)
+        for slot, code in enumerate(combo):
+            if code == _NO_SET:
+                continue
+            taken = present[:, slot, :] * rank_bits[:, slot, None]
+            if code != _FULL_SET:
+                # Three of a full rank: leave the card of one suit to the runs
+                valid &= full[:, slot]
+                taken[:, code - 1] = 0
+            used |= taken
+
+        rest = fields & ~used
+        value = SUIT_DEADWOOD[rest].sum(axis=1, dtype=np.int16)
+        better = valid & (value < best)
+        best = np.where(better, value, best)
+        best_rest[better] = rest[better]
+        best_codes[better] = combo
+
+    # Rebuild the winning sets from their codes
+    sets = np.zeros((size, count), dtype=np.uint64)
+    for slot in range(count):
+        taken = present[:, slot, :] * rank_bits[:, slot, None]
+        codes = best_codes[:, slot]
+        three = np.flatnonzero((codes != _NO_SET) & (codes != _FULL_SET))
+        taken[three, codes[three] - 1] = 0
+        taken[codes == _NO_SET] = 0
+        sets[:, slot] = _join_fields(taken)
+    return best, best_rest, sets
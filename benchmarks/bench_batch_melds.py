@@ -0,0 +1,57 @@
+import argparse
+import time
+
+import numpy as np
+
+from batch_melds import evaluate_batch
+from deadwood_cache import evaluate_uncached
+from meld_engine import solve_canonical
+
+# Benchmark the NumPy batch evaluator against the scalar engine.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_batch_melds --max-size 1000000
+
+
+# Deal N random hands of the given size as packed uint64 masks
+def random_masks(count, size, seed):
+    rng = np.random.default_rng(seed)
+    keys = rng.random((count, 52))
+    cards = np.argpartition(keys, size, axis=1)[:, :size].astype(np.uint64)
+    return (np.uint64(1) << cards).sum(axis=1, dtype=np.uint64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the batch meld evaluator.')
+    parser.add_argument('--max-size', type=int, default=1000000, help='largest batch to time')
+    parser.add_argument('--hand-size', type=int, default=11)
+    parser.add_argument('--scalar-limit', type=int, default=10000, help='largest batch also timed on the scalar path')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    size = 1000
+    while size <= args.max_size:
+        masks = random_masks(size, args.hand_size, args.seed)
+
+        start = time.perf_counter()
+        deadwood, melded, melds = evaluate_batch(masks)
+        batch_rate = size / (time.perf_counter() - start)
+        line = f'N={size:>9,}: batch {batch_rate:12,.0f} hands/s'
+
+        if size <= args.scalar_limit:
+            hands = masks.tolist()
+            start = time.perf_counter()
+            expected = [(evaluate_uncached(mask), solve_canonical(mask)[1]) for mask in hands]
+            scalar_rate = size / (time.perf_counter() - start)
+            batch = [((dead, mask), tuple(meld for meld in row if meld))
+                     for dead, mask, row in zip(deadwood.tolist(), melded.tolist(), melds.tolist())]
+            if batch != expected:
+                raise SystemExit(f'batch results differ from the scalar engine at N={size}')
+            line += f', scalar {scalar_rate:12,.0f} hands/s, results identical'
+
+        print(line)
+        size *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+
+from deck import Deck, SeededDeck
+from hand import Hand
+from benchmarks import legacy_cards
+
+# Benchmark the interned, bitset-backed card model against the old classes.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_cards
+
+
+# Peak bytes allocated while building the given number of decks
+def deck_memory(deck_class, decks):
+    tracemalloc.start()
+    kept = [deck_class() for _ in range(decks)]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return peak
+
+
+# Best wall time of a few passes of a function
+def best_time(function, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# Deal the given number of rounds by building, shuffling and popping a new deck for each
+def fresh_deals(deals, seed):
+    rng = random.Random(seed)
+
+    def run():
+        for _ in range(deals):
+            deck = Deck(rng)
+            deck.shuffle()
+            for _ in range(20):
+                deck.deal_card()
+    return run
+
+
+# Deal the given number of rounds from one SeededDeck, reset in place
+def seeded_deals(deals, seed):
+    deck = SeededDeck(seed)
+
+    def run():
+        for _ in range(deals):
+            deck.reset()
+            deck.deal_hands()
+    return run
+
+
+# Deal a hand, then repeatedly draw, check membership, sort and discard, like a turn does
+def play_turns(deck_class, hand_class, turns, seed):
+    rng = random.Random(seed)
+    deck = deck_class()
+    rng.shuffle(deck.cards)
+    hand = hand_class()
+    for card in deck.cards[:10]:
+        hand.add_card(card)
+    pool = deck.cards[10:]
+
+    held = deck.cards[0]
+
+    def run():
+        for i in range(turns):
+            drawn = pool[i % len(pool)]
+            hand.add_card(drawn)
+            hand.sort()
+            discard = drawn if i % 2 else held
+            _ = discard in hand
+            hand.discard_card(discard)
+            if discard is not drawn:
+                hand.add_card(discard)
+                hand.discard_card(drawn)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the card model.')
+    parser.add_argument('--decks', type=int, default=10000)
+    parser.add_argument('--turns', type=int, default=100000)
+    args = parser.parse_args()
+
+    legacy_card = legacy_cards.Card('Q', 'H')
+    card = Deck().cards[0]
+    print(f'size of one card: legacy {sys.getsizeof(legacy_card) + sys.getsizeof(vars(legacy_card))} bytes '
+          f'(object + attribute dict), new {sys.getsizeof(card)} bytes (slots, shared by every deck)')
+
+    legacy_memory = deck_memory(legacy_cards.Deck, args.decks)
+    new_memory = deck_memory(Deck, args.decks)
+    print(f'{args.decks} decks: legacy {legacy_memory / 1e6:.1f} MB, new {new_memory / 1e6:.1f} MB '
+          f'({legacy_memory / new_memory:.1f}x less)')
+
+    legacy_build = best_time(lambda: [legacy_cards.Deck() for _ in range(args.decks)])
+    new_build = best_time(lambda: [Deck() for _ in range(args.decks)])
+    print(f'build {args.decks} decks: legacy {legacy_build * 1e3:.1f} ms, new {new_build * 1e3:.1f} ms '
+          f'({legacy_build / new_build:.1f}x faster)')
+
+    fresh = best_time(fresh_deals(args.decks, 1))
+    seeded = best_time(seeded_deals(args.decks, 1))
+    print(f'deal {args.decks} rounds: new deck each round {fresh * 1e3:.1f} ms, '
+          f'seeded deck reset in place {seeded * 1e3:.1f} ms ({fresh / seeded:.1f}x faster)')
+
+    legacy_turns = best_time(play_turns(legacy_cards.Deck, legacy_cards.Hand, args.turns, 1))
+    new_turns = best_time(play_turns(Deck, Hand, args.turns, 1))
+    print(f'{args.turns} hand turns (add, sort, contains, discard): legacy {legacy_turns * 1e3:.1f} ms, '
+          f'new {new_turns * 1e3:.1f} ms ({legacy_turns / new_turns:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import random
+import time
+from functools import partial
+
+from endgame import DEFAULT_DECK_LIMIT, DEFAULT_DEPTH, MAX_HYPOTHESES, EndgameBot, EndgameSolver
+from meld_engine import FULL_DECK, best_discard, deadwood
+from player import Bot
+from rules import KNOCK_LIMIT
+from simulation import HeadlessGinRummy
+
+# Benchmark the endgame solver on late-deck positions.
+#
+# Positions come from seeded greedy play with knocking held off until the
+# deck is down to the given size; the searching side then decides its draw
+# with the top discard on offer. Each position is searched under the time
+# budget with a large and a small transposition table.
+#
+# Then EndgameBot plays seeded matches against the greedy bot from both
+# seats, as a check that the endgame search starts and finishes hypotheses
+# in normal play. The run fails if no decision finished one.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_endgame --deck 2
+
+
+# (my hand, top discard index, unseen mask) after greedy play down to the deck size, or None if the pile runs dry
+def late_position(rng, deck_size):
+    cards = list(range(52))
+    rng.shuffle(cards)
+    hands = [sum(1 << index for index in cards[:10]), sum(1 << index for index in cards[10:20])]
+    pile = [cards[20]]
+    deck = cards[21:]
+    player = 0
+    while len(deck) > deck_size:
+        hand = hands[player] | 1 << deck.pop()
+        bit = best_discard(hand)[1]
+        hands[player] = hand ^ bit
+        pile.append(bit.bit_length() - 1)
+        player = 1 - player
+    me = hands[player]
+    seen = me
+    for index in pile:
+        seen |= 1 << index
+    return me, pile[-1], FULL_DECK & ~seen
+
+
+# Search the draw decision in each position; returns (seconds, nodes, hypotheses finished, solver)
+def search_positions(positions, deck_size, depth, budget, table_entries, seed):
+    solver = EndgameSolver(table_entries)
+    rng = random.Random(seed)
+    hypotheses = 0
+    start = time.perf_counter()
+    for me, top, unseen in positions:
+        def score(opponent, deck):
+            return [solver.deck_draw(me, opponent, deck, depth), solver.my_discard(me | 1 << top, opponent, deck, depth)]
+        deadline = time.perf_counter() + budget
+        hypotheses += solver.search(score, 0, unseen, deck_size, rng, deadline)[1]
+    return time.perf_counter() - start, solver.nodes, hypotheses, solver
+
+
+# Play EndgameBot against the greedy bot from both seats; returns (decisions searched, decisions finishing a hypothesis)
+def play_matches(matches, depth, budget, seed):
+    factory = partial(EndgameBot, depth=depth, time_budget=budget)
+    decisions = completed = 0
+    for i in range(matches):
+        seat = i % 2
+        game = HeadlessGinRummy(seed + i // 2, agents=(factory, Bot) if seat == 0 else (Bot, factory))
+        game.play_match()
+        bot = (game.player, game.bot)[seat]
+        decisions += bot.decisions
+        completed += bot.completed
+    return decisions, completed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the endgame solver.')
+    parser.add_argument('--positions', type=int, default=20)
+    parser.add_argument('--deck', type=int, default=2, help='cards left in the deck')
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH, help='turns of each player searched')
+    parser.add_argument('--time-budget', type=float, default=0.1, help='seconds per decision')
+    parser.add_argument('--small-table', type=int, default=1 << 12, help='entry cap of the small table')
+    parser.add_argument('--matches', type=int, default=4, help='matches played for the end-to-end check')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    positions = [late_position(rng, args.deck) for _ in range(args.positions)]
+    ready = sum(deadwood(me) <= KNOCK_LIMIT for me, _, _ in positions)
+    unseen = sum(mask.bit_count() for _, _, mask in positions) / len(positions)
+    print(f'{len(positions)} positions with {args.deck} deck cards, {unseen:.1f} unseen cards on average '
+          f'(at most {MAX_HYPOTHESES} hypotheses each), {ready} already able to knock')
+
+    for entries in (1 << 18, args.small_table):
+        seconds, nodes, hypotheses, solver = search_positions(positions, args.deck, args.depth, args.time_budget, entries, args.seed)
+        table = solver.table
+        lookups = table.hits + table.misses
+        print(f'table cap {entries:>7}: {seconds / len(positions) * 1e3:.1f} ms/decision, '
+              f'{hypotheses / len(positions):.1f} hypotheses/decision, {nodes / seconds:,.0f} nodes/s, '
+              f'{table.hits / lookups if lookups else 0:.1%} hits, {table.evictions} evictions')
+
+    decisions, completed = play_matches(args.matches, args.depth, args.time_budget, args.seed)
+    print(f'{args.matches} matches against the greedy bot (search at {DEFAULT_DECK_LIMIT} deck cards or fewer): '
+          f'{decisions} endgame decisions, {completed} finished a hypothesis')
+    if not completed:
+        raise SystemExit('the endgame search never finished a hypothesis in play')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import time
+
+from meld_engine import best_discard
+from outs import OutsIndex
+from simulation import HeadlessGinRummy
+
+# Benchmark the outs index against solving the hand once per unseen card.
+#
+# Hands are the ten-card hands bots hold between turns of seeded self-play,
+# so sets and pairs turn up as often as they do in games.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_outs --matches 20
+
+
+# Records each player's hand mask after every discard
+class HandRecorder:
+    def __init__(self):
+        self.masks = []
+
+    def on_deal(self, game):
+        pass
+
+    def on_draw(self, player, card, from_pile):
+        pass
+
+    def on_discard(self, player, card):
+        self.masks.append(player.hand.mask)
+
+    def on_reshuffle(self, cards):
+        pass
+
+    def on_round_end(self, result):
+        pass
+
+
+# Ten-card hands from the given number of seeded self-play matches
+def self_play_hands(matches, seed):
+    game = HeadlessGinRummy(seed)
+    recorder = HandRecorder()
+    game.add_listener(recorder)
+    for index in range(matches):
+        game.reset(seed + index)
+        game.play_match()
+    return recorder.masks
+
+
+# Deadwood after the best discard for every card missing from a hand, one solve per card
+def per_card(mask):
+    return [None if mask >> index & 1 else best_discard(mask | 1 << index)[0] for index in range(52)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the outs index.')
+    parser.add_argument('--matches', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    hands = self_play_hands(args.matches, args.seed)
+    mismatches = sum(OutsIndex(mask).values != per_card(mask) for mask in hands)
+
+    start = time.perf_counter()
+    for mask in hands:
+        per_card(mask)
+    solved = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for mask in hands:
+        OutsIndex(mask).values
+    indexed = time.perf_counter() - start
+
+    print(f'{len(hands)} hands, {mismatches} mismatches')
+    print(f'one solve per card {solved / len(hands) * 1e6:.1f} us/hand, '
+          f'outs index {indexed / len(hands) * 1e6:.1f} us/hand ({solved / indexed:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
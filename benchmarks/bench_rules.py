@@ -0,0 +1,117 @@
+import argparse
+import builtins
+import contextlib
+import io
+import random
+import time
+
+from benchmarks import legacy_console
+from best_melds import card_value
+from gin_rummy import GinRummy
+from player import Bot
+from simulation import HeadlessGinRummy
+
+# Benchmark the rules.py state machine against the game loops built on GinRummy.
+#
+# Plays the same number of matches three ways and reports rounds per second:
+#   legacy console  - the old GinRummy.play loop, with scripted input
+#   console         - GinRummy.play on the state machine, with scripted input
+#   headless        - simulation.HeadlessGinRummy, bot against bot on the same
+#                     state machine driver, no observers
+# The scripted human draws from the deck and discards their highest-value
+# unmelded card; console output goes to a discarded buffer.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_rules --matches 50
+
+
+# Input function answering the console prompts for the game's player
+def scripted_input(game):
+    prompts = iter(range(1 << 62))
+
+    def read(*args):
+        if next(prompts) % 2 == 0:
+            return 'd'
+        analysis = game.player.hand.analysis
+        unmelded = analysis.possible_deadwood + analysis.complete_deadwood or game.player.hand.cards
+        card = max(unmelded, key=card_value)
+        return f'{card.rank}{card.suit}'
+    return read
+
+
+# Play console matches with a play function, returning the rounds played
+def console_matches(play, matches):
+    rounds = 0
+    for seed in range(matches):
+        game = GinRummy(rng=random.Random(seed))
+        game.set_bot(Bot(game, random.Random(seed)))
+        counter = _RoundCounter()
+        game.add_listener(counter)
+        read = scripted_input(game)
+        with contextlib.redirect_stdout(io.StringIO()):
+            _with_input(read, play, game)
+        rounds += counter.rounds
+    return rounds
+
+
+# Run play(game) with input() answered by read
+def _with_input(read, play, game):
+    saved = builtins.input
+    builtins.input = read
+    try:
+        play(game)
+    finally:
+        builtins.input = saved
+
+
+# Listener counting rounds dealt
+class _RoundCounter:
+    def __init__(self):
+        self.rounds = 0
+
+    def on_deal(self, game):
+        self.rounds += 1
+
+    def on_draw(self, player, card, from_pile):
+        pass
+
+    def on_discard(self, player, card):
+        pass
+
+    def on_reshuffle(self, cards):
+        pass
+
+    def on_round_end(self, result):
+        pass
+
+
+def headless_matches(matches):
+    game = HeadlessGinRummy(None)
+    rounds = 0
+    for seed in range(matches):
+        game.reset(seed)
+        rounds += game.play_match().rounds
+    return rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the rules state machine against the GinRummy loops.')
+    parser.add_argument('--matches', type=int, default=50)
+    args = parser.parse_args()
+
+    cases = (
+        ('legacy console', lambda: console_matches(legacy_console.play, args.matches)),
+        ('console', lambda: console_matches(GinRummy.play, args.matches)),
+        ('headless', lambda: headless_matches(args.matches)),
+    )
+    rates = {}
+    for name, run in cases:
+        start = time.perf_counter()
+        rounds = run()
+        rates[name] = rounds / (time.perf_counter() - start)
+        print(f'{name:15} {rounds:6} rounds, {rates[name]:9,.0f} rounds/s '
+              f'({rates[name] / rates["legacy console"]:.1f}x legacy console)')
+
+
+if __name__ == '__main__':
+    main()
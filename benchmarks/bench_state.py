@@ -0,0 +1,70 @@
+import argparse
+import copy
+import random
+import time
+
+from mask_state import MaskState
+from rules import DISCARD
+from simulation import HeadlessGinRummy
+
+# Benchmark snapshotting and exploring a round on mask states against
+# deep-copying the game.
+#
+# Run from the repository root:
+#     python -m benchmarks.bench_state
+
+
+# Best wall time of a few passes of a function
+def best_time(function, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# Play draw-then-discard sequences of the given number of turns from a state
+# and undo each one. The bits of the sequence number pick the pile or the
+# deck for each draw, and each turn discards the player's lowest card.
+def explore(state, sequences, turns):
+    def run():
+        mark = state.mark()
+        for sequence in range(sequences):
+            for turn in range(turns):
+                if sequence >> turn & 1 and state.discard_pile:
+                    state.draw_pile()
+                else:
+                    state.draw_deck()
+                hand = state.hands[state.to_move]
+                state.discard((hand & -hand).bit_length() - 1, DISCARD)
+            state.rewind(mark)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark mask game states against copying the game.')
+    parser.add_argument('--copies', type=int, default=2000)
+    parser.add_argument('--sequences', type=int, default=20000)
+    parser.add_argument('--turns', type=int, default=2, help='turns per explored sequence')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    game = HeadlessGinRummy(args.seed)
+    game.discard_pile.append(game.deck.deal_card())
+    state = MaskState.from_game(game, 0, random.Random(args.seed))
+
+    deep = best_time(lambda: [copy.deepcopy(game) for _ in range(args.copies)])
+    cheap = best_time(lambda: [state.copy() for _ in range(args.copies)])
+    print(f'{args.copies} snapshots: deepcopy of the game {deep * 1e3:.1f} ms, '
+          f'MaskState.copy {cheap * 1e3:.1f} ms ({deep / cheap:.0f}x faster)')
+
+    explored = best_time(explore(state, args.sequences, args.turns))
+    print(f'{args.sequences} sequences of {args.turns} turns applied and undone: {explored * 1e3:.1f} ms '
+          f'({args.sequences / explored / 1e3:.0f} sequences/ms, '
+          f'{args.sequences * args.turns * 4 / explored / 1e6:.1f} M applies and undos/s)')
+
+
+if __name__ == '__main__':
+    main()
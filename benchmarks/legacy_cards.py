@@ -0,0 +1,58 @@
+# Frozen copy of the Card, Deck and Hand classes from before the interned,
+# bitset-backed card model. Kept only as the comparison point for the benchmarks.
+import random
+
+
+class Card:
+    # Initialize the card with a rank and suit
+    def __init__(self, rank, suit):
+        self.rank = rank
+        self.suit = suit
+
+    # Define a representation for the card
+    def __repr__(self):
+        return f'{self.rank}{self.suit}'
+
+
+class Deck:
+    ranks = 'A 2 3 4 5 6 7 8 9 10 J Q K'.split()
+    suits = 'H D C S'.split()
+
+    def __init__(self):
+        # Initialize the deck with a standard 52-card set
+        self.cards = [Card(rank, suit) for suit in self.suits for rank in self.ranks]
+
+    # Shuffle the deck
+    def shuffle(self):
+        random.shuffle(self.cards)
+
+    # Deal the top card from the deck
+    def deal_card(self):
+        return self.cards.pop()
+
+
+class Hand:
+    # Initialize the hand with no cards
+    def __init__(self):
+        self.cards = []
+
+    # Add a card to the hand
+    def add_card(self, card):
+        self.cards.append(card)
+
+    # Remove a card from the hand
+    def discard_card(self, card):
+        self.cards.remove(card)
+
+    # Sort the cards in the hand by suit and rank
+    def sort(self):
+        self.cards.sort(key=lambda card: (Deck.suits.index(card.suit), Deck.ranks.index(card.rank)))
+
+    # Define an iterator for the hand
+    def __iter__(self):
+        return iter(self.cards)
+
+    # Define a representation for the hand
+    def __repr__(self):
+        self.sort()
+        return str(self.cards)
@@ -0,0 +1,174 @@
+# Frozen copy of GinRummy.play as it was before the rules moved into the
+# rules.py state machine. Kept only as the comparison point for
+# benchmarks/bench_rules.py; call it as play(game) on a GinRummy.
+import sys
+from hand import Hand
+
+
+# Main game loop
+def play(self):
+    """
+    Main game loop that initiates and runs the Gin Rummy game until a player reaches 100 points.
+    """
+
+    while self.player.score < 100 and self.bot.score < 100:
+        # Initialize the game variables for a new round.
+        self.game_ended = False
+        self.player_knocked = False
+        self.player.hand = Hand()
+        self.bot.hand = Hand()
+        self.discard_pile = []
+        self.deal_initial_hands()
+
+        # Loop for each round of the game.
+        while not self.game_ended:                
+            for current_player in [self.player, self.bot]:
+
+                is_player_turn = current_player == self.player
+
+                # If it's the player's turn
+                if is_player_turn:
+                    # Prompt player to draw a card until a valid action is taken
+                    while True:
+                        analysis = self.player.hand.analysis
+                        chosen_melds = analysis.chosen_melds
+                        possible_deadwood, complete_deadwood = analysis.possible_deadwood, analysis.complete_deadwood
+                        print(f'\nYour hand: {self.player.hand}')
+                        print("\nMelds Chosen: ",chosen_melds)
+                        print("\nPossible Deadwood:  ",possible_deadwood)
+                        print("\nComplete Deadwood: ",complete_deadwood)
+                        print(f'\nDiscard pile: {self.discard_pile}')
+                        print("\n---Draw a card---")
+                        print("\nEnter 'p' to pick from the discard pile, 'd' to draw from the deck: ")
+                        choice = input().strip().lower()
+                        sys.stdin.flush() 
+
+                        # Player decides to pick from the discard pile
+                        if choice == 'p':
+                            if not self.discard_pile:
+                                print("\nDiscard pile is empty! Try picking from the deck('d').")
+                                continue
+                            card = self.discard_pile.pop()
+                            self.player.hand.add_card(card)
+                            self.notify('on_draw', self.player, card, True)
+                            break
+
+                        # Player decides to draw from the deck
+                        elif choice == 'd':
+                            if not self.deck.cards:
+                                print("\nDeck is empty! Reshuffling discarded pile into the deck.")
+                                self.notify('on_reshuffle', list(self.discard_pile))
+                                self.deck.cards.extend(self.discard_pile)
+                                self.deck.shuffle()
+                                self.discard_pile.clear()
+                            card = self.deck.deal_card()
+                            self.player.hand.add_card(card)
+                            self.notify('on_draw', self.player, card, False)
+                            break
+
+                        # Player input is not recognized
+                        else:
+                            print("\nInvalid input! Please try again.")
+                            continue
+
+                    print(f'\nYour hand after drawing: {self.player.hand}')
+
+                else: # If it's the bot's turn
+                    self.bot.update_deadwood_sum()
+                    self.agent_draw(self.bot)
+
+                # If game has ended, break from the loop
+                if self.game_ended:
+                    break
+
+                # If it's the player's turn
+                if is_player_turn:
+                    analysis = self.player.hand.analysis
+                    chosen_melds = analysis.chosen_melds
+                    possible_deadwood, complete_deadwood = analysis.possible_deadwood, analysis.complete_deadwood
+                    print("\nMelds Chosen: ",chosen_melds)
+                    print("\nPossible Deadwood:  ",possible_deadwood)
+                    print("\nComplete Deadwood: ",complete_deadwood)
+
+                    continue_turn = True 
+                    while continue_turn:
+                        print("\n---Discard a card---")
+                        print("\nEnter the card to discard (e.g., 'QH' for Queen of Hearts), 'k' to knock, 'g' to gin: ")
+                        choice = input().strip().upper()
+
+                        if choice == 'K' or choice == 'G':
+                            print(f"\nChoose a card to discard before {'knocking' if choice == 'K' else 'declaring gin'} (e.g., 'QH' for Queen of Hearts):")
+                            discard_choice = input().strip().upper()
+
+                            card_to_discard = None
+                            for card in self.player.hand.cards:
+                                if f'{card.rank}{card.suit}' == discard_choice:
+                                    card_to_discard = card
+                                    break
+
+                            if card_to_discard:
+                                self.player.hand.discard_card(card_to_discard)
+                                self.discard_pile.append(card_to_discard)
+
+                                if choice == 'K' and self.is_valid_knock(self.player.hand):
+                                    print("\nYou made a valid knock!")
+                                    self.player_knocked = True
+                                    self.game_ended = True
+                                    self.notify('on_discard', self.player, card_to_discard)
+                                    continue_turn = False 
+                                    break
+
+                                elif choice == 'G' and self.is_gin(self.player.hand):
+                                    print("\nYou have Gin!")
+                                    self.player_knocked = True
+                                    self.game_ended = True
+                                    self.notify('on_discard', self.player, card_to_discard)
+                                    continue_turn = False
+                                    break
+
+                                else:
+                                    print("\nInvalid action! Not a valid knock or gin.")
+                                    self.player.hand.add_card(self.discard_pile.pop())
+                            else:
+                                print("\nInvalid card. Please enter a valid card from your hand.")
+
+                        else:
+
+                            card_to_discard = None
+                            for card in self.player.hand.cards:
+                                if f'{card.rank}{card.suit}' == choice:
+                                    card_to_discard = card
+                                    break
+
+                            if card_to_discard:
+                                self.player.hand.discard_card(card_to_discard)
+                                self.discard_pile.append(card_to_discard)
+                                self.notify('on_discard', self.player, card_to_discard)
+                                continue_turn = False 
+                            else:
+                                print("\nInvalid card. Please enter a valid card from your hand.")
+
+                    print(f'\nDiscard pile: {self.discard_pile}')
+
+                else: # If it's the bot's turn
+                    bot_action, card_to_discard = self.bot.choose_card_to_discard()
+                    print(f'\nBot decided to {bot_action} and discarded: {card_to_discard.rank}{card_to_discard.suit}')
+                    self.bot.hand.discard_card(card_to_discard)
+                    self.discard_pile.append(card_to_discard)
+                    self.notify('on_discard', self.bot, card_to_discard)
+
+                    if bot_action == "knock" and self.is_valid_knock(self.bot.hand):
+                        print("\nBot made a valid knock!")
+                        self.bot_knocked = True
+                        self.game_ended = True
+                    elif bot_action == "gin" and self.is_gin(self.bot.hand):
+                        print("\nBot has Gin!")
+                        self.bot_knocked = True
+                        self.game_ended = True
+
+                    print("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
+
+            # Call handle_end_game if game has ended
+            if self.game_ended:
+                self.handle_end_game()
+
@@ -0,0 +1,125 @@
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import multiprocessing
+import random
+import time
+
+from card import CARDS
+from server import GameServer
+
+# Load test for server.py
+#
+# Opens many concurrent tables, each driven by a scripted client that draws
+# from the deck and discards its highest-value unmelded card, and measures
+# turn latency: the time from sending a discard to receiving the state that
+# hands the move back to the player, bot move included. By default the
+# server runs in a child process so the clients do not share its event loop.
+#
+# Run from the repository root:
+#     python -m benchmarks.load_server --tables 1000 --turns 20
+
+_VALUES = {repr(card): card.value for card in CARDS}
+
+
+# Nearest-rank percentile of sorted values
+def percentile(ordered, percent):
+    return ordered[max(1, -(-percent * len(ordered) // 100)) - 1]
+
+
+# Serve tables in this process until killed, putting the port it bound on the queue
+def _run_server(workers, ports):
+    async def run():
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            server = await GameServer(executor, seed=0).start('127.0.0.1', 0)
+            ports.put(server.sockets[0].getsockname()[1])
+            async with server:
+                await server.serve_forever()
+    asyncio.run(run())
+
+
+# Read messages until the server hands the move back; returns the last state.
+# An error frame comes without a state, so it ends the run instead of stalling it.
+async def _read_state(reader):
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError('the server closed the table')
+        message = json.loads(line)
+        if message['event'] == 'error':
+            raise RuntimeError(f"server error: {message['message']}")
+        if message['event'] == 'state':
+            return message
+
+
+# Play `turns` turns at one table, appending each turn's latency
+async def _client(host, port, turns, think, latencies, rng, start):
+    await start.wait()
+    reader, writer = await asyncio.open_connection(host, port)
+    state = await _read_state(reader)
+    for _ in range(turns):
+        if think:
+            await asyncio.sleep(rng.expovariate(1 / think))
+        if state['phase'] == 'over':
+            writer.write(b'new\n')
+            state = await _read_state(reader)
+        writer.write(b'draw deck\n')
+        state = await _read_state(reader)
+
+        melded = {card for meld in state['melds'] for card in meld}
+        unmelded = [card for card in state['hand'] if card not in melded] or state['hand']
+        card = max(unmelded, key=_VALUES.__getitem__)
+        began = time.perf_counter()
+        writer.write(f'discard {card}\n'.encode())
+        state = await _read_state(reader)
+        latencies.append(time.perf_counter() - began)
+    writer.write(b'quit\n')
+    await writer.drain()
+    writer.close()
+
+
+async def _load(host, port, tables, turns, think):
+    latencies = []
+    start = asyncio.Event()
+    clients = [asyncio.create_task(_client(host, port, turns, think, latencies, random.Random(i), start))
+               for i in range(tables)]
+    await asyncio.sleep(0)
+    began = time.perf_counter()
+    start.set()
+    await asyncio.gather(*clients)
+    return latencies, time.perf_counter() - began
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure server turn latency under many concurrent tables.')
+    parser.add_argument('--tables', type=int, default=1000)
+    parser.add_argument('--turns', type=int, default=20, help='turns played at each table')
+    parser.add_argument('--think', type=float, default=0.0, help='mean seconds a client waits before each turn')
+    parser.add_argument('--workers', type=int, default=None, help='server threads running bot moves')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0, help='load an already running server on this port')
+    args = parser.parse_args()
+
+    server = None
+    port = args.port
+    if not port:
+        ports = multiprocessing.Queue()
+        server = multiprocessing.Process(target=_run_server, args=(args.workers, ports), daemon=True)
+        server.start()
+        port = ports.get()
+
+    try:
+        latencies, elapsed = asyncio.run(_load(args.host, port, args.tables, args.turns, args.think))
+    finally:
+        if server is not None:
+            server.terminate()
+
+    latencies.sort()
+    print(f'{args.tables} tables, {len(latencies):,} turns in {elapsed:.2f}s ({len(latencies) / elapsed:,.0f} turns/s)')
+    print(f'turn latency: p50 {percentile(latencies, 50) * 1e3:.1f} ms, p99 {percentile(latencies, 99) * 1e3:.1f} ms, '
+          f'max {latencies[-1] * 1e3:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import argparse
+
+from meld_engine import canonical_key
+from simulation import HeadlessGinRummy
+
+# Measure how much suit canonicalization shrinks the set of hand states.
+#
+# Plays seeded headless matches, records every hand a player holds after
+# each draw and each discard, and counts the distinct states with and
+# without canonicalization: whole hands (deadwood cache keys) and the
+# deadwood cards of each hand (decision table keys).
+#
+# Run from the repository root:
+#     python -m benchmarks.measure_canonical --matches 1000
+
+
+# Records every hand held after a draw or a discard
+class HandRecorder:
+    def __init__(self):
+        self.hands = set()
+        self.deadwood = set()
+        self.events = 0
+
+    def _record(self, hand):
+        self.events += 1
+        self.hands.add(hand.mask)
+        self.deadwood.add(hand.analysis.deadwood_mask)
+
+    def on_deal(self, game):
+        pass
+
+    def on_reshuffle(self, cards):
+        pass
+
+    def on_round_end(self, result):
+        pass
+
+    def on_draw(self, player, card, from_pile):
+        self._record(player.hand)
+
+    def on_discard(self, player, card):
+        self._record(player.hand)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the distinct-state reduction from suit canonicalization.')
+    parser.add_argument('--matches', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    recorder = HandRecorder()
+    for seed in range(args.seed, args.seed + args.matches):
+        game = HeadlessGinRummy(seed)
+        game.add_listener(recorder)
+        game.play_match()
+
+    print(f'{args.matches} matches, {recorder.events:,} hand states')
+    for name, states in (('hands', recorder.hands), ('deadwood sets', recorder.deadwood)):
+        canonical = {canonical_key(mask) for mask in states}
+        print(f'{name:14} {len(states):>10,} distinct, {len(canonical):>10,} canonical, '
+              f'{len(states) / len(canonical):.2f}x reduction')
+
+
+if __name__ == '__main__':
+    main()
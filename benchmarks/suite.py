@@ -0,0 +1,310 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from best_melds import find_best_meld, find_possible_deadwood, identify_melds
+from card import CARDS, cards_in_mask
+from deadwood_cache import default_cache
+from deck import Deck
+from gin_rummy import GinRummy
+from hand import Hand
+from meld_engine import RANK_MASKS, SUIT_BITS, candidate_melds
+from player import Bot
+from simulation import HeadlessGinRummy
+
+# Reproducible benchmark suite for meld detection, bot decisions and full rounds.
+#
+# Every corpus is dealt from a fixed seed, so two runs time exactly the same
+# work. Results can be saved as a baseline and later runs compared against
+# it; the run fails when any case slows down by more than the threshold.
+#
+# Run from the repository root:
+#     python -m benchmarks.suite --save        # record benchmarks/baseline.json
+#     python -m benchmarks.suite               # compare against it
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_THRESHOLD = 0.20
+DEFAULT_SEED = 2024
+HAND_SIZE = 11
+
+
+# Fill a mask up to the hand size with random cards not already in it
+def _fill(rng, mask, size=HAND_SIZE):
+    free = [card.index for card in CARDS if not mask >> card.index & 1]
+    for index in rng.sample(free, size - mask.bit_count()):
+        mask |= 1 << index
+    return mask
+
+
+# Hands holding one or two complete ranks
+def quads_corpus(rng, count):
+    hands = []
+    for i in range(count):
+        mask = 0
+        for rank in rng.sample(range(SUIT_BITS), 1 + i % 2):
+            mask |= RANK_MASKS[rank]
+        hands.append(_fill(rng, mask))
+    return hands
+
+
+# Hands holding one run of five to ten cards
+def long_runs_corpus(rng, count):
+    hands = []
+    for _ in range(count):
+        length = rng.randint(5, 10)
+        start = rng.randint(0, SUIT_BITS - length)
+        suit = rng.randrange(4)
+        hands.append(_fill(rng, ((1 << length) - 1) << (suit * SUIT_BITS + start)))
+    return hands
+
+
+# Hands where runs and sets compete for the same cards
+def conflicts_corpus(rng, count):
+    hands = []
+    for _ in range(count):
+        mask = 0
+        for _ in range(2):
+            rank = rng.randint(1, SUIT_BITS - 2)
+            suit = rng.randrange(4)
+            # A three-card run through the rank, plus the rank in two more suits
+            mask |= 0b111 << (suit * SUIT_BITS + rank - 1)
+            others = [other for other in range(4) if other != suit]
+            for other in rng.sample(others, 2):
+                mask |= 1 << (other * SUIT_BITS + rank)
+        if mask.bit_count() <= HAND_SIZE:
+            hands.append(_fill(rng, mask))
+    return hands
+
+
+# Hands with no meld at all
+def deadwood_corpus(rng, count):
+    hands = []
+    while len(hands) < count:
+        mask = _fill(rng, 0)
+        if not candidate_melds(mask):
+            hands.append(mask)
+    return hands
+
+
+# Uniformly random hands
+def random_corpus(rng, count):
+    return [_fill(rng, 0) for _ in range(count)]
+
+
+CORPORA = {
+    'quads': quads_corpus,
+    'long_runs': long_runs_corpus,
+    'conflicts': conflicts_corpus,
+    'deadwood': deadwood_corpus,
+    'random': random_corpus,
+}
+
+
+# Build every corpus from the seed, as lists of 11-card hands
+def build_corpora(seed, count):
+    corpora = {}
+    for offset, (name, build) in enumerate(CORPORA.items()):
+        masks = build(random.Random(seed + offset), count)
+        corpora[name] = [cards_in_mask(mask) for mask in masks]
+    return corpora
+
+
+# Build a Hand holding the given cards
+def _hand_of(cards):
+    hand = Hand()
+    for card in cards:
+        hand.add_card(card)
+    return hand
+
+
+# Deal disjoint (knocker, opponent) hand pairs for layoff timing
+def _layoff_deals(seed, count):
+    rng = random.Random(seed)
+    deals = []
+    for _ in range(count):
+        cards = rng.sample(CARDS, 20)
+        deals.append((_hand_of(cards[:10]), _hand_of(cards[10:])))
+    return deals
+
+
+# Each case returns (function to time, number of operations per call)
+def _case_identify_melds(hands):
+    def run():
+        for hand in hands:
+            identify_melds(hand)
+    return run, len(hands)
+
+
+def _case_find_best_meld(hands):
+    melds = [identify_melds(hand) for hand in hands]
+
+    def run():
+        for hand, hand_melds in zip(hands, melds):
+            find_best_meld(hand_melds, hand)
+    return run, len(hands)
+
+
+def _case_find_possible_deadwood(hands):
+    rejected = [find_best_meld(identify_melds(hand), hand)[1] for hand in hands]
+
+    def run():
+        for cards in rejected:
+            find_possible_deadwood(cards)
+    return run, len(hands)
+
+
+def _case_choose_card_to_discard(hands):
+    game = GinRummy(verbose=False, rng=random.Random(0))
+    bot = Bot(game, random.Random(0))
+
+    def run():
+        for cards in hands:
+            bot.hand = _hand_of(cards)
+            bot.choose_card_to_discard()
+    return run, len(hands)
+
+
+def _case_choose_card_to_pick(hands):
+    game = GinRummy(verbose=False, rng=random.Random(0))
+    bot = Bot(game, random.Random(0))
+    deck = Deck(random.Random(0))
+    # The deck holds every card outside the hand and the top discard
+    stocks = [[card for card in CARDS if card not in cards] for cards in hands]
+
+    def run():
+        for cards, stock in zip(hands, stocks):
+            # The eleventh card is offered as the top of the discard pile
+            bot.hand = _hand_of(cards[:10])
+            bot.update_deadwood_sum()
+            deck.cards[:] = stock
+            bot.choose_card_to_pick([cards[10]], deck)
+    return run, len(hands)
+
+
+# Case name -> builder, for cases timed on every hand corpus
+HAND_CASES = {
+    'identify_melds': _case_identify_melds,
+    'find_best_meld': _case_find_best_meld,
+    'find_possible_deadwood': _case_find_possible_deadwood,
+    'Bot.choose_card_to_discard': _case_choose_card_to_discard,
+    'Bot.choose_card_to_pick': _case_choose_card_to_pick,
+}
+
+
+def _case_layoff(seed, count):
+    game = GinRummy(verbose=False, rng=random.Random(0))
+    deals = _layoff_deals(seed, count)
+
+    def run():
+        for knocker_hand, opponent_hand in deals:
+            game.layoff(knocker_hand, opponent_hand)
+    return run, len(deals)
+
+
+def _case_headless_rounds(seed, count):
+    game = HeadlessGinRummy(seed)
+
+    def run():
+        game.reset(seed)
+        for _ in range(count):
+            game.play_round()
+    return run, count
+
+
+# Time a case and return operations per second (best of several passes)
+def measure(run, operations, repeat):
+    best = None
+    for _ in range(repeat):
+        default_cache.clear()
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return operations / best
+
+
+# Run every case and return {case name: operations per second}
+def run_suite(seed=DEFAULT_SEED, hands=300, rounds=50, repeat=5, only=None):
+    cases = []
+    corpora = build_corpora(seed, hands)
+    for case_name, build in HAND_CASES.items():
+        for corpus_name, corpus in corpora.items():
+            cases.append((f'{case_name}[{corpus_name}]', lambda build=build, corpus=corpus: build(corpus)))
+    cases.append(('GinRummy.layoff[deals]', lambda: _case_layoff(seed, hands)))
+    cases.append(('headless_round', lambda: _case_headless_rounds(seed, rounds)))
+
+    results = {}
+    for name, build in cases:
+        if only and not any(part in name for part in only):
+            continue
+        run, operations = build()
+        results[name] = measure(run, operations, repeat)
+    return results
+
+
+# Options a baseline records; results are only comparable when they match
+BASELINE_OPTIONS = ('seed', 'hands', 'rounds')
+
+
+# Compare results to a baseline; returns the list of (case, baseline, current, change) regressions
+def find_regressions(results, baseline, threshold):
+    regressions = []
+    for name, rate in results.items():
+        previous = baseline.get(name)
+        if previous and rate < previous * (1 - threshold):
+            regressions.append((name, previous, rate, rate / previous - 1))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmark suite.')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline results file')
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='fail when a case is this fraction slower than the baseline')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--hands', type=int, default=300, help='hands per corpus')
+    parser.add_argument('--rounds', type=int, default=50, help='headless rounds per pass')
+    parser.add_argument('--repeat', type=int, default=5, help='passes per case; the best is kept')
+    parser.add_argument('--only', nargs='*', help='run only cases whose name contains one of these')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as baseline_file:
+            recorded = json.load(baseline_file)
+        # Other corpora or round counts time different work, so the rates would not compare
+        mismatched = [f'{option}={recorded.get(option)} (now {getattr(args, option)})' for option in BASELINE_OPTIONS
+                      if recorded.get(option) != getattr(args, option)]
+        if mismatched:
+            raise SystemExit(f"{args.baseline} was recorded with {', '.join(mismatched)}; "
+                             f'rerun with the same options or record a new baseline with --save')
+        baseline = recorded['results']
+
+    results = run_suite(args.seed, args.hands, args.rounds, args.repeat, args.only)
+
+    for name, rate in results.items():
+        line = f'{name:48} {rate:14,.0f} ops/s'
+        if name in baseline:
+            line += f'  ({rate / baseline[name] - 1:+.1%} vs baseline)'
+        print(line)
+
+    if args.save:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump({'seed': args.seed, 'hands': args.hands, 'rounds': args.rounds, 'results': results},
+                      baseline_file, indent=2)
+        print(f'baseline written to {args.baseline}')
+        return
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    for name, previous, rate, change in regressions:
+        print(f'REGRESSION {name}: {previous:,.0f} -> {rate:,.0f} ops/s ({change:+.1%})')
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,67 @@
+RANKS = 'A 2 3 4 5 6 7 8 9 10 J Q K'.split()
+SUITS = 'H D C S'.split()
+
+
 class Card:
-    # Initialize the card with a rank and suit
-    def __init__(self, rank, suit):
-        self.rank = rank
-        self.suit = suit
-    
+    # Every card is one of 52 shared, immutable instances. Besides the rank and
+    # suit strings used for display, each card carries integer fields so the
+    # game never has to look ranks or suits up by name:
+    #   rank_index, suit_index - positions in RANKS and SUITS
+    #   index - suit_index * 13 + rank_index, the card's bit in a hand mask
+    #   bit - 1 << index
+    #   value - deadwood points (A=1 ... K=13)
+    __slots__ = ('rank', 'suit', 'rank_index', 'suit_index', 'index', 'bit', 'value')
+
+    # Return the shared instance for a rank and suit
+    def __new__(cls, rank, suit):
+        try:
+            return _CARDS_BY_NAME[rank, suit]
+        except KeyError:
+            raise ValueError(f'invalid card: {rank}{suit}') from None
+
+    # Cards cannot be changed once created
+    def __setattr__(self, name, value):
+        raise AttributeError('Card is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('Card is immutable')
+
+    def __hash__(self):
+        return self.index
+
+    # Keep copies and pickles pointing at the shared instance
+    def __reduce__(self):
+        return Card, (self.rank, self.suit)
+
     # Define a representation for the card
     def __repr__(self):
         return f'{self.rank}{self.suit}'
+
+
+# Build the 52 shared cards in suit-major order, so CARDS[i].index == i
+def _build_cards():
+    cards = []
+    for suit_index, suit in enumerate(SUITS):
+        for rank_index, rank in enumerate(RANKS):
+            card = object.__new__(Card)
+            index = suit_index * len(RANKS) + rank_index
+            for name, value in (('rank', rank), ('suit', suit), ('rank_index', rank_index),
+                                ('suit_index', suit_index), ('index', index), ('bit', 1 << index),
+                                ('value', rank_index + 1)):
+                object.__setattr__(card, name, value)
+            cards.append(card)
+    return cards
+
+
+CARDS = _build_cards()
+_CARDS_BY_NAME = {(card.rank, card.suit): card for card in CARDS}
+
+
+# Get the cards whose bits are set in a mask, in suit and rank order
+def cards_in_mask(mask):
+    cards = []
+    while mask:
+        low = mask & -mask
+        cards.append(CARDS[low.bit_length() - 1])
+        mask ^= low
+    return cards
@@ -0,0 +1,168 @@
+from card import CARDS
+from meld_engine import SUIT_BITS
+
+# Opponent-hand inference
+#
+# A CardTracker follows one seat's view of a round. Every card is either in
+# the tracker owner's hand, in the discard pile, known to be in the
+# opponent's hand (picked up from the pile), or unknown (deck or opponent).
+# Each unknown card carries a weight, and the opponent's unknown cards are
+# spread over the unknown pool in proportion to weight:
+#
+#     P(card in opponent's hand) = unknown opponent slots * weight / total weight
+#
+# Picking up a card raises the weight of the cards that meld with it;
+# discarding a card lowers them, since a player keeps what they are building.
+# Every event touches at most the eight related cards and keeps the weight
+# total up to date, so updates cost microseconds whatever the game length.
+#
+# Trackers listen to GinRummy events: on_deal(game), on_draw(player, card,
+# from_pile), on_discard(player, card), on_reshuffle(cards) and
+# on_round_end(result), where result is a RoundResult or None for a round
+# abandoned at the turn limit.
+
+MINE = 0
+PILE = 1
+OPPONENT = 2
+UNKNOWN = 3
+
+PICKUP_FACTOR = 3.0  # Weight multiplier for cards melding with a picked-up card
+DISCARD_FACTOR = 0.5  # Weight multiplier for cards melding with a discarded card
+OPPONENT_HAND_SIZE = 10
+
+
+# Cards forming a meld with each card: the same rank in other suits and suit neighbours within two ranks
+def _build_related():
+    related = []
+    for card in CARDS:
+        cards = [other.index for other in CARDS if other.rank_index == card.rank_index and other is not card]
+        for step in (-2, -1, 1, 2):
+            rank = card.rank_index + step
+            if 0 <= rank < SUIT_BITS:
+                cards.append(card.suit_index * SUIT_BITS + rank)
+        related.append(cards)
+    return related
+
+
+# Pairs of cards that complete a three-card meld with each card
+def _build_meld_pairs():
+    pairs = []
+    for card in CARDS:
+        same_rank = [other.index for other in CARDS if other.rank_index == card.rank_index and other is not card]
+        card_pairs = [(a, b) for i, a in enumerate(same_rank) for b in same_rank[i + 1:]]
+        base, rank = card.suit_index * SUIT_BITS, card.rank_index
+        for ranks in ((rank - 2, rank - 1), (rank - 1, rank + 1), (rank + 1, rank + 2)):
+            if all(0 <= other < SUIT_BITS for other in ranks):
+                card_pairs.append((base + ranks[0], base + ranks[1]))
+        pairs.append(card_pairs)
+    return pairs
+
+
+RELATED = _build_related()
+MELD_PAIRS = _build_meld_pairs()
+
+
+class CardTracker:
+    # Initialize a tracker for one player's view of the game
+    def __init__(self, owner):
+        self.owner = owner
+        self.reset(0)
+
+    # Start a round with the owner's dealt hand (as a mask)
+    def reset(self, hand_mask):
+        self.location = [MINE if hand_mask >> index & 1 else UNKNOWN for index in range(52)]
+        self.weights = [0.0 if hand_mask >> index & 1 else 1.0 for index in range(52)]
+        self.total = sum(self.weights)
+        self.opponent_cards = OPPONENT_HAND_SIZE  # Cards in the opponent's hand
+        self.opponent_known = 0  # Of those, cards seen picked up
+
+    # Move a card to a new location, keeping the unknown weight total in step
+    def _move(self, index, location):
+        if self.location[index] == UNKNOWN:
+            self.total -= self.weights[index]
+        self.location[index] = location
+        if location == UNKNOWN:
+            self.weights[index] = 1.0
+            self.total += 1.0
+
+    # Scale the weight of every unknown card that melds with a card
+    def _scale_related(self, index, factor):
+        weights, location = self.weights, self.location
+        for other in RELATED[index]:
+            if location[other] == UNKNOWN:
+                old = weights[other]
+                weights[other] = old * factor
+                self.total += old * factor - old
+
+    # A new round was dealt
+    def on_deal(self, game):
+        self.reset(self.owner.hand.mask)
+
+    # A player drew a card, from the discard pile or the deck
+    def on_draw(self, player, card, from_pile):
+        index = card.index
+        if player is self.owner:
+            self._move(index, MINE)
+            return
+        self.opponent_cards += 1
+        if from_pile:
+            self._move(index, OPPONENT)
+            self.opponent_known += 1
+            self._scale_related(index, PICKUP_FACTOR)
+
+    # A player discarded a card
+    def on_discard(self, player, card):
+        index = card.index
+        if player is not self.owner:
+            self.opponent_cards -= 1
+            if self.location[index] == OPPONENT:
+                self.opponent_known -= 1
+            self._scale_related(index, DISCARD_FACTOR)
+        self._move(index, PILE)
+
+    # The discard pile was shuffled back into the deck
+    def on_reshuffle(self, cards):
+        for card in cards:
+            self._move(card.index, UNKNOWN)
+
+    # The round ended
+    def on_round_end(self, result):
+        pass
+
+    # Mask of the cards not seen: neither held, in the pile nor seen picked up by the opponent
+    def unknown_mask(self):
+        mask = 0
+        for index, location in enumerate(self.location):
+            if location == UNKNOWN:
+                mask |= 1 << index
+        return mask
+
+    # Probability that the opponent holds a card
+    def probability(self, card):
+        return self._probability(card.index)
+
+    def _probability(self, index):
+        location = self.location[index]
+        if location == OPPONENT:
+            return 1.0
+        if location != UNKNOWN or self.total <= 0:
+            return 0.0
+        slots = self.opponent_cards - self.opponent_known
+        return min(1.0, slots * self.weights[index] / self.total)
+
+    # Probability that the opponent could meld a card if it were discarded
+    def feed_risk(self, card):
+        miss = 1.0
+        probability = self._probability
+        for a, b in MELD_PAIRS[card.index]:
+            miss *= 1.0 - probability(a) * probability(b)
+        return 1.0 - miss
+
+
+# Give a player a tracker and register it with the game
+def track(game, player):
+    tracker = CardTracker(player)
+    tracker.reset(player.hand.mask)
+    player.tracker = tracker
+    game.add_listener(tracker)
+    return tracker
@@ -0,0 +1,193 @@
+import argparse
+import os
+import random
+import threading
+from collections import OrderedDict
+
+from mapped_table import MappedTable, write_table
+from meld_engine import canonicalize, canonical_key, restore, solve
+
+# Deadwood evaluation cache
+#
+# Each entry is (minimum deadwood, mask of the cards left in melds). Hot
+# entries live in an in-process LRU keyed by the 52-bit hand mask; an
+# optional memory-mapped table holds precomputed entries on disk so they
+# survive across processes.
+#
+# Hands are solved in their suit-canonical form (see meld_engine.canonicalize)
+# and the table is keyed on it, so one precomputed entry serves every suit
+# relabelling of a hand. The LRU keeps raw keys: hands reached in play almost
+# never repeat under relabelling (benchmarks/measure_canonical.py), so a
+# canonical key there would only slow down every hit.
+#
+# The server runs bot turns on executor threads that share default_cache, so
+# the LRU is only read and changed under a lock. Misses are solved outside
+# it; two threads missing the same hand both solve it and store one result.
+
+DEFAULT_MAXSIZE = 1 << 16
+TABLE_ENV_VAR = 'GIN_RUMMY_DEADWOOD_TABLE'
+
+# Table values pack the deadwood above the 52 bits of the melded mask
+_DEADWOOD_SHIFT = 56
+_MELDED_FIELD = (1 << _DEADWOOD_SHIFT) - 1
+
+
+# Pack a (deadwood, melded mask) result into a single table value
+def pack_result(deadwood, melded):
+    return deadwood << _DEADWOOD_SHIFT | melded
+
+
+# Unpack a table value into (deadwood, melded mask)
+def unpack_result(value):
+    return value >> _DEADWOOD_SHIFT, value & _MELDED_FIELD
+
+
+# Solve a canonical hand mask; returns (deadwood, melded mask) in canonical suits
+def _evaluate_canonical(canonical):
+    deadwood, melds = solve(canonical)
+    melded = 0
+    for meld in melds:
+        melded |= meld
+    return deadwood, melded
+
+
+# Solve a hand mask without any caching, giving the same result as a cache lookup
+def evaluate_uncached(mask):
+    canonical, order = canonicalize(mask)
+    deadwood, melded = _evaluate_canonical(canonical)
+    return deadwood, restore(melded, order)
+
+
+class DeadwoodCache:
+    # Initialize the cache with a size bound and an optional memory-mapped table
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, table=None):
+        self.maxsize = maxsize
+        self.table = table
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()  # Guards entries and the counters
+        self.hits = 0
+        self.table_hits = 0
+        self.misses = 0
+
+    # Get (deadwood, melded mask) for a hand mask
+    def lookup(self, mask):
+        entries = self.entries
+        with self.lock:
+            result = entries.get(mask)
+            if result is not None:
+                self.hits += 1
+                entries.move_to_end(mask)
+                return result
+
+        canonical, order = canonicalize(mask)
+        value = self.table.get(canonical) if self.table is not None else None
+        if value is not None:
+            deadwood, melded = unpack_result(value)
+        else:
+            deadwood, melded = _evaluate_canonical(canonical)
+        result = (deadwood, restore(melded, order))
+
+        with self.lock:
+            if value is not None:
+                self.table_hits += 1
+            else:
+                self.misses += 1
+            entries[mask] = result
+            if len(entries) > self.maxsize:
+                entries.popitem(last=False)
+        return result
+
+    # Attach a memory-mapped table, replacing any table already attached
+    def attach_table(self, path):
+        self.detach_table()
+        self.table = MappedTable(path)
+
+    # Close and forget the attached table
+    def detach_table(self):
+        if self.table is not None:
+            self.table.close()
+            self.table = None
+
+    # Drop every in-process entry and reset the counters
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.table_hits = self.misses = 0
+
+    # Get the hit/miss counters
+    def stats(self):
+        lookups = self.hits + self.table_hits + self.misses
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'table_hits': self.table_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.table_hits) / lookups if lookups else 0.0,
+            'table_entries': len(self.table) if self.table is not None else 0,
+        }
+
+
+# Shared cache used by the game and the bot
+default_cache = DeadwoodCache()
+
+# Worker processes can share one table by setting the environment variable
+if os.environ.get(TABLE_ENV_VAR):
+    default_cache.attach_table(os.environ[TABLE_ENV_VAR])
+
+
+# Get (deadwood, melded mask) for a hand mask from the shared cache
+def evaluate(mask):
+    return default_cache.lookup(mask)
+
+
+# Deal random hands of the sizes a game actually evaluates
+def sample_hands(count, seed):
+    rng = random.Random(seed)
+    deck = range(52)
+    for i in range(count):
+        yield sum(1 << card for card in rng.sample(deck, 10 + i % 2))
+
+
+# Build or extend a table with the solutions for sampled hands
+def warm_table(path, hands, seed):
+    results = {}
+    if os.path.exists(path):
+        existing = MappedTable(path)
+        results.update(existing.items())
+        existing.close()
+
+    before = len(results)
+    for mask in sample_hands(hands, seed):
+        canonical = canonical_key(mask)
+        if canonical not in results:
+            results[canonical] = pack_result(*_evaluate_canonical(canonical))
+
+    write_table(path, results)
+    return before, len(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the on-disk deadwood table.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    warm = commands.add_parser('warm', help='precompute sampled hands into the table')
+    warm.add_argument('table', help='path of the table file to create or extend')
+    warm.add_argument('--hands', type=int, default=100000, help='number of 10- and 11-card hands to sample')
+    warm.add_argument('--seed', type=int, default=0)
+
+    info = commands.add_parser('info', help='show the size of a table')
+    info.add_argument('table')
+
+    args = parser.parse_args()
+    if args.command == 'warm':
+        before, after = warm_table(args.table, args.hands, args.seed)
+        print(f'{args.table}: {before} -> {after} entries')
+    else:
+        table = MappedTable(args.table)
+        print(f'{args.table}: {len(table)} entries in {table.capacity} slots')
+        table.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import argparse
+import multiprocessing
+import os
+import random
+
+from card import CARDS, cards_in_mask
+from mapped_table import MappedTable, write_table
+from meld_engine import SUIT_BITS, canonical_key, canonicalize
+
+# Precomputed discard decisions
+#
+# Stores the bot's discard decision (which card, and whether to discard,
+# knock or declare gin) for the 11-card hands reached in self-play. Whole
+# hands almost never repeat between games, but the bot's decision only
+# depends on the hand's deadwood cards (the cards left out of its optimal
+# melds) whenever there are any, and those do repeat. Entries are therefore
+# keyed on the deadwood cards. The decision does not depend on which suit is
+# which either, so keys are stored in canonical form (see
+# meld_engine.canonicalize), and a lookup maps the stored card back through
+# the suit permutation.
+#
+# The table is built offline by a parallel builder and saved in the
+# memory-mapped format of mapped_table.py. The bot loads it on first use
+# when GIN_RUMMY_DECISION_TABLE names a table file, and falls back to the
+# live search for hands the table does not hold.
+#
+# Build a table from the repository root with:
+#     python decision_table.py build decisions.tbl --matches 2000 --workers 8
+
+TABLE_ENV_VAR = 'GIN_RUMMY_DECISION_TABLE'
+ACTIONS = ('discard', 'knock', 'gin')
+_CARD_BITS = 6
+
+
+# Pack a decision, given the suit order of the canonical key it is stored under
+def pack_decision(action, card, order):
+    return ACTIONS.index(action) << _CARD_BITS | order.index(card.suit_index) * SUIT_BITS + card.rank_index
+
+
+class DecisionTable:
+    # Open a table file written by build_table
+    def __init__(self, path):
+        self.table = MappedTable(path)
+        self.hits = 0
+        self.misses = 0
+
+    # Get the (action, card) decision for the deadwood cards of an 11-card hand, or None on a miss
+    def lookup(self, deadwood_mask):
+        value = self.table.get(canonical_key(deadwood_mask))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        order = canonicalize(deadwood_mask)[1]
+        index = value & ((1 << _CARD_BITS) - 1)
+        card = CARDS[order[index // SUIT_BITS] * SUIT_BITS + index % SUIT_BITS]
+        return ACTIONS[value >> _CARD_BITS], card
+
+    def __len__(self):
+        return len(self.table)
+
+    # Release the mapping
+    def close(self):
+        self.table.close()
+
+
+_default_table = None
+_default_loaded = False
+
+
+# Get the table named by the environment variable, opened on first use; None when unset
+def default_table():
+    global _default_table, _default_loaded
+    if not _default_loaded:
+        _default_loaded = True
+        path = os.environ.get(TABLE_ENV_VAR)
+        if path:
+            _default_table = DecisionTable(path)
+    return _default_table
+
+
+# Use the given table file (or None for no table) for every bot in this process
+def set_default_table(path):
+    global _default_table, _default_loaded
+    if _default_table is not None:
+        _default_table.close()
+    _default_table = DecisionTable(path) if path else None
+    _default_loaded = True
+
+
+# Records the 11-card hand behind every discard in a game
+class _StateRecorder:
+    def __init__(self):
+        self.states = set()
+
+    def on_deal(self, game):
+        pass
+
+    def on_draw(self, player, card, from_pile):
+        pass
+
+    def on_reshuffle(self, cards):
+        pass
+
+    def on_round_end(self, result):
+        pass
+
+    def on_discard(self, player, card):
+        self.states.add(player.hand.mask | card.bit)
+
+
+# Pool task: play a range of seeded matches and return the hands reached
+def _collect_states(seeds):
+    from simulation import HeadlessGinRummy
+
+    recorder = _StateRecorder()
+    for seed in seeds:
+        game = HeadlessGinRummy(seed)
+        game.add_listener(recorder)
+        game.play_match()
+    return recorder.states
+
+
+# Pool task: run the bot's live search on hands; returns (key, decision) pairs
+def _decide(masks):
+    from hand import Hand
+    from player import Bot
+
+    bot = Bot(None, random.Random(0))
+    decisions = []
+    for mask in masks:
+        bot.hand = Hand()
+        for card in cards_in_mask(mask):
+            bot.hand.add_card(card)
+        deadwood_mask = bot.hand.analysis.deadwood_mask
+        if not deadwood_mask:
+            # With every card melded the bot's choice depends on the melds, so it is not stored
+            continue
+        key, order = canonicalize(deadwood_mask)
+        action, card = bot.search_discard()
+        decisions.append((key, pack_decision(action, card, order)))
+    return decisions
+
+
+# Build a table from the hands reached in self-play; returns the number of entries
+def build_table(path, matches, workers=None, seed=0, chunk_size=50):
+    workers = workers or os.cpu_count() or 1
+    seed_chunks = [range(start, min(start + chunk_size, seed + matches)) for start in range(seed, seed + matches, chunk_size)]
+
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        states = set()
+        for chunk_states in pool.imap_unordered(_collect_states, seed_chunks):
+            states |= chunk_states
+
+        ordered = sorted(states)
+        mask_chunks = [ordered[start:start + 1000] for start in range(0, len(ordered), 1000)]
+        items = {}
+        for decisions in pool.imap_unordered(_decide, mask_chunks):
+            items.update(decisions)
+
+    write_table(path, items)
+    return len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or inspect a discard decision table.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='collect hands from self-play and store their decisions')
+    build.add_argument('table', help='path of the table file to write')
+    build.add_argument('--matches', type=int, default=1000, help='self-play matches to collect hands from')
+    build.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    build.add_argument('--seed', type=int, default=0, help='seed of the first match')
+
+    info = commands.add_parser('info', help='show the size of a table')
+    info.add_argument('table')
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        count = build_table(args.table, args.matches, args.workers, args.seed)
+        print(f'{args.table}: {count} entries')
+    else:
+        table = DecisionTable(args.table)
+        print(f'{args.table}: {len(table)} entries in {table.table.capacity} slots')
+        table.close()
+
+
+if __name__ == '__main__':
+    main()
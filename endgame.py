@@ -0,0 +1,434 @@
+import argparse
+import itertools
+import time
+from collections import OrderedDict
+
+from card_tracker import OPPONENT
+from layoff import best_layoff
+from meld_engine import FULL_DECK, best_discard, deadwood, solve_canonical
+from player import Bot
+from profiling import instrument
+from rules import KNOCK_LIMIT, round_points
+
+# Expectimax endgame search for late-deck positions
+#
+# Once the deck is small, the bot searches the next turns of the round for
+# every hypothesis about the cards it cannot see: each way of splitting the
+# unseen cards into the opponent's missing cards and the deck is one
+# hypothesis, equally likely. Small splits are enumerated, large ones
+# sampled. For each hypothesis the next `depth` turns of each player are
+# solved by expectimax: the bot maximizes over its draws, discards
+# and knocks, every deck draw averages over the cards left in the deck, and
+# the opponent plays the greedy policy of montecarlo.playout (take the top
+# discard when it lowers its deadwood, discard the best card, knock as soon
+# as it can). A draw from an empty deck reshuffles the discard pile into it,
+# as rules.RoundState does: the new deck is every card outside both hands.
+# A position past the horizon is scored by the bot's deadwood lead, roughly
+# what a knock there would be worth. Values are points for the bot, and each
+# root move is scored by its mean over the hypotheses.
+#
+# The tree branches on every deck card and every discard. As montecarlo
+# does, the bot only considers discarding cards outside its best melds (any
+# card when all are melded), which cuts the branching several times over;
+# the search is exact over those moves.
+#
+# Positions repeat across hypotheses' subtrees, moves and turns, so solved
+# values go to a transposition table keyed on one int packing both hands,
+# the deck, the top discard, whose move it is and the turns left. The table
+# is an LRU with an entry cap. A decision stops at its time budget; the hypotheses are
+# visited in random order, so a cut-short decision scores its moves on an
+# unbiased subset, and with none finished the bot plays its normal move.
+
+DEFAULT_DECK_LIMIT = 24  # Search once the deck holds this many cards or fewer
+DEFAULT_DEPTH = 1  # Turns of each player searched before the horizon
+DEFAULT_TIME_BUDGET = 0.1  # Seconds per decision; None searches every hypothesis
+DEFAULT_TABLE_ENTRIES = 1 << 16  # A full collection walks every entry, so a bigger table adds GC pauses to decisions
+MAX_HYPOTHESES = 4096  # Beyond this many splits, hypotheses are sampled
+CHECK_INTERVAL = 32  # Nodes between deadline checks; an opponent turn node averages over the whole deck
+MAX_MEMO = 1 << 16  # Hand masks kept in the solver's deadwood memos before they are cleared
+
+NO_TOP = 63  # Top-card field of a key with an empty discard pile
+
+# Node kinds, the top field of a key
+_MY_DRAW = 0
+_MY_DISCARD = 1
+_OPPONENT_TURN = 2
+_TOP_SHIFT = 156
+_KIND_SHIFT = 162
+_TURNS_SHIFT = 164
+
+
+# Points the knocker scores when knocking with these hand masks (negative when undercut), as rules.py scores them
+def knock_value(knocker, defender):
+    knocker_deadwood, melds = solve_canonical(knocker)
+    kind, points = round_points(knocker_deadwood, best_layoff(melds, defender)[0])
+    return -points if kind == 'undercut' else points
+
+
+# LRU map from packed positions to solved values, holding at most max_entries
+class TranspositionTable:
+    def __init__(self, max_entries=DEFAULT_TABLE_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        entries = self.entries
+        entries[key] = value
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+# Expectimax over one hypothesis at a time. Hands and the deck are masks; the top discard is a card index.
+class EndgameSolver:
+    def __init__(self, table_entries=DEFAULT_TABLE_ENTRIES):
+        self.table = TranspositionTable(table_entries)
+        self.nodes = 0
+        self.deadline = None  # time.perf_counter() value that ends the search
+        # The same few hands are scored at many nodes, so deadwood and greedy discards are memoized
+        self._levels = {}
+        self._discards = {}
+        self._loose = {}
+
+    def _visit(self):
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes % CHECK_INTERVAL and time.perf_counter() > self.deadline:
+            raise _OutOfTime
+
+    # Points for the bot when either side knocks; a layoff search costs about
+    # as much as a node, so it is counted as one for the deadline checks
+    def _knock(self, knocker, defender, sign):
+        self._visit()
+        return sign * knock_value(knocker, defender)
+
+    def _level(self, mask):
+        level = self._levels.get(mask)
+        if level is None:
+            if len(self._levels) >= MAX_MEMO:
+                self._levels.clear()
+            level = self._levels[mask] = deadwood(mask)
+        return level
+
+    def _discard(self, mask):
+        result = self._discards.get(mask)
+        if result is None:
+            if len(self._discards) >= MAX_MEMO:
+                self._discards.clear()
+            result = self._discards[mask] = best_discard(mask)
+        return result
+
+    # Cards the bot considers discarding from an eleven-card hand, as a mask
+    def discards(self, mask):
+        loose = self._loose.get(mask)
+        if loose is None:
+            if len(self._loose) >= MAX_MEMO:
+                self._loose.clear()
+            melded = 0
+            for meld in solve_canonical(mask)[1]:
+                melded |= meld
+            loose = self._loose[mask] = mask & ~melded or mask
+        return loose
+
+    # The bot to draw with ten cards, with `turns` of its turns left to search
+    def my_draw(self, me, opponent, deck, top, turns):
+        key = (me | opponent << 52 | deck << 104 | top << _TOP_SHIFT | _MY_DRAW << _KIND_SHIFT
+               | turns << _TURNS_SHIFT)
+        value = self.table.get(key)
+        if value is not None:
+            return value
+        self._visit()
+        value = self.deck_draw(me, opponent, deck, turns)
+        if top != NO_TOP:
+            value = max(value, self.my_discard(me | 1 << top, opponent, deck, turns))
+        self.table.put(key, value)
+        return value
+
+    # The bot draws from the deck: the mean over its cards. An empty deck is
+    # first refilled with the discard pile, every card outside both hands.
+    def deck_draw(self, me, opponent, deck, turns):
+        if not deck:
+            deck = FULL_DECK & ~(me | opponent)
+        total = 0.0
+        cards = deck
+        while cards:
+            low = cards & -cards
+            cards ^= low
+            total += self.my_discard(me | low, opponent, deck ^ low, turns)
+        return total / deck.bit_count()
+
+    # The bot to discard from eleven cards, knocking when that is worth more
+    def my_discard(self, me, opponent, deck, turns):
+        key = me | opponent << 52 | deck << 104 | _MY_DISCARD << _KIND_SHIFT | turns << _TURNS_SHIFT
+        value = self.table.get(key)
+        if value is not None:
+            return value
+        self._visit()
+        best = None
+        cards = self.discards(me)
+        while cards:
+            low = cards & -cards
+            cards ^= low
+            value = self.discard_value(me ^ low, opponent, deck, low, False, turns)
+            if self._level(me ^ low) <= KNOCK_LIMIT:
+                value = max(value, self.discard_value(me ^ low, opponent, deck, low, True, turns))
+            if best is None or value > best:
+                best = value
+        self.table.put(key, best)
+        return best
+
+    # Value of the bot leaving a ten-card hand after discarding a card (a bit), with or without knocking
+    def discard_value(self, me, opponent, deck, bit, knock, turns):
+        if knock:
+            return self._knock(me, opponent, 1)
+        return self.opponent_turn(me, opponent, deck, bit.bit_length() - 1, turns)
+
+    # The opponent's greedy turn with the bot's discard on top
+    def opponent_turn(self, me, opponent, deck, top, turns):
+        key = (me | opponent << 52 | deck << 104 | top << _TOP_SHIFT | _OPPONENT_TURN << _KIND_SHIFT
+               | turns << _TURNS_SHIFT)
+        value = self.table.get(key)
+        if value is not None:
+            return value
+        self._visit()
+        level, bit = self._discard(opponent | 1 << top)
+        if level < self._level(opponent):
+            value = self._after_opponent(me, (opponent | 1 << top) ^ bit, deck, level, bit, turns)
+        else:
+            if not deck:
+                # The pile, top discard included, is reshuffled into the deck
+                deck = FULL_DECK & ~(me | opponent)
+            value = 0.0
+            cards = deck
+            while cards:
+                low = cards & -cards
+                cards ^= low
+                level, bit = self._discard(opponent | low)
+                value += self._after_opponent(me, (opponent | low) ^ bit, deck ^ low, level, bit, turns)
+            value /= deck.bit_count()
+        self.table.put(key, value)
+        return value
+
+    # The opponent knocks as soon as it can, otherwise the bot draws unless the horizon is reached
+    def _after_opponent(self, me, opponent, deck, level, bit, turns):
+        if level <= KNOCK_LIMIT:
+            return self._knock(opponent, me, -1)
+        if turns <= 1:
+            return float(self._level(opponent) - self._level(me))
+        return self.my_draw(me, opponent, deck, bit.bit_length() - 1, turns - 1)
+
+    # Every split of the unseen cards into the deck and the opponent's unknown
+    # cards, in random order; with too many splits, MAX_HYPOTHESES drawn lazily
+    @staticmethod
+    def hypotheses(unseen, deck_size, rng):
+        indexes = [index for index in range(52) if unseen >> index & 1]
+        if _combinations(len(indexes), deck_size) <= MAX_HYPOTHESES:
+            decks = [sum(1 << index for index in combo) for combo in itertools.combinations(indexes, deck_size)]
+            rng.shuffle(decks)
+            return decks
+        # Sample the opponent's unknown cards; the deck is the rest
+        hidden = len(indexes) - deck_size
+        return (unseen ^ sum(1 << index for index in rng.sample(indexes, hidden)) for _ in range(MAX_HYPOTHESES))
+
+    # Sum each root move's value over the hypotheses until the deadline.
+    #
+    # score(opponent, deck) returns the moves' values in one hypothesis.
+    # Returns (summed values, hypotheses finished).
+    def search(self, score, known, unseen, deck_size, rng, deadline=None):
+        self.deadline = deadline
+        totals = None
+        done = 0
+        try:
+            for deck in self.hypotheses(unseen, deck_size, rng):
+                values = score(known | unseen ^ deck, deck)
+                totals = values if totals is None else [a + b for a, b in zip(totals, values)]
+                done += 1
+        except _OutOfTime:
+            pass
+        finally:
+            self.deadline = None
+        return totals, done
+
+
+def _combinations(n, k):
+    count = 1
+    for i in range(k):
+        count = count * (n - i) // (i + 1)
+    return count
+
+
+# A bot that searches its next turns by expectimax once the deck is small
+#
+# Outside the endgame, or when a decision finishes no hypothesis within its
+# time budget, it plays as player.Bot. With a tracker, the cards the
+# opponent was seen picking up are known to be in its hand.
+class EndgameBot(Bot):
+    def __init__(self, gin_rummy_instance, rng=None, deck_limit=DEFAULT_DECK_LIMIT, depth=DEFAULT_DEPTH,
+                 time_budget=DEFAULT_TIME_BUDGET, table_entries=DEFAULT_TABLE_ENTRIES):
+        self.deck_limit = deck_limit
+        self.depth = depth
+        self.time_budget = time_budget
+        self.solver = EndgameSolver(table_entries)
+
+        # Search metrics, over endgame decisions only
+        self.decisions = 0
+        self.completed = 0  # Decisions that finished at least one hypothesis
+        self.hypotheses = 0  # Hypotheses finished
+        self.search_seconds = 0.0
+        self.max_latency = 0.0
+        super().__init__(gin_rummy_instance, rng)
+
+    # Search nodes expanded per second of search
+    @property
+    def nodes_per_second(self):
+        return self.solver.nodes / self.search_seconds if self.search_seconds else 0.0
+
+    # (cards known to be in the opponent's hand, cards not seen), as masks
+    def _unknowns(self):
+        seen = self.hand.mask
+        for card in self.gin_rummy.discard_pile:
+            seen |= card.bit
+        known = 0
+        if self.tracker is not None:
+            for index, location in enumerate(self.tracker.location):
+                if location == OPPONENT:
+                    known |= 1 << index
+        return known, FULL_DECK & ~(seen | known)
+
+    # Run the solver on the moves scored by score(opponent, deck); returns the best move's index, or None
+    def _search(self, score, known, unseen):
+        start = time.perf_counter()
+        deadline = None if self.time_budget is None else start + self.time_budget
+        totals, done = self.solver.search(score, known, unseen, len(self.gin_rummy.deck.cards), self.rng, deadline)
+        elapsed = time.perf_counter() - start
+        self.decisions += 1
+        self.completed += done > 0
+        self.hypotheses += done
+        self.search_seconds += elapsed
+        self.max_latency = max(self.max_latency, elapsed)
+        if not done:
+            return None
+        # Ties keep the earliest move
+        return max(range(len(totals)), key=lambda i: (totals[i], -i))
+
+    # Take the top discard or draw from the deck, by search in the endgame
+    @instrument
+    def choose_draw_source(self, discard_pile, deck):
+        if not discard_pile or len(deck.cards) > self.deck_limit:
+            return super().choose_draw_source(discard_pile, deck)
+
+        known, unseen = self._unknowns()
+        solver, me, top, depth = self.solver, self.hand.mask, discard_pile[-1].bit, self.depth
+
+        # The greedy bot's source goes first, so moves the search cannot tell apart play as it would
+        pile_first = self.wants_discard(discard_pile)
+
+        def score(opponent, deck_mask):
+            values = [solver.deck_draw(me, opponent, deck_mask, depth), solver.my_discard(me | top, opponent, deck_mask, depth)]
+            return values[::-1] if pile_first else values
+
+        choice = self._search(score, known, unseen)
+        if choice is None:
+            return super().choose_draw_source(discard_pile, deck)
+        return 'pile' if bool(choice) != pile_first else 'deck'
+
+    # Choose the discard, and whether to knock, by search in the endgame
+    @instrument
+    def choose_card_to_discard(self):
+        if len(self.gin_rummy.deck.cards) > self.deck_limit:
+            return super().choose_card_to_discard()
+
+        known, unseen = self._unknowns()
+        solver, me, depth = self.solver, self.hand.mask, self.depth
+        # The greedy bot's move goes first, so moves the search cannot tell apart play as it would
+        greedy_action, greedy_card = super().choose_card_to_discard()
+        greedy_knock = greedy_action != 'discard'
+        moves = []
+        loose = solver.discards(me)
+        for card in sorted(self.hand, key=lambda card: card is not greedy_card):
+            if not loose & card.bit and card is not greedy_card:
+                continue
+            knocks = deadwood(me ^ card.bit) <= KNOCK_LIMIT
+            for knock in ((True, False) if card is greedy_card and greedy_knock else (False, True)):
+                if knocks or not knock:
+                    moves.append((card, knock))
+
+        def score(opponent, deck_mask):
+            return [solver.discard_value(me ^ card.bit, opponent, deck_mask, card.bit, knock, depth) for card, knock in moves]
+
+        choice = self._search(score, known, unseen)
+        if choice is None:
+            return super().choose_card_to_discard()
+        card, knock = moves[choice]
+        if not knock:
+            return ('discard', card)
+        return ('gin' if deadwood(me ^ card.bit) == 0 else 'knock', card)
+
+
+def main():
+    from functools import partial
+
+    from simulation import HeadlessGinRummy
+
+    parser = argparse.ArgumentParser(description='Play the endgame bot against the greedy bot.')
+    parser.add_argument('--matches', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--deck-limit', type=int, default=DEFAULT_DECK_LIMIT,
+                        help='search once the deck holds this many cards or fewer')
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH, help='turns of each player searched')
+    parser.add_argument('--time-budget', type=float, default=DEFAULT_TIME_BUDGET, help='seconds per decision')
+    parser.add_argument('--table-entries', type=int, default=DEFAULT_TABLE_ENTRIES, help='transposition table cap')
+    args = parser.parse_args()
+
+    factory = partial(EndgameBot, deck_limit=args.deck_limit, depth=args.depth, time_budget=args.time_budget,
+                      table_entries=args.table_entries)
+    wins = [0, 0]
+    points = 0
+    decisions = completed = hypotheses = nodes = hits = lookups = 0
+    seconds = max_latency = 0.0
+    # The endgame bot plays each seed from both seats
+    for i in range(args.matches):
+        seat = i % 2
+        game = HeadlessGinRummy(args.seed + i // 2, agents=(factory, Bot) if seat == 0 else (Bot, factory))
+        result = game.play_match()
+        if result.winner is not None:
+            wins[result.winner != seat] += 1
+        points += result.scores[seat] - result.scores[1 - seat]
+        bot = (game.player, game.bot)[seat]
+        decisions += bot.decisions
+        completed += bot.completed
+        hypotheses += bot.hypotheses
+        nodes += bot.solver.nodes
+        hits += bot.solver.table.hits
+        lookups += bot.solver.table.hits + bot.solver.table.misses
+        seconds += bot.search_seconds
+        max_latency = max(max_latency, bot.max_latency)
+
+    print(f'wins: endgame {wins[0]}, greedy {wins[1]} over {args.matches} matches, '
+          f'{points / args.matches:+.1f} points per match')
+    print(f'{decisions} endgame decisions, {completed} finished a hypothesis, '
+          f'{hypotheses / decisions if decisions else 0:.0f} hypotheses each, '
+          f'{nodes / seconds if seconds else 0:,.0f} nodes/s, {hits / lookups if lookups else 0:.1%} table hits')
+    print(f'{seconds / decisions * 1000 if decisions else 0:.1f} ms mean, {max_latency * 1000:.1f} ms max latency')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+import argparse
+import mmap
+import struct
+
+from card import CARDS, cards_in_mask
+
+# Event-sourced game log
+#
+# A GameRecorder listens to a game's events and encodes them as fixed-width
+# 8-byte records; a GameLogWriter streams the records of a whole tournament
+# into one append-only file. Each record is
+#
+#     match (uint32), round (uint8), kind (uint8), seat << 7 | card (uint8), extra (uint8)
+#
+# where seat 0 is the game's first player and seat 1 the second. The round
+# field holds at most 256 rounds per match (simulation caps matches at 200).
+# Matches are
+# written in match order and events in play order, so the records are sorted
+# by (match, round). GameLogReader maps the file read-only and finds a round
+# by binary search, then rebuilds the state at any event of it by applying
+# that round's records alone, without replaying the bots.
+#
+# Record a tournament and inspect a round from the repository root with:
+#     python tournament.py --matches 1000 --log games.log
+#     python game_log.py show games.log --match 12 --round 3 --events 40
+
+MAGIC = b'GRLG'
+VERSION = 1
+HEADER = struct.Struct('<4sIQ')  # magic, version, seed of match 0
+RECORD = struct.Struct('<IBBBB')
+_KEY = struct.Struct('<IB')  # The (match, round) prefix of a record
+
+# Record kinds; the meaning of the card and extra fields depends on the kind
+DEAL = 0  # card dealt to seat
+DRAW = 1  # card drawn by seat; extra is 1 if taken from the discard pile
+DISCARD = 2  # card discarded by seat
+RESHUFFLE = 3  # discard pile shuffled back into the deck; extra is the number of cards
+LAYOFF = 4  # card laid off by seat onto the knocker's melds
+KNOCK = 5  # seat knocked; card is the knocker's deadwood, extra the opponent's after layoff
+GIN = 6  # seat declared gin; fields as for KNOCK
+SCORE = 7  # seat was awarded extra points
+DEAD = 8  # the round hit the turn limit and was abandoned
+KIND_NAMES = ('deal', 'draw', 'discard', 'reshuffle', 'layoff', 'knock', 'gin', 'score', 'dead')
+
+
+# Decode encoded records into (match, round, kind, seat, card, extra) tuples
+def decode(data):
+    for match, round, kind, seat_card, extra in RECORD.iter_unpack(data):
+        yield match, round, kind, seat_card >> 7, seat_card & 0x7F, extra
+
+
+# Listener that encodes a game's events as records in an in-memory buffer
+class GameRecorder:
+    def __init__(self):
+        self.buffer = bytearray()
+        self.game = None
+        self.match = 0
+        self.round = -1
+
+    # Number the rounds played from now on as rounds of the given match
+    def start_match(self, match):
+        self.match = match
+        self.round = -1
+
+    # Hand over the records written so far and start a new buffer
+    def take(self):
+        data, self.buffer = bytes(self.buffer), bytearray()
+        return data
+
+    def _seat(self, player):
+        return 0 if player is self.game.player else 1
+
+    def _write(self, kind, seat, card, extra=0):
+        self.buffer += RECORD.pack(self.match, self.round, kind, seat << 7 | card, extra)
+
+    def on_deal(self, game):
+        self.game = game
+        self.round += 1
+        for seat, player in enumerate((game.player, game.bot)):
+            for card in player.hand.cards:
+                self._write(DEAL, seat, card.index)
+
+    def on_draw(self, player, card, from_pile):
+        self._write(DRAW, self._seat(player), card.index, int(from_pile))
+
+    def on_discard(self, player, card):
+        self._write(DISCARD, self._seat(player), card.index)
+
+    def on_reshuffle(self, cards):
+        self._write(RESHUFFLE, 0, 0, len(cards))
+
+    # A round ended with a RoundResult, or None when it was abandoned
+    def on_round_end(self, result):
+        if result is None:
+            self._write(DEAD, 0, 0)
+            return
+        knocker = self._seat(result.knocker)
+        for card in result.layoff_cards:
+            self._write(LAYOFF, 1 - knocker, card.index)
+        kind = GIN if result.kind == 'gin' else KNOCK
+        self._write(kind, knocker, result.knocker_deadwood, result.opponent_deadwood)
+        if result.kind is not None:
+            self._write(SCORE, self._seat(result.winner), 0, result.points)
+
+
+# Append-only log file for one tournament
+class GameLogWriter:
+    def __init__(self, path, seed=0):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed))
+
+    # Append encoded records, as returned by GameRecorder.take
+    def write(self, data):
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Table state rebuilt from a round's records
+class ReplayState:
+    def __init__(self, match, round):
+        self.match = match
+        self.round = round
+        self.hands = [0, 0]  # Card masks per seat
+        self.discard_pile = []  # Cards, top last
+        self.deck_size = 52
+        self.scores = [0, 0]  # Match scores before this round, plus this round's if it ended
+        self.events = 0  # Records applied
+        self.last = None  # Last record applied
+        self.ended = False
+
+    # Apply one (match, round, kind, seat, card, extra) record
+    def apply(self, record):
+        kind, seat, card, extra = record[2:]
+        if kind == DEAL:
+            self.hands[seat] |= 1 << card
+            self.deck_size -= 1
+        elif kind == DRAW:
+            self.hands[seat] |= 1 << card
+            if extra:
+                self.discard_pile.pop()
+            else:
+                self.deck_size -= 1
+        elif kind == DISCARD:
+            self.hands[seat] &= ~(1 << card)
+            self.discard_pile.append(CARDS[card])
+        elif kind == RESHUFFLE:
+            self.deck_size += len(self.discard_pile)
+            self.discard_pile.clear()
+        elif kind == SCORE:
+            self.scores[seat] += extra
+        elif kind in (KNOCK, GIN, DEAD):
+            self.ended = True
+        self.events += 1
+        self.last = record
+
+    # Cards held by a seat
+    def hand(self, seat):
+        return cards_in_mask(self.hands[seat])
+
+
+# Read-only, memory-mapped view of a log written by GameLogWriter
+class GameLogReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as log_file:
+            self.map = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.seed = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.map.close()
+            raise ValueError(f'{path} is not a version {VERSION} game log')
+        self.count = (len(self.map) - HEADER.size) // RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    # Get record i as (match, round, kind, seat, card, extra)
+    def record(self, index):
+        match, round, kind, seat_card, extra = RECORD.unpack_from(self.map, HEADER.size + index * RECORD.size)
+        return match, round, kind, seat_card >> 7, seat_card & 0x7F, extra
+
+    # Iterate over the records in [start, stop)
+    def records(self, start=0, stop=None):
+        stop = self.count if stop is None else stop
+        for index in range(start, stop):
+            yield self.record(index)
+
+    # Encoded bytes of the records in [start, stop)
+    def read(self, start, stop):
+        return self.map[HEADER.size + start * RECORD.size:HEADER.size + stop * RECORD.size]
+
+    # Index of the first record at or after (match, round)
+    def find(self, match, round=0):
+        key = (match, round)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if _KEY.unpack_from(self.map, HEADER.size + middle * RECORD.size) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    # Record range [start, stop) of a round; raises KeyError if it is not in the log
+    def round_range(self, match, round):
+        start = self.find(match, round)
+        if start == self.count or _KEY.unpack_from(self.map, HEADER.size + start * RECORD.size) != (match, round):
+            raise KeyError(f'round {round} of match {match} is not in {self.path}')
+        return start, self.find(match, round + 1)
+
+    # Rebuild the state of a round after its first `events` records (all of them by default)
+    def replay(self, match, round=0, events=None):
+        start, stop = self.round_range(match, round)
+        state = ReplayState(match, round)
+        for record in self.records(self.find(match), start):
+            if record[2] == SCORE:
+                state.scores[record[3]] += record[5]
+        if events is not None:
+            stop = min(stop, start + events)
+        for record in self.records(start, stop):
+            state.apply(record)
+        return state
+
+    # Release the mapping
+    def close(self):
+        self.map.close()
+
+
+# Describe a record in words
+def describe(record):
+    match, round, kind, seat, card, extra = record
+    name = KIND_NAMES[kind]
+    if kind in (DEAL, DISCARD, LAYOFF):
+        return f'seat {seat} {name} {CARDS[card]}'
+    if kind == DRAW:
+        return f"seat {seat} draw {CARDS[card]} from the {'discard pile' if extra else 'deck'}"
+    if kind == RESHUFFLE:
+        return f'reshuffle {extra} cards'
+    if kind in (KNOCK, GIN):
+        return f'seat {seat} {name}s with {card} deadwood against {extra}'
+    if kind == SCORE:
+        return f'seat {seat} scores {extra}'
+    return name
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect a binary game log.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    info = commands.add_parser('info', help='show the size of a log')
+    info.add_argument('log')
+
+    show = commands.add_parser('show', help='replay a round and print its state')
+    show.add_argument('log')
+    show.add_argument('--match', type=int, default=0)
+    show.add_argument('--round', type=int, default=0)
+    show.add_argument('--events', type=int, default=None, help='stop after this many of the round\'s records')
+
+    args = parser.parse_args()
+    reader = GameLogReader(args.log)
+    if args.command == 'info':
+        matches = reader.record(reader.count - 1)[0] + 1 if reader.count else 0
+        print(f'{args.log}: {reader.count:,} records, {matches:,} matches from seed {reader.seed}')
+    else:
+        state = reader.replay(args.match, args.round, args.events)
+        start = reader.find(args.match, args.round)
+        for record in reader.records(start, start + state.events):
+            print(describe(record))
+        print(f'\nseat 0 hand: {state.hand(0)}')
+        print(f'seat 1 hand: {state.hand(1)}')
+        print(f'discard pile: {state.discard_pile}')
+        print(f'deck: {state.deck_size} cards, scores: {state.scores}')
+    reader.close()
+
+
+if __name__ == '__main__':
+    main()
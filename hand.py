@@ -1,27 +1,58 @@
-from deck import Deck
+from card import cards_in_mask
+from hand_analysis import HandAnalysis
 
 class Hand:
-    # Initialize the hand with no cards
+    # Initialize the hand with no cards. The hand is a 52-bit mask with one
+    # bit per card, so adding, removing and membership are all O(1).
     def __init__(self):
-        self.cards = []
+        self.mask = 0
+        self._analysis = None
+        self._repr = None
+        self._repr_mask = 0
 
     # Add a card to the hand
     def add_card(self, card):
-        self.cards.append(card)
+        self.mask |= card.bit
+        if self._analysis is not None:
+            self._analysis.add(card)
 
     # Remove a card from the hand
     def discard_card(self, card):
-        self.cards.remove(card)
+        if not self.mask & card.bit:
+            raise ValueError(f'{card} is not in the hand')
+        self.mask ^= card.bit
+        if self._analysis is not None:
+            self._analysis.remove(card)
 
-    # Sort the cards in the hand by suit and rank
+    # Meld analysis shared by every caller, kept up to date as cards come and go
+    @property
+    def analysis(self):
+        if self._analysis is None:
+            self._analysis = HandAnalysis(self.mask)
+        return self._analysis
+
+    # The cards in the hand, always in suit and rank order
+    @property
+    def cards(self):
+        return cards_in_mask(self.mask)
+
+    # Cards are kept sorted by suit and rank already; kept for existing callers
     def sort(self):
-        self.cards.sort(key=lambda card: (Deck.suits.index(card.suit), Deck.ranks.index(card.rank)))
-    
+        pass
+
+    def __contains__(self, card):
+        return bool(self.mask & card.bit)
+
+    def __len__(self):
+        return self.mask.bit_count()
+
     # Define an iterator for the hand
     def __iter__(self):
-        return iter(self.cards)
+        return iter(cards_in_mask(self.mask))
     
-    # Define a representation for the hand
+    # Define a representation for the hand, rebuilt only after the hand changes
     def __repr__(self):
-        self.sort()
-        return str(self.cards)
+        if self._repr is None or self._repr_mask != self.mask:
+            self._repr = str(cards_in_mask(self.mask))
+            self._repr_mask = self.mask
+        return self._repr
@@ -0,0 +1,148 @@
+from card import cards_in_mask
+from deadwood_cache import evaluate
+from meld_engine import (SUIT_BITS, SUIT_FIELD, _SUIT_DEADWOOD, possible_deadwood_mask, rank_sets, set_ranks, solve,
+                         solve_canonical, suit_runs)
+from outs import OutsIndex
+from profiling import instrument
+
+# Incremental meld analysis of one hand
+#
+# A draw or discard only touches one suit and one rank, so only that suit's
+# runs and that rank's sets are recomputed. The runs-only deadwood of each
+# suit is a table lookup kept per suit, which is the exact answer whenever
+# the hand holds no rank in three or more suits. Otherwise the optimal
+# partition comes from the shared deadwood cache. Everything derived from
+# the partition, down to the player-assist text, is computed on first use
+# and kept until the hand changes; the lists returned are shared, so callers
+# copy them before changing them. The outs index, once asked for, follows
+# the hand card by card.
+class HandAnalysis:
+    # Initialize the analysis for a hand mask
+    @instrument
+    def __init__(self, mask=0):
+        self.mask = mask
+        self.suit_runs = [suit_runs(mask, suit) for suit in range(4)]
+        self.rank_sets = [rank_sets(mask, rank) for rank in range(SUIT_BITS)]
+        self.suit_deadwood = [_SUIT_DEADWOOD[mask >> suit * SUIT_BITS & SUIT_FIELD] for suit in range(4)]
+        self._outs = None
+        self._reset()
+
+    # Forget everything derived from the previous partition
+    def _reset(self):
+        self._solution = None
+        self._meld_masks = None
+        self._melds = None
+        self._deadwood_split = None
+        self._assist_text = None
+
+    # Recompute the runs, sets and suit deadwood touched by one card
+    def _update(self, card):
+        suit, rank = card.suit_index, card.rank_index
+        self.suit_runs[suit] = suit_runs(self.mask, suit)
+        self.rank_sets[rank] = rank_sets(self.mask, rank)
+        self.suit_deadwood[suit] = _SUIT_DEADWOOD[self.mask >> suit * SUIT_BITS & SUIT_FIELD]
+        self._reset()
+
+    # Update the analysis for a card added to the hand
+    @instrument
+    def add(self, card):
+        self.mask |= card.bit
+        self._update(card)
+        if self._outs is not None:
+            self._outs.add(card)
+
+    # Update the analysis for a card removed from the hand
+    @instrument
+    def remove(self, card):
+        self.mask &= ~card.bit
+        self._update(card)
+        if self._outs is not None:
+            self._outs.remove(card)
+
+    # Outs index of the hand (see outs.OutsIndex), created on first use and then kept in step with it
+    @property
+    @instrument
+    def outs(self):
+        if self._outs is None:
+            self._outs = OutsIndex(self.mask)
+        return self._outs
+
+    # Every run and set contained in the hand, as bitmasks
+    @property
+    def candidate_melds(self):
+        return [meld for runs in self.suit_runs for meld in runs] + [meld for sets in self.rank_sets for meld in sets]
+
+    # (minimum deadwood, melded-card mask) of the current hand
+    @property
+    @instrument
+    def solution(self):
+        if self._solution is None:
+            if set_ranks(self.mask):
+                self._solution = evaluate(self.mask)
+            else:
+                # Without possible sets the partition is the union of each suit's best runs
+                melded = 0
+                for meld in solve(self.mask)[1]:
+                    melded |= meld
+                self._solution = (sum(self.suit_deadwood), melded)
+        return self._solution
+
+    # Minimum deadwood points of the hand
+    @property
+    def deadwood(self):
+        if self._solution is None and not set_ranks(self.mask):
+            return sum(self.suit_deadwood)
+        return self.solution[0]
+
+    # Mask of the cards left out of the optimal melds
+    @property
+    def deadwood_mask(self):
+        return self.mask & ~self.solution[1]
+
+    # Optimal melds, as bitmasks; solved in canonical suits like the cached solution
+    @property
+    @instrument
+    def meld_masks(self):
+        if self._meld_masks is None:
+            self._meld_masks = solve_canonical(self.mask)[1]
+        return self._meld_masks
+
+    # Optimal melds, as lists of cards
+    @property
+    def chosen_melds(self):
+        if self._melds is None:
+            self._melds = [cards_in_mask(meld) for meld in self.meld_masks]
+        return self._melds
+
+    # Cards left out of the optimal melds
+    @property
+    def non_meld_cards(self):
+        return cards_in_mask(self.deadwood_mask)
+
+    # (possible deadwood, complete deadwood) card lists
+    @instrument
+    def _split_deadwood(self):
+        if self._deadwood_split is None:
+            deadwood_mask = self.deadwood_mask
+            possible = possible_deadwood_mask(deadwood_mask)
+            self._deadwood_split = (cards_in_mask(deadwood_mask & possible), cards_in_mask(deadwood_mask & ~possible))
+        return self._deadwood_split
+
+    # Deadwood cards that could still form a meld (pairs and suit neighbours)
+    @property
+    def possible_deadwood(self):
+        return self._split_deadwood()[0]
+
+    # Deadwood cards with no nearby partner
+    @property
+    def complete_deadwood(self):
+        return self._split_deadwood()[1]
+
+    # The console's player-assist panel: melds chosen, possible and complete deadwood
+    @property
+    def assist_text(self):
+        if self._assist_text is None:
+            self._assist_text = (f'\nMelds Chosen:  {self.chosen_melds}\n'
+                                 f'\nPossible Deadwood:   {self.possible_deadwood}\n'
+                                 f'\nComplete Deadwood:  {self.complete_deadwood}')
+        return self._assist_text
@@ -0,0 +1,346 @@
+import argparse
+import ast
+import json
+import math
+import multiprocessing
+import os
+import time
+from functools import partial
+
+from endgame import EndgameBot
+from montecarlo import MonteCarloBot
+from player import Bot
+from simulation import DEFAULT_MAX_TURNS, TARGET_SCORE, HeadlessGinRummy
+
+# Rating ladder with sequential testing
+#
+# Two bot variants are compared on duplicate deals: deal i is the match played
+# from seed base_seed + i, once with each variant in the first seat, so both
+# get the same cards. A deal scores 0 to 4 quarter points for the first
+# variant (one per half point it takes from its two matches), and the counts
+# of the five outcomes are all a pairing keeps.
+#
+# Rather than playing a fixed number of deals, a pairing runs a sequential
+# probability ratio test after every batch: H0 says the first variant's Elo
+# advantage is elo0, H1 that it is elo1. The log-likelihood ratio of the deal
+# scores uses the normal approximation of the generalized SPRT, and the
+# pairing stops as soon as it crosses a bound set by the error rates alpha
+# and beta. Clear differences are settled in a few dozen deals; close ones
+# run to max_deals.
+#
+# Pairings are appended to a JSON store, and every entrant's rating is
+# refitted from all stored pairings (a Bradley-Terry fit on match points,
+# averaging BASE_RATING), so the ladder grows across runs.
+#
+# Variants are named by specs: an agent name, optionally followed by keyword
+# arguments, such as bot, bot:knock_threshold=8 or montecarlo:rollouts=32.
+#
+# Run from the repository root:
+#     python ladder.py pair bot bot:knock_threshold=6 bot:pick_margin=1
+#     python ladder.py ratings
+
+AGENTS = {'bot': Bot, 'montecarlo': MonteCarloBot, 'endgame': EndgameBot}
+DEFAULT_STORE = 'ladder.json'
+BASE_RATING = 1500.0
+DEFAULT_ELO0 = 0.0
+DEFAULT_ELO1 = 30.0
+DEFAULT_ALPHA = 0.05
+DEFAULT_BETA = 0.05
+DEFAULT_MAX_DEALS = 1000
+DEFAULT_CHUNK_SIZE = 4  # Deals per task
+VARIANCE_PRIOR = 0.5  # Virtual deals of each outcome in the variance, so a few equal deals do not end a test
+FIT_ITERATIONS = 200
+
+
+# Agent factory for a spec such as "bot:knock_threshold=8,pick_margin=1.5"
+def parse_spec(spec):
+    name, _, arguments = spec.partition(':')
+    if name not in AGENTS:
+        raise ValueError(f'unknown agent {name!r} in {spec!r}; expected one of {", ".join(AGENTS)}')
+    kwargs = {}
+    for argument in filter(None, arguments.split(',')):
+        key, separator, value = argument.partition('=')
+        if not separator:
+            raise ValueError(f'expected key=value, got {argument!r} in {spec!r}')
+        try:
+            kwargs[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            kwargs[key] = value
+    return partial(AGENTS[name], **kwargs)
+
+
+# Expected score of a player rated elo points above its opponent
+def expected_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+# Elo difference implied by an expected score
+def score_elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+# Counts of deal outcomes (0 to 4 quarter points) for the first variant, and the tests on them
+class DealCounts:
+    def __init__(self, counts=None):
+        self.counts = list(counts) if counts is not None else [0] * 5
+
+    def merge(self, other):
+        for outcome, count in enumerate(other.counts):
+            self.counts[outcome] += count
+
+    @property
+    def deals(self):
+        return sum(self.counts)
+
+    # Mean deal score in [0, 1] and its variance, with prior virtual deals of each outcome
+    def moments(self, prior=0.0):
+        counts = [count + prior for count in self.counts]
+        deals = sum(counts)
+        if not deals:
+            return 0.5, 0.0
+        mean = sum(outcome / 4 * count for outcome, count in enumerate(counts)) / deals
+        square = sum((outcome / 4) ** 2 * count for outcome, count in enumerate(counts)) / deals
+        return mean, max(square - mean * mean, 0.0)
+
+    # Generalized SPRT log-likelihood ratio of H1 (elo1) against H0 (elo0)
+    #
+    # Similar bots split most duplicate deals one match each, so the sample
+    # variance of a short run is often zero; the variance takes a small prior
+    # that fades as deals accumulate.
+    def llr(self, elo0, elo1):
+        if not self.deals:
+            return 0.0
+        mean = self.moments()[0]
+        variance = self.moments(VARIANCE_PRIOR)[1]
+        s0, s1 = expected_score(elo0), expected_score(elo1)
+        return self.deals * (s1 - s0) * (2 * mean - s0 - s1) / (2 * variance)
+
+    # Elo difference estimate and its 95% half-width
+    def elo(self):
+        mean, variance = self.moments()
+        if not self.deals:
+            return 0.0, 0.0
+        half_width = 1.959963984540054 * math.sqrt(variance / self.deals)
+        return score_elo(mean), (score_elo(min(mean + half_width, 1.0)) - score_elo(max(mean - half_width, 0.0))) / 2
+
+
+# SPRT bounds on the log-likelihood ratio: accept H0 below the first, H1 above the second
+def sprt_bounds(alpha, beta):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+# Play deals [start, stop) between two specs; returns DealCounts for the first
+def _play_deals(task):
+    spec_a, spec_b, base_seed, start, stop, target, max_turns = task
+    a, b = parse_spec(spec_a), parse_spec(spec_b)
+    games = (HeadlessGinRummy(None, (a, b), max_turns), HeadlessGinRummy(None, (b, a), max_turns))
+    counts = DealCounts()
+    for deal in range(start, stop):
+        quarters = 0
+        for seat, game in enumerate(games):
+            game.reset(base_seed + deal)
+            result = game.play_match(target)
+            game.close()
+            quarters += 1 if result.winner is None else 2 * (result.winner == seat)
+        counts.counts[quarters] += 1
+    return counts
+
+
+# Pairings and ratings kept in a JSON file
+class LadderStore:
+    def __init__(self, path=DEFAULT_STORE):
+        self.path = path
+        self.pairings = []
+        self.ratings = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                data = json.load(file)
+            self.pairings = data['pairings']
+            self.ratings = data['ratings']
+
+    # Write the store, replacing the file only once the new one is complete
+    def save(self):
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'ratings': self.ratings, 'pairings': self.pairings}, file, indent=1)
+        os.replace(temporary, self.path)
+
+    # Record a finished pairing and refit the ratings
+    def add(self, pairing):
+        self.pairings.append(pairing)
+        self.ratings = fit_ratings(self.pairings)
+        self.save()
+
+
+# Bradley-Terry ratings from stored pairings, by minorization-maximization on match points
+#
+# Each entrant also gets two virtual matches, one won and one lost, against a
+# BASE_RATING player, which keeps the rating of a variant that won or lost everything finite.
+def fit_ratings(pairings):
+    points = {}  # Match points per entrant
+    matches = {}  # Matches per pair of entrants
+    for pairing in pairings:
+        a, b, counts = pairing['a'], pairing['b'], pairing['counts']
+        a_points = sum(outcome / 2 * count for outcome, count in enumerate(counts))
+        points[a] = points.get(a, 0.0) + a_points
+        points[b] = points.get(b, 0.0) + 2 * sum(counts) - a_points
+        key = tuple(sorted((a, b)))
+        matches[key] = matches.get(key, 0) + 2 * sum(counts)
+
+    strength = {name: 1.0 for name in points}
+    for _ in range(FIT_ITERATIONS):
+        updated = {}
+        for name in strength:
+            denominator = 2 / (strength[name] + 1.0)  # The virtual matches
+            for (a, b), count in matches.items():
+                if name in (a, b):
+                    other = b if name == a else a
+                    denominator += count / (strength[name] + strength[other])
+            updated[name] = (points[name] + 1.0) / denominator
+        strength = updated
+
+    ratings = {name: 400 * math.log10(value) for name, value in strength.items()}
+    shift = BASE_RATING - sum(ratings.values()) / len(ratings) if ratings else 0.0
+    return {name: rating + shift for name, rating in ratings.items()}
+
+
+# Plays SPRT pairings across a process pool, created on first use and released by close()
+class Ladder:
+    def __init__(self, store, workers=None, seed=0, elo0=DEFAULT_ELO0, elo1=DEFAULT_ELO1, alpha=DEFAULT_ALPHA,
+                 beta=DEFAULT_BETA, max_deals=DEFAULT_MAX_DEALS, target=TARGET_SCORE, max_turns=DEFAULT_MAX_TURNS,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        self.store = store
+        self.workers = workers or os.cpu_count() or 1
+        self.seed = seed
+        self.elo0, self.elo1 = elo0, elo1
+        self.alpha, self.beta = alpha, beta
+        self.max_deals = max_deals
+        self.target = target
+        self.max_turns = max_turns
+        self.chunk_size = chunk_size
+        self._pool = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _map(self, tasks):
+        if self.workers == 1:
+            return map(_play_deals, tasks)
+        if self._pool is None:
+            # Forked workers inherit the imported modules and the precomputed meld tables
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            self._pool = context.Pool(self.workers)
+        return self._pool.imap(_play_deals, tasks)
+
+    # Play a pairing until the SPRT decides or max_deals is reached; returns the stored pairing
+    #
+    # Deals are played a batch of one chunk per worker at a time, and the test
+    # is checked between batches, so a pairing's result depends on the worker
+    # count only through where it stops.
+    def pair(self, spec_a, spec_b):
+        if spec_a == spec_b:
+            raise ValueError(f'cannot pair {spec_a!r} with itself')
+        parse_spec(spec_a), parse_spec(spec_b)  # Reject bad specs before playing
+        lower, upper = sprt_bounds(self.alpha, self.beta)
+        counts = DealCounts()
+        verdict = 'inconclusive'
+        while counts.deals < self.max_deals:
+            start = counts.deals
+            stop = min(start + self.chunk_size * self.workers, self.max_deals)
+            tasks = [(spec_a, spec_b, self.seed, chunk, min(chunk + self.chunk_size, stop), self.target, self.max_turns)
+                     for chunk in range(start, stop, self.chunk_size)]
+            for chunk_counts in self._map(tasks):
+                counts.merge(chunk_counts)
+            llr = counts.llr(self.elo0, self.elo1)
+            if llr >= upper:
+                verdict = 'H1'
+                break
+            if llr <= lower:
+                verdict = 'H0'
+                break
+
+        pairing = {
+            'a': spec_a, 'b': spec_b, 'counts': counts.counts, 'seed': self.seed,
+            'elo0': self.elo0, 'elo1': self.elo1, 'alpha': self.alpha, 'beta': self.beta,
+            'llr': counts.llr(self.elo0, self.elo1), 'verdict': verdict,
+        }
+        self.store.add(pairing)
+        return pairing
+
+
+def print_pairing(pairing):
+    counts = DealCounts(pairing['counts'])
+    elo, half_width = counts.elo()
+    verdict = {
+        'H1': f"{pairing['a']} is stronger by at least {pairing['elo1']:g} Elo",
+        'H0': f"{pairing['a']} is not stronger by {pairing['elo1']:g} Elo",
+        'inconclusive': 'no decision',
+    }[pairing['verdict']]
+    print(f"{pairing['a']} vs {pairing['b']}: {counts.deals} deals {counts.counts}, "
+          f"{elo:+.0f} +/- {half_width:.0f} Elo, LLR {pairing['llr']:.2f}: {verdict}")
+
+
+def print_ratings(store):
+    games = {}
+    for pairing in store.pairings:
+        for name in (pairing['a'], pairing['b']):
+            games[name] = games.get(name, 0) + 2 * sum(pairing['counts'])
+    for name, rating in sorted(store.ratings.items(), key=lambda item: -item[1]):
+        print(f'{rating:7.0f}  {games[name]:>6} matches  {name}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare bot variants with sequential tests and keep ratings.')
+    parser.add_argument('--store', default=DEFAULT_STORE, help='JSON file holding pairings and ratings')
+    commands = parser.add_subparsers(dest='command', required=True)
+    pair = commands.add_parser('pair', help='play the first variant against each of the others')
+    pair.add_argument('specs', nargs='+', help='variants such as bot or bot:knock_threshold=8')
+    pair.add_argument('--elo0', type=float, default=DEFAULT_ELO0, help='Elo advantage under H0')
+    pair.add_argument('--elo1', type=float, default=DEFAULT_ELO1, help='Elo advantage under H1')
+    pair.add_argument('--alpha', type=float, default=DEFAULT_ALPHA, help='chance of accepting H1 when H0 holds')
+    pair.add_argument('--beta', type=float, default=DEFAULT_BETA, help='chance of accepting H0 when H1 holds')
+    pair.add_argument('--max-deals', type=int, default=DEFAULT_MAX_DEALS, help='deals after which a pairing stops')
+    pair.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    pair.add_argument('--seed', type=int, default=0, help='deal i is played from seed + i')
+    pair.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='deals per task')
+    commands.add_parser('ratings', help='print the stored ratings')
+    args = parser.parse_args()
+
+    store = LadderStore(args.store)
+    if args.command == 'pair':
+        if len(args.specs) < 2:
+            parser.error('pair needs at least two variants')
+        if args.specs[0] in args.specs[1:]:
+            parser.error(f'cannot pair {args.specs[0]} with itself')
+        try:
+            for spec in args.specs:
+                parse_spec(spec)
+        except ValueError as error:
+            parser.error(str(error))
+        start = time.perf_counter()
+        deals = 0
+        with Ladder(store, args.workers, args.seed, args.elo0, args.elo1, args.alpha, args.beta, args.max_deals,
+                    chunk_size=args.chunk_size) as ladder:
+            for opponent in args.specs[1:]:
+                pairing = ladder.pair(args.specs[0], opponent)
+                deals += sum(pairing['counts'])
+                print_pairing(pairing)
+        pairings = len(args.specs) - 1
+        print(f'{deals} deals in {time.perf_counter() - start:.1f}s, '
+              f'{deals / (pairings * args.max_deals):.0%} of playing every pairing to {args.max_deals} deals')
+    print_ratings(store)
+
+
+if __name__ == '__main__':
+    main()
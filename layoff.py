@@ -0,0 +1,67 @@
+from meld_engine import RANK_MASKS, SUIT_BITS, SUIT_FIELD, deadwood
+from profiling import instrument
+
+# Layoff engine
+#
+# After a knock the defender may lay cards off onto the knocker's melds: the
+# fourth card of a three-card set, or cards extending a run at either end.
+# Extensions chain, so with 6-7-8H on the table both 9H and 10H can go. The
+# defender is also free to rearrange their own melds, so a card that sits in
+# one of their runs may still be laid off when that leaves less deadwood.
+#
+# For every meld end the defender's options are the chains of held cards
+# growing outward from it. Any union of such chains is a legal layoff, and
+# each candidate is scored with the exact deadwood of the cards left over.
+
+
+# Chains of held cards growing outward from one run end, as growing masks
+def _run_chains(defender, position, step, lowest, highest):
+    chains = [0]
+    chain = 0
+    position += step
+    while lowest <= position <= highest and defender >> position & 1:
+        chain |= 1 << position
+        chains.append(chain)
+        position += step
+    return chains
+
+
+# Get the layoff choices for each knocker meld end, each a list of masks starting with 0
+def layoff_options(knocker_melds, defender):
+    options = []
+    for meld in knocker_melds:
+        low = (meld & -meld).bit_length() - 1
+        high = meld.bit_length() - 1
+        suit_start = low - low % SUIT_BITS
+        if meld >> suit_start & SUIT_FIELD == meld >> suit_start:
+            # A run: extend either end within its suit
+            suit_end = suit_start + SUIT_BITS - 1
+            for position, step in ((high, 1), (low, -1)):
+                chains = _run_chains(defender, position, step, suit_start, suit_end)
+                if len(chains) > 1:
+                    options.append(chains)
+        else:
+            # A set: only the missing card of a three-card set can be added
+            missing = defender & RANK_MASKS[low % SUIT_BITS] & ~meld
+            if missing:
+                options.append([0, missing])
+    return options
+
+
+# Find the defender's best layoff onto the knocker's melds
+#
+# Returns (deadwood left after the layoff, mask of the cards laid off). Ties
+# keep the smaller layoff mask, so the result is deterministic.
+@instrument
+def best_layoff(knocker_melds, defender):
+    candidates = {0}
+    for choices in layoff_options(knocker_melds, defender):
+        candidates = {laid | choice for laid in candidates for choice in choices}
+
+    best, best_laid = deadwood(defender), 0
+    if len(candidates) > 1:
+        for laid in sorted(candidates):
+            value = deadwood(defender & ~laid)
+            if value < best:
+                best, best_laid = value, laid
+    return best, best_laid
@@ -0,0 +1,84 @@
+import mmap
+import os
+import struct
+
+# On-disk hash table of 64-bit keys to 64-bit values, read through mmap
+#
+# The file is a fixed header followed by a power-of-two array of 16-byte
+# slots. Keys are stored plus one so an all-zero slot means empty, and
+# lookups use open addressing with linear probing. The reader maps the file
+# read-only, so every process opening the same table shares one copy of its
+# pages in the OS page cache instead of loading it into its own memory.
+
+MAGIC = b'GRHT'
+VERSION = 1
+HEADER = struct.Struct('<4sIQQ')  # magic, version, capacity, count
+SLOT = struct.Struct('<QQ')  # key + 1, value
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_U64 = (1 << 64) - 1
+
+
+# Get the home slot of a key in a table of the given power-of-two capacity
+def _home_slot(key, capacity):
+    return ((key * _HASH_MULTIPLIER) & _U64) >> (65 - capacity.bit_length())
+
+
+# Write a table holding the given (key, value) pairs, keeping it at most half full
+def write_table(path, items):
+    items = dict(items)
+    capacity = 16
+    while capacity < 2 * len(items):
+        capacity *= 2
+
+    slots = bytearray(capacity * SLOT.size)
+    for key, value in items.items():
+        slot = _home_slot(key, capacity)
+        while SLOT.unpack_from(slots, slot * SLOT.size)[0]:
+            slot = (slot + 1) & (capacity - 1)
+        SLOT.pack_into(slots, slot * SLOT.size, key + 1, value)
+
+    # Write to a temporary file first so readers never map a half-written table
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as table_file:
+        table_file.write(HEADER.pack(MAGIC, VERSION, capacity, len(items)))
+        table_file.write(slots)
+    os.replace(temp_path, path)
+
+
+# Read-only, memory-mapped view of a table written by write_table
+class MappedTable:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as table_file:
+            self.map = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.capacity, self.count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.map.close()
+            raise ValueError(f'{path} is not a version {VERSION} table file')
+
+    # Get the value stored for a key, or None if the key is not in the table
+    def get(self, key):
+        stored_key = key + 1
+        slot = _home_slot(key, self.capacity)
+        while True:
+            found, value = SLOT.unpack_from(self.map, HEADER.size + slot * SLOT.size)
+            if found == stored_key:
+                return value
+            if not found:
+                return None
+            slot = (slot + 1) & (self.capacity - 1)
+
+    # Iterate over every (key, value) pair in the table
+    def items(self):
+        for offset in range(HEADER.size, HEADER.size + self.capacity * SLOT.size, SLOT.size):
+            found, value = SLOT.unpack_from(self.map, offset)
+            if found:
+                yield found - 1, value
+
+    def __len__(self):
+        return self.count
+
+    # Release the mapping
+    def close(self):
+        self.map.close()
@@ -0,0 +1,220 @@
+import random
+
+from meld_engine import deadwood
+from rules import DISCARD, DISCARDING, DRAW, DRAW_DECK, DRAW_PILE, GIN, KNOCK, KNOCK_LIMIT, score_masks
+
+# Undoable round state on masks, for search
+#
+# MaskState plays a round under the rules of rules.RoundState, but the
+# hands are 52-bit masks and the deck and discard pile are lists of card
+# indexes. A draw or discard changes two ints and one list end, and is
+# pushed on an undo stack, so search code can apply a move, look ahead and
+# undo it in O(1) without copying anything or creating cards or hands:
+#
+#     mark = state.mark()
+#     for action in state.legal_actions():
+#         state.apply(action)
+#         ...                      # search below the move
+#         state.rewind(mark)
+#
+# The deck list is never changed in place: drawing moves a size pointer
+# down it, so copy() can share it. Only drawing from an empty deck, which
+# shuffles a copy of the discard pile into a new deck list, saves the old
+# lists for undo.
+#
+# Actions are (kind, card index) pairs with the kinds of rules.py; draws
+# from the deck carry None. A finished round is scored by rules.score_masks
+# with layoffs, exactly as RoundState scores it, on first use of outcome.
+
+# Undo stack entries are kind | card index << 3
+_CARD_SHIFT = 3
+_KIND_BITS = (1 << _CARD_SHIFT) - 1
+_RESHUFFLE = 7  # A deck draw that shuffled the discard pile back in first
+
+
+class MaskState:
+    # Start from both hands (masks), the deck and discard pile (card indexes, top last) and the seat to move
+    def __init__(self, hands, deck, discard_pile=(), to_move=0, phase=DRAW, rng=None):
+        self.hands = list(hands)
+        self.deck = list(deck)
+        self.deck_size = len(self.deck)  # Cards left; the top of the deck is deck[deck_size - 1]
+        self.discard_pile = list(discard_pile)
+        self.to_move = to_move
+        self.phase = phase
+        self.turns = 0  # Completed turns since the start state
+        self.knocker = None  # Seat that knocked or declared gin once the round is over
+        self.rng = rng or random  # Shuffles the discard pile back in when the deck runs out
+        self.history = []  # Undo stack
+        self._saved = []  # (deck, deck size, discard pile) replaced by each reshuffle
+        self._outcome = None
+
+    # State of a rules.RoundState, from the seat to move's turn on
+    @classmethod
+    def from_round(cls, state, rng=None):
+        return cls([hand.mask for hand in state.hands], [card.index for card in state.deck.cards],
+                   [card.index for card in state.discard_pile], state.to_move, state.phase, rng)
+
+    # State of a GinRummy game (player in seat 0, bot in seat 1) with the given seat to draw
+    @classmethod
+    def from_game(cls, game, to_move=0, rng=None):
+        return cls([game.player.hand.mask, game.bot.hand.mask], [card.index for card in game.deck.cards],
+                   [card.index for card in game.discard_pile], to_move, DRAW, rng)
+
+    # Independent copy sharing only the deck list, which is never changed in place
+    def copy(self):
+        state = MaskState.__new__(MaskState)
+        state.hands = list(self.hands)
+        state.deck = self.deck
+        state.deck_size = self.deck_size
+        state.discard_pile = list(self.discard_pile)
+        state.to_move = self.to_move
+        state.phase = self.phase
+        state.turns = self.turns
+        state.knocker = self.knocker
+        state.rng = self.rng
+        state.history = []
+        state._saved = []
+        state._outcome = self._outcome
+        return state
+
+    @property
+    def terminal(self):
+        return self.knocker is not None
+
+    # rules.RoundOutcome of a finished round, or None while it is being played
+    @property
+    def outcome(self):
+        if self.knocker is not None and self._outcome is None:
+            seat = self.knocker
+            self._outcome = score_masks(seat, self.hands[seat], self.hands[1 - seat])
+        return self._outcome
+
+    # Hashable summary of everything a later move can depend on, except the deck order and the undo stack
+    def key(self):
+        return (self.hands[0], self.hands[1], tuple(self.discard_pile), self.deck_size, self.to_move, self.phase,
+                self.knocker)
+
+    # Every action open to the seat to move
+    def legal_actions(self):
+        if self.knocker is not None:
+            return []
+        if self.phase == DRAW:
+            if self.discard_pile:
+                return [(DRAW_DECK, None), (DRAW_PILE, self.discard_pile[-1])]
+            return [(DRAW_DECK, None)]
+
+        hand = self.hands[self.to_move]
+        actions = []
+        cards = hand
+        while cards:
+            low = cards & -cards
+            cards ^= low
+            index = low.bit_length() - 1
+            actions.append((DISCARD, index))
+            left = deadwood(hand ^ low)
+            if left <= KNOCK_LIMIT:
+                actions.append((KNOCK, index))
+                if left == 0:
+                    actions.append((GIN, index))
+        return actions
+
+    # Whether an action is open to the seat to move
+    def is_legal(self, action):
+        kind, index = action
+        if self.knocker is not None:
+            return False
+        if self.phase == DRAW:
+            if kind == DRAW_DECK:
+                return True
+            return kind == DRAW_PILE and bool(self.discard_pile) and index in (None, self.discard_pile[-1])
+        if kind not in (DISCARD, KNOCK, GIN) or index is None or not self.hands[self.to_move] >> index & 1:
+            return False
+        if kind == DISCARD:
+            return True
+        left = deadwood(self.hands[self.to_move] ^ 1 << index)
+        return left == 0 if kind == GIN else left <= KNOCK_LIMIT
+
+    # Play an action for the seat to move; returns the index of the card drawn or discarded
+    def apply(self, action):
+        if not self.is_legal(action):
+            raise ValueError(f'illegal action {action!r}')
+        kind, index = action
+        if kind == DRAW_DECK:
+            return self.draw_deck()
+        if kind == DRAW_PILE:
+            return self.draw_pile()
+        return self.discard(index, kind)
+
+    # Draw the top card of the deck, shuffling the discard pile back in if the deck is empty; returns its index
+    def draw_deck(self):
+        entry = DRAW_DECK
+        if not self.deck_size:
+            self._saved.append((self.deck, self.deck_size, self.discard_pile))
+            self.deck = list(self.discard_pile)
+            self.rng.shuffle(self.deck)
+            self.deck_size = len(self.deck)
+            self.discard_pile = []
+            entry = _RESHUFFLE
+        self.deck_size -= 1
+        index = self.deck[self.deck_size]
+        self.hands[self.to_move] |= 1 << index
+        self.phase = DISCARDING
+        self.history.append(entry | index << _CARD_SHIFT)
+        return index
+
+    # Take the top card of the discard pile; returns its index
+    def draw_pile(self):
+        index = self.discard_pile.pop()
+        self.hands[self.to_move] |= 1 << index
+        self.phase = DISCARDING
+        self.history.append(DRAW_PILE | index << _CARD_SHIFT)
+        return index
+
+    # Discard a card, knocking or declaring gin with kind KNOCK or GIN (the caller checks those are legal)
+    def discard(self, index, kind=DISCARD):
+        self.hands[self.to_move] ^= 1 << index
+        self.discard_pile.append(index)
+        self.turns += 1
+        if kind == DISCARD:
+            self.to_move = 1 - self.to_move
+            self.phase = DRAW
+        else:
+            self.knocker = self.to_move
+        self.history.append(kind | index << _CARD_SHIFT)
+        return index
+
+    # Take back the last action
+    def undo(self):
+        entry = self.history.pop()
+        kind, index = entry & _KIND_BITS, entry >> _CARD_SHIFT
+        if kind == DRAW_PILE:
+            self.hands[self.to_move] ^= 1 << index
+            self.discard_pile.append(index)
+            self.phase = DRAW
+        elif kind == DRAW_DECK:
+            self.hands[self.to_move] ^= 1 << index
+            self.deck_size += 1
+            self.phase = DRAW
+        elif kind == _RESHUFFLE:
+            self.hands[self.to_move] ^= 1 << index
+            self.deck, self.deck_size, self.discard_pile = self._saved.pop()
+            self.phase = DRAW
+        else:
+            if kind == DISCARD:
+                self.to_move = 1 - self.to_move
+            else:
+                self.knocker = None
+                self._outcome = None
+            self.discard_pile.pop()
+            self.hands[self.to_move] |= 1 << index
+            self.turns -= 1
+            self.phase = DISCARDING
+
+    # Position on the undo stack, to rewind to later
+    def mark(self):
+        return len(self.history)
+
+    # Undo every action played since a mark
+    def rewind(self, mark):
+        while len(self.history) > mark:
+            self.undo()
@@ -0,0 +1,406 @@
+import itertools
+from card import RANKS
+from profiling import instrument
+
+# Bitmask meld engine
+#
+# A hand is encoded as a 52-bit integer. Each card lives at bit card.index,
+# which is suit_index * 13 + rank_index, so each suit occupies one contiguous
+# 13-bit field.
+
+SUIT_BITS = 13
+SUIT_FIELD = (1 << SUIT_BITS) - 1
+FULL_DECK = (1 << 52) - 1
+
+# Deadwood value of a card at each rank index (A=1 ... K=13), matching card_value()
+RANK_VALUES = [i + 1 for i in range(len(RANKS))]
+CARD_VALUES = [RANK_VALUES[i % SUIT_BITS] for i in range(52)]
+
+# Mask with the same rank bit set in every suit field
+RANK_MASKS = [sum(1 << (s * SUIT_BITS + r) for s in range(4)) for r in range(SUIT_BITS)]
+
+
+# Encode a collection of cards as a 52-bit mask
+def hand_mask(cards):
+    mask = 0
+    for card in cards:
+        mask |= card.bit
+    return mask
+
+
+# Iterate over the bit indexes set in a mask, lowest first
+def iter_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+# Sum the deadwood value of every card in a mask
+def mask_value(mask):
+    return sum(CARD_VALUES[i] for i in iter_bits(mask))
+
+
+# Build every legal run (3+ consecutive ranks of one suit) as a bitmask
+def _build_runs():
+    runs = []
+    for suit in range(4):
+        for start in range(SUIT_BITS):
+            for end in range(start + 3, SUIT_BITS + 1):
+                field = ((1 << (end - start)) - 1) << start
+                runs.append(field << (suit * SUIT_BITS))
+    return runs
+
+
+# Build every legal set (3 or 4 cards of one rank) as a bitmask
+def _build_sets():
+    sets = []
+    for rank_mask in RANK_MASKS:
+        sets.append(rank_mask)
+        for combo in itertools.combinations(iter_bits(rank_mask), 3):
+            sets.append(sum(1 << i for i in combo))
+    return sets
+
+
+RUN_MASKS = _build_runs()
+SET_MASKS = _build_sets()
+ALL_MELD_MASKS = RUN_MASKS + SET_MASKS
+
+# Candidate melds indexed by the card they contain
+MELDS_BY_CARD = [[meld for meld in ALL_MELD_MASKS if meld >> i & 1] for i in range(52)]
+
+# Rank masks keyed by the rank's bit in a 13-bit field
+_RANK_MASK_BY_BIT = {1 << rank: rank_mask for rank, rank_mask in enumerate(RANK_MASKS)}
+
+# Run-only solutions for every 13-bit suit field, filled by _solve_suit below
+_SUIT_DEADWOOD = [0] * (1 << SUIT_BITS)
+_SUIT_RUNS = [()] * (1 << SUIT_BITS)
+
+
+# Solve the runs-only problem for every suit field in increasing mask order.
+# Each field is split on its lowest card: either that card is deadwood, or it
+# starts a run of three or more consecutive ranks. Every smaller field has
+# already been solved, so each entry is a memoized lookup of its remainders.
+def _solve_suit():
+    for field in range(1, 1 << SUIT_BITS):
+        low = field & -field
+        rank = low.bit_length() - 1
+        best = _SUIT_DEADWOOD[field ^ low] + RANK_VALUES[rank]
+        best_runs = _SUIT_RUNS[field ^ low]
+
+        run = low
+        top = rank + 1
+        while top < SUIT_BITS and field >> top & 1:
+            run |= 1 << top
+            top += 1
+            if top - rank >= 3:
+                rest = field & ~run
+                if _SUIT_DEADWOOD[rest] < best:
+                    best = _SUIT_DEADWOOD[rest]
+                    best_runs = _SUIT_RUNS[rest] + (run,)
+
+        _SUIT_DEADWOOD[field] = best
+        _SUIT_RUNS[field] = best_runs
+
+
+_solve_suit()
+
+
+# Get the ranks (as a 13-bit field) held in at least three suits
+def set_ranks(mask):
+    h = mask & SUIT_FIELD
+    d = mask >> SUIT_BITS & SUIT_FIELD
+    c = mask >> 2 * SUIT_BITS & SUIT_FIELD
+    s = mask >> 3 * SUIT_BITS
+    return (h & d & (c | s)) | (c & s & (h | d))
+
+
+# Get the set choices for one rank: no set, each three-card set, or the full four
+def _set_options(mask, rank):
+    cards = mask & RANK_MASKS[rank]
+    options = [0]
+    if cards == RANK_MASKS[rank]:
+        options.extend(cards & ~(1 << (s * SUIT_BITS + rank)) for s in range(4))
+    options.append(cards)
+    return options
+
+
+# Deadwood left when only runs are allowed
+def _runs_deadwood(mask):
+    return (_SUIT_DEADWOOD[mask & SUIT_FIELD]
+            + _SUIT_DEADWOOD[mask >> SUIT_BITS & SUIT_FIELD]
+            + _SUIT_DEADWOOD[mask >> 2 * SUIT_BITS & SUIT_FIELD]
+            + _SUIT_DEADWOOD[mask >> 3 * SUIT_BITS])
+
+
+# Collect the runs chosen for each suit field, shifted back into the 52-bit mask
+def _runs_melds(mask):
+    melds = []
+    for shift in (0, SUIT_BITS, 2 * SUIT_BITS, 3 * SUIT_BITS):
+        runs = _SUIT_RUNS[mask >> shift & SUIT_FIELD]
+        if runs:
+            melds += [run << shift for run in runs]
+    return melds
+
+
+# Find the minimum-deadwood meld partition of a hand mask
+#
+# Runs never cross suits and sets never share a rank, so the search only has to
+# branch over the set choices for ranks held in three or more suits. Every
+# branch is then scored by the memoized per-suit run tables. The search stops
+# early once a branch reaches zero deadwood, since nothing can beat gin.
+#
+# Returns (deadwood, melds) where melds is a tuple of meld bitmasks.
+@instrument
+def solve(mask, _table=_SUIT_DEADWOOD):
+    ranks = set_ranks(mask)
+    if not ranks:
+        return _runs_deadwood(mask), tuple(_runs_melds(mask))
+
+    # The set choices of every set rank combined, lowest rank varying slowest:
+    # no set, each three-card set of a four-card rank, or all of the rank
+    removals = [0]
+    set_masks = []
+    for rank in iter_bits(ranks):
+        full = RANK_MASKS[rank]
+        cards = mask & full
+        if cards == full:
+            low = 1 << rank
+            options = (0, cards ^ low, cards ^ low << SUIT_BITS, cards ^ low << 2 * SUIT_BITS, cards ^ low << 3 * SUIT_BITS, cards)
+        else:
+            options = (0, cards)
+        removals = [used | option for used in removals for option in options]
+        set_masks.append(full)
+
+    best = None
+    best_used = 0
+    for used in removals:
+        rest = mask ^ used
+        value = (_table[rest & SUIT_FIELD] + _table[rest >> SUIT_BITS & SUIT_FIELD]
+                 + _table[rest >> 2 * SUIT_BITS & SUIT_FIELD] + _table[rest >> 3 * SUIT_BITS])
+        if best is None or value < best:
+            best, best_used = value, used
+            if best == 0:
+                break
+
+    melds = _runs_melds(mask ^ best_used) + [best_used & full for full in set_masks if best_used & full]
+    return best, tuple(melds)
+
+
+# Get the minimum deadwood of a hand mask
+#
+# This is the hot path for simulation, so the common case of a hand without
+# any possible set is inlined into four table lookups.
+def deadwood(mask, _table=_SUIT_DEADWOOD):
+    h = mask & 0x1FFF
+    d = mask >> 13 & 0x1FFF
+    c = mask >> 26 & 0x1FFF
+    s = mask >> 39
+    ranks = (h & d & (c | s)) | (c & s & (h | d))
+    if not ranks:
+        return _table[h] + _table[d] + _table[c] + _table[s]
+
+    # Each set rank is either left to the runs or melded as a set. A four-card
+    # rank may also meld any three of its cards and give the fourth to a run.
+    removals = [0]
+    while ranks:
+        low = ranks & -ranks
+        ranks ^= low
+        full = _RANK_MASK_BY_BIT[low]
+        cards = mask & full
+        if cards == full:
+            options = (cards, cards ^ low, cards ^ low << 13, cards ^ low << 26, cards ^ low << 39)
+        else:
+            options = (cards,)
+        removals += [used | option for used in removals for option in options]
+
+    best = _table[h] + _table[d] + _table[c] + _table[s]
+    for used in removals[1:]:
+        rest = mask ^ used
+        value = _table[rest & 0x1FFF] + _table[rest >> 13 & 0x1FFF] + _table[rest >> 26 & 0x1FFF] + _table[rest >> 39]
+        if value < best:
+            best = value
+    return best
+
+
+# Best single card to drop from each 13-bit suit field, ignoring sets, packed as
+# gain * 16 + rank: the drop in runs-only deadwood, and the highest such rank
+def _build_drop_table():
+    table = [-1 << 20] * (1 << SUIT_BITS)
+    for field in range(1, 1 << SUIT_BITS):
+        before = _SUIT_DEADWOOD[field]
+        best = None
+        remaining = field
+        while remaining:
+            low = remaining & -remaining
+            remaining ^= low
+            key = (before - _SUIT_DEADWOOD[field ^ low]) * 16 + low.bit_length() - 1
+            if best is None or key > best:
+                best = key
+        table[field] = best
+    return table
+
+
+_DROP = _build_drop_table()
+
+
+# Choose the greedy discard for a hand: returns (deadwood left, card bit)
+@instrument
+def best_discard(mask, _table=_SUIT_DEADWOOD, _drop=_DROP):
+    h = mask & SUIT_FIELD
+    d = mask >> SUIT_BITS & SUIT_FIELD
+    c = mask >> 2 * SUIT_BITS & SUIT_FIELD
+    s = mask >> 3 * SUIT_BITS
+    if not (h & d & (c | s)) | (c & s & (h | d)):
+        # Without sets each suit scores alone, so the best drop is a lookup per suit
+        best, shift = _drop[h], 0
+        for key, field_shift in ((_drop[d], SUIT_BITS), (_drop[c], 2 * SUIT_BITS), (_drop[s], 3 * SUIT_BITS)):
+            if key > best:
+                best, shift = key, field_shift
+        total = _table[h] + _table[d] + _table[c] + _table[s]
+        return total - (best >> 4), 1 << (shift + (best & 15))
+
+    # Dropping a card of value v leaves at least (deadwood - v), so cards are
+    # tried from the highest rank down until that bound cannot beat the best
+    current = deadwood(mask)
+    best, best_bit = None, 0
+    for rank in range(SUIT_BITS - 1, -1, -1):
+        if best is not None and current - RANK_VALUES[rank] >= best:
+            break
+        cards = mask & RANK_MASKS[rank]
+        while cards:
+            low = cards & -cards
+            cards ^= low
+            value = deadwood(mask ^ low)
+            if best is None or value < best:
+                best, best_bit = value, low
+    return best, best_bit
+
+
+# Every run contained in each 13-bit suit field, by starting rank and then
+# length. The runs starting at a field's lowest card come first, then those of
+# the field without it.
+def _build_field_runs():
+    table = [()] * (1 << SUIT_BITS)
+    for field in range(1, 1 << SUIT_BITS):
+        low = field & -field
+        run = low | low << 1 | low << 2
+        starting = []
+        while run & field == run:
+            starting.append(run)
+            run |= run << 1
+        table[field] = tuple(starting) + table[field ^ low]
+    return table
+
+
+_FIELD_RUNS = _build_field_runs()
+
+
+# Get every run of one suit contained in a hand mask
+def suit_runs(mask, suit):
+    shift = suit * SUIT_BITS
+    return [run << shift for run in _FIELD_RUNS[mask >> shift & SUIT_FIELD]]
+
+
+# Get every set of one rank contained in a hand mask, largest first
+def rank_sets(mask, rank):
+    if (mask & RANK_MASKS[rank]).bit_count() < 3:
+        return []
+    return _set_options(mask, rank)[1:][::-1]
+
+
+# Get every meld (as a bitmask) contained in a hand mask, runs by suit then sets by rank
+def candidate_melds(mask):
+    melds = []
+    for shift in (0, SUIT_BITS, 2 * SUIT_BITS, 3 * SUIT_BITS):
+        for run in _FIELD_RUNS[mask >> shift & SUIT_FIELD]:
+            melds.append(run << shift)
+    ranks = set_ranks(mask)
+    if ranks:
+        for rank in iter_bits(ranks):
+            melds.extend(rank_sets(mask, rank))
+    return melds
+
+
+# Every rank bit except the king's, so a card's upward neighbour stays in its suit
+_BELOW_KING = FULL_DECK & ~RANK_MASKS[SUIT_BITS - 1]
+# One copy of a 13-bit rank field in every suit field
+_ALL_SUITS = 1 | 1 << SUIT_BITS | 1 << 2 * SUIT_BITS | 1 << 3 * SUIT_BITS
+
+
+# Get the "possible" deadwood among a mask of deadwood cards: cards that share
+# their rank with exactly one other card, or sit next to a card of their suit
+def possible_deadwood_mask(mask):
+    h = mask & SUIT_FIELD
+    d = mask >> SUIT_BITS & SUIT_FIELD
+    c = mask >> 2 * SUIT_BITS & SUIT_FIELD
+    s = mask >> 3 * SUIT_BITS
+    two_or_more = (h & (d | c | s)) | (d & (c | s)) | (c & s)
+    three_or_more = (h & d & (c | s)) | (c & s & (h | d))
+    pairs = (two_or_more & ~three_or_more) * _ALL_SUITS
+
+    adjacent = mask & mask >> 1 & _BELOW_KING
+    return mask & (pairs | adjacent | adjacent << 1)
+
+
+# Suit isomorphism
+#
+# Meld structure does not depend on which suit is which, so the 24 suit
+# relabellings of a hand all have the same deadwood and the same melds up to
+# relabelling. The canonical form of a hand has its suit fields in
+# descending order; caches and tables keyed on it hold up to 24x fewer
+# entries. Results found for the canonical form are mapped back with
+# restore(). Suits with equal fields keep their original order, so mapping
+# back is deterministic.
+
+
+# Map a hand mask to its canonical form; returns (canonical mask, order) where
+# order[i] is the real suit placed at canonical suit i
+def canonicalize(mask):
+    fields = [mask & SUIT_FIELD, mask >> SUIT_BITS & SUIT_FIELD, mask >> 2 * SUIT_BITS & SUIT_FIELD, mask >> 3 * SUIT_BITS]
+    order = sorted(range(4), key=fields.__getitem__, reverse=True)
+    canonical = (fields[order[0]] | fields[order[1]] << SUIT_BITS
+                 | fields[order[2]] << 2 * SUIT_BITS | fields[order[3]] << 3 * SUIT_BITS)
+    return canonical, order
+
+
+# Get only the canonical mask of a hand, without the permutation
+def canonical_key(mask):
+    a, b, c, d = sorted((mask & SUIT_FIELD, mask >> SUIT_BITS & SUIT_FIELD,
+                         mask >> 2 * SUIT_BITS & SUIT_FIELD, mask >> 3 * SUIT_BITS), reverse=True)
+    return a | b << SUIT_BITS | c << 2 * SUIT_BITS | d << 3 * SUIT_BITS
+
+
+# Map a mask from canonical suits back to the real suits given by canonicalize()
+def restore(mask, order):
+    return ((mask & SUIT_FIELD) << order[0] * SUIT_BITS
+            | (mask >> SUIT_BITS & SUIT_FIELD) << order[1] * SUIT_BITS
+            | (mask >> 2 * SUIT_BITS & SUIT_FIELD) << order[2] * SUIT_BITS
+            | (mask >> 3 * SUIT_BITS) << order[3] * SUIT_BITS)
+
+
+# Solve a hand through its canonical form, so every suit relabelling of a
+# hand gets the same partition (solve() itself breaks some ties by suit).
+# With `within`, only the hand's cards in that mask are searched, still in
+# the suit order of the whole hand.
+def solve_canonical(mask, within=None):
+    fields = [mask & SUIT_FIELD, mask >> SUIT_BITS & SUIT_FIELD, mask >> 2 * SUIT_BITS & SUIT_FIELD, mask >> 3 * SUIT_BITS]
+    order = sorted(range(4), key=fields.__getitem__, reverse=True)
+    if within is not None:
+        mask &= within
+        fields = [mask & SUIT_FIELD, mask >> SUIT_BITS & SUIT_FIELD, mask >> 2 * SUIT_BITS & SUIT_FIELD, mask >> 3 * SUIT_BITS]
+    if not set_ranks(mask):
+        # Without sets every suit keeps its own best runs, listed in canonical suit order
+        melds = []
+        for suit in order:
+            runs = _SUIT_RUNS[fields[suit]]
+            if runs:
+                shift = suit * SUIT_BITS
+                melds += [run << shift for run in runs]
+        return _SUIT_DEADWOOD[fields[0]] + _SUIT_DEADWOOD[fields[1]] + _SUIT_DEADWOOD[fields[2]] + _SUIT_DEADWOOD[fields[3]], tuple(melds)
+    canonical = (fields[order[0]] | fields[order[1]] << SUIT_BITS
+                 | fields[order[2]] << 2 * SUIT_BITS | fields[order[3]] << 3 * SUIT_BITS)
+    deadwood, melds = solve(canonical)
+    a, b, c, d = (suit * SUIT_BITS for suit in order)
+    return deadwood, tuple([(meld & SUIT_FIELD) << a | (meld >> SUIT_BITS & SUIT_FIELD) << b
+                            | (meld >> 2 * SUIT_BITS & SUIT_FIELD) << c | (meld >> 3 * SUIT_BITS) << d for meld in melds])
@@ -0,0 +1,318 @@
+import argparse
+import multiprocessing
+import random
+import time
+
+from card import CARDS
+from card_tracker import OPPONENT
+from layoff import best_layoff
+from meld_engine import best_discard, deadwood, solve_canonical
+from player import Bot
+from profiling import instrument
+from rules import KNOCK_LIMIT, round_points
+
+# Monte Carlo lookahead bot
+#
+# Every decision (take the discard or draw from the deck; which card to
+# discard, and whether to knock) is scored by sampling the cards the bot
+# cannot see. Each sample deals the opponent's hand and the deck order from
+# the unseen cards, then plays the round out with a fast greedy policy on
+# hand masks. All candidates share the same samples, so their differences
+# are not drowned in dealing noise. The candidate with the best mean points
+# is played.
+#
+# Rollouts never touch Hand objects or the meld lists: the greedy policy
+# picks its discard from a per-suit table, and only the final scoring calls
+# the full meld solver and the layoff engine.
+
+OPPONENT_CARDS = 10
+STOCK_SIZE = 32  # Cards left in the deck after the deal
+MAX_IMPROVE = 10  # Cap on the greedy turns replayed for a sampled opponent hand
+DEFAULT_ROLLOUTS = 64  # Samples per decision; each sample plays out every candidate
+DEFAULT_TIME_LIMIT = 0.25  # Latency cap per decision, in seconds
+
+# Candidate kinds
+TAKE_DISCARD = 0
+DRAW_DECK = 1
+DISCARD = 2
+
+
+# Points the knocker scores when knocking with these hands (negative when
+# undercut), scored by rules.round_points after the defender's best layoff
+def knock_points(knocker, defender):
+    knocker_deadwood, knocker_melds = solve_canonical(knocker)
+    kind, points = round_points(knocker_deadwood, best_layoff(knocker_melds, defender)[0])
+    return -points if kind == 'undercut' else points
+
+
+# Play a round out greedily with the opponent to move; returns points for "me"
+#
+# Each player takes the top discard if that lowers their deadwood after the
+# best discard, otherwise draws from the deck, and knocks as soon as they can.
+# A round that runs out of deck cards scores nothing.
+def playout(me, opponent, deck, top):
+    hands = [opponent, me]
+    levels = [deadwood(opponent), deadwood(me)]
+    player = 0
+    while True:
+        hand = hands[player]
+        level, bit = best_discard(hand | top)
+        if level < levels[player]:
+            hand |= top
+        elif deck:
+            hand |= 1 << deck.pop()
+            level, bit = best_discard(hand)
+        else:
+            return 0
+        hand ^= bit
+        hands[player] = hand
+        levels[player] = level
+        top = bit
+        if level <= KNOCK_LIMIT:
+            points = knock_points(hand, hands[1 - player])
+            return points if player == 1 else -points
+        player = 1 - player
+
+
+# Play one candidate for "me" in a sampled deal; returns points for "me"
+def simulate(me, top, candidate, opponent, deck):
+    kind, bit, knock = candidate
+    if kind == DISCARD:
+        hand = me ^ bit
+        if knock:
+            return knock_points(hand, opponent)
+        return playout(hand, opponent, deck, bit)
+
+    if kind == TAKE_DISCARD:
+        hand = me | top
+    elif deck:
+        hand = me | 1 << deck.pop()
+    else:
+        return 0
+    level, bit = best_discard(hand)
+    hand ^= bit
+    if level <= KNOCK_LIMIT:
+        return knock_points(hand, opponent)
+    return playout(hand, opponent, deck, bit)
+
+
+# Run samples until the count or the deadline is reached
+#
+# The opponent holds the `known` cards (seen taken from the discard pile) and
+# the rest of its hand is sampled from the unseen cards. A uniformly dealt
+# hand is far weaker than one that has been played for a while, so the
+# sampled part is dealt `improve` extra cards and then greedily discards that
+# many, as if it had drawn them over past turns. The discarded cards go back
+# into the deck.
+#
+# Returns (summed points per candidate, samples run). Deadlines use
+# time.time() so they hold across worker processes.
+def run_rollouts(me, top, candidates, known, unseen, deck_size, improve, seed, count, deadline):
+    rng = random.Random(seed)
+    unseen = list(unseen)
+    sampled = max(0, OPPONENT_CARDS - known.bit_count())
+    improve = max(0, min(improve, len(unseen) - sampled))
+    totals = [0] * len(candidates)
+    done = 0
+    while done < count and time.time() < deadline:
+        rng.shuffle(unseen)
+        opponent = 0
+        for index in unseen[:sampled + improve]:
+            opponent |= 1 << index
+        for _ in range(improve):
+            opponent ^= best_discard(opponent)[1]
+        deck = [index for index in unseen if not opponent >> index & 1][:deck_size]
+        opponent |= known
+        for i, candidate in enumerate(candidates):
+            totals[i] += simulate(me, top, candidate, opponent, list(deck))
+        done += 1
+    return totals, done
+
+
+# Pool entry point
+def _rollout_task(task):
+    return run_rollouts(*task)
+
+
+# A bot that picks every move by Monte Carlo rollouts
+#
+# rollouts is the number of sampled deals per decision and time_limit caps
+# the time spent on one decision; whichever is reached first ends the
+# search. With workers > 1 the samples are split across a process pool,
+# created on first use and released by close(). Inside a daemonic pool
+# worker (the tournament, sweep and ladder run matches in one) no child
+# processes can be started, so the bot searches in its own process there. A
+# decision cut short by the time limit depends on machine speed, so only
+# rollout-limited play is reproducible from a seed.
+#
+# The bot remembers each card it discards; when the opponent's next turn
+# took it from the pile, the card is known to be in the opponent's hand and
+# is dealt to it in every sample until it comes back to the pile.
+class MonteCarloBot(Bot):
+    def __init__(self, gin_rummy_instance, rng=None, rollouts=DEFAULT_ROLLOUTS, time_limit=DEFAULT_TIME_LIMIT, workers=1):
+        self.rollouts = rollouts
+        self.time_limit = time_limit
+        self.workers = 1 if multiprocessing.current_process().daemon else workers
+        self._pool = None
+        self._round_hand = None  # Hand of the round the pile observations below belong to
+        self._last_discard = None  # (card, pile length) of this bot's last discard, until its next draw
+        self._taken = 0  # Mask of the cards seen taken from the pile by the opponent
+
+        # Throughput metrics
+        self.decisions = 0
+        self.rollout_count = 0  # Candidate playouts, summed over all decisions
+        self.search_seconds = 0.0
+        self.max_latency = 0.0
+        super().__init__(gin_rummy_instance, rng)
+
+    # Candidate playouts per second of search
+    @property
+    def rollouts_per_second(self):
+        return self.rollout_count / self.search_seconds if self.search_seconds else 0.0
+
+    # Release the worker pool
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    # Note whether the opponent's last turn took this bot's discard from the pile
+    #
+    # A deck draw leaves the pile one card longer with the bot's discard under
+    # the opponent's; taking it keeps the length and covers it with another card.
+    def _observe(self, discard_pile):
+        if self._round_hand is not self.hand:
+            # A new round deals a new hand
+            self._round_hand, self._last_discard, self._taken = self.hand, None, 0
+        if self._last_discard is not None:
+            card, length = self._last_discard
+            if len(discard_pile) == length and discard_pile[-1] is not card:
+                self._taken |= card.bit
+            self._last_discard = None
+
+    # (cards known to be in the opponent's hand, indices of the cards not seen)
+    def _unknowns(self, hand_mask):
+        seen = hand_mask
+        for card in self.gin_rummy.discard_pile:
+            seen |= card.bit
+        known = self._taken & ~seen
+        if self.tracker is not None:
+            for index, location in enumerate(self.tracker.location):
+                if location == OPPONENT:
+                    known |= 1 << index
+        seen |= known
+        return known, [card.index for card in CARDS if not seen >> card.index & 1]
+
+    # Score the candidates on sampled deals; returns the index of the best one
+    def _search(self, top, candidates, deck_size):
+        start = time.perf_counter()
+        deadline = time.time() + self.time_limit
+        me = self.hand.mask
+        known, unseen = self._unknowns(me | (top.bit if top else 0))
+        top_bit = top.bit if top else 0
+        seed = self.rng.getrandbits(64)
+        # Roughly half the cards drawn from the stock so far went to the opponent
+        improve = min(MAX_IMPROVE, max(0, STOCK_SIZE - deck_size) // 2)
+
+        if self.workers > 1:
+            if self._pool is None:
+                self._pool = multiprocessing.get_context('fork').Pool(self.workers)
+            share = -(-self.rollouts // self.workers)
+            tasks = [(me, top_bit, candidates, known, unseen, deck_size, improve, seed + i, share, deadline) for i in range(self.workers)]
+            results = self._pool.map(_rollout_task, tasks)
+        else:
+            results = [run_rollouts(me, top_bit, candidates, known, unseen, deck_size, improve, seed, self.rollouts, deadline)]
+
+        totals = [0] * len(candidates)
+        samples = 0
+        for chunk_totals, done in results:
+            samples += done
+            for i, value in enumerate(chunk_totals):
+                totals[i] += value
+
+        elapsed = time.perf_counter() - start
+        self.decisions += 1
+        self.rollout_count += samples * len(candidates)
+        self.search_seconds += elapsed
+        self.max_latency = max(self.max_latency, elapsed)
+
+        # Candidates are listed greedy-first, so ties and empty searches keep the greedy move
+        return max(range(len(candidates)), key=lambda i: (totals[i], -i))
+
+    # Choose between the top discard and the deck by rollouts
+    @instrument
+    def choose_draw_source(self, discard_pile, deck):
+        self._observe(discard_pile)
+        if not discard_pile or not deck.cards:
+            return super().choose_draw_source(discard_pile, deck)
+
+        candidates = [(DRAW_DECK, 0, 0), (TAKE_DISCARD, 0, 0)]
+        if best_discard(self.hand.mask | discard_pile[-1].bit)[0] < self.current_deadwood_sum:
+            candidates.reverse()
+        # The top discard is taken out of the pile while sampling, so it is not counted as unseen
+        top = discard_pile.pop()
+        choice = candidates[self._search(top, candidates, len(deck.cards))][0]
+        discard_pile.append(top)
+        return 'pile' if choice == TAKE_DISCARD else 'deck'
+
+    # Choose the discard, and whether to knock, by rollouts
+    @instrument
+    def choose_card_to_discard(self):
+        mask = self.hand.mask
+        _, greedy_bit = best_discard(mask)
+        # Only unmelded cards and the greedy choice are worth a rollout; fewer
+        # candidates also means less noise in picking the best mean
+        choices = self.hand.analysis.deadwood_mask | greedy_bit
+        candidates = []
+        for card in sorted(self.hand, key=lambda card: card.bit != greedy_bit):
+            if not choices & card.bit:
+                continue
+            if deadwood(mask ^ card.bit) <= KNOCK_LIMIT:
+                candidates.append((DISCARD, card.bit, 1))
+            candidates.append((DISCARD, card.bit, 0))
+
+        _, bit, knock = candidates[self._search(None, candidates, len(self.gin_rummy.deck.cards))]
+        card = CARDS[bit.bit_length() - 1]
+        self._last_discard = (card, len(self.gin_rummy.discard_pile) + 1)
+        if not knock:
+            return ('discard', card)
+        return ('gin' if deadwood(mask ^ bit) == 0 else 'knock', card)
+
+
+def main():
+    from functools import partial
+
+    from simulation import HeadlessGinRummy
+
+    parser = argparse.ArgumentParser(description='Play the Monte Carlo bot against the greedy bot.')
+    parser.add_argument('--matches', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rollouts', type=int, default=DEFAULT_ROLLOUTS, help='sampled deals per decision')
+    parser.add_argument('--time-limit', type=float, default=DEFAULT_TIME_LIMIT, help='latency cap per decision, in seconds')
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    factory = partial(MonteCarloBot, rollouts=args.rollouts, time_limit=args.time_limit, workers=args.workers)
+    wins = [0, 0]
+    decisions = rollouts = 0
+    seconds = max_latency = 0.0
+    for i in range(args.matches):
+        game = HeadlessGinRummy(args.seed + i, agents=(factory, Bot))
+        result = game.play_match()
+        if result.winner is not None:
+            wins[result.winner] += 1
+        bot = game.player
+        bot.close()
+        decisions += bot.decisions
+        rollouts += bot.rollout_count
+        seconds += bot.search_seconds
+        max_latency = max(max_latency, bot.max_latency)
+
+    print(f'wins: Monte Carlo {wins[0]}, greedy {wins[1]} over {args.matches} matches')
+    print(f'{decisions} decisions, {rollouts / seconds if seconds else 0:,.0f} rollouts/s, '
+          f'{seconds / decisions * 1000 if decisions else 0:.1f} ms mean, {max_latency * 1000:.1f} ms max latency')
+
+
+if __name__ == '__main__':
+    main()
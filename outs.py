@@ -0,0 +1,191 @@
+from card import CARDS
+from meld_engine import (FULL_DECK, RANK_MASKS, SUIT_BITS, SUIT_FIELD, _DROP, _SUIT_DEADWOOD, best_discard,
+                         deadwood)
+
+# Outs index: the exact deadwood after drawing each unseen card
+#
+# For every card not in the hand, the index holds the deadwood left after
+# drawing it and making the best discard. It is built in one pass over the
+# 42 or so candidates. Without sets each suit scores alone, so drawing a
+# card only changes its own suit: the value is the other suits' deadwood
+# plus a lookup for the new suit field, less the best drop gain of any suit
+# (the same per-suit tables as meld_engine.best_discard). Sets the hand
+# already holds are handled by running that pass once per way of melding
+# them, and a card that would give its rank a new set (the hand holds two
+# or three of its rank) adds that set's choices for its own value.
+#
+# The index follows the hand card by card (see HandAnalysis.outs): a draw or
+# discard updates one suit field and one rank count, and the values are
+# rebuilt on the next lookup. The draw decision and the player assist read
+# it instead of solving the hand again for every candidate card.
+
+NO_VALUE = 1 << 20  # Placeholder while building, above any deadwood
+MAX_DRAWS = 1 << 16  # _suit_draws entries kept before the memo is cleared
+
+_DRAWS = {}
+
+
+# The set choices for a rank held in three or four suits: all its cards, and each three of four
+def _set_options(mask, rank):
+    cards = mask & RANK_MASKS[rank]
+    if cards != RANK_MASKS[rank]:
+        return (cards,)
+    return (cards,) + tuple(cards ^ 1 << suit * SUIT_BITS + rank for suit in range(4))
+
+
+# (rank, runs-only deadwood, best drop gain) of a suit field after drawing each rank in a mask of draws
+def _suit_draws(field, draws, _table=_SUIT_DEADWOOD, _drop=_DROP):
+    key = field | draws << SUIT_BITS
+    found = _DRAWS.get(key)
+    if found is None:
+        found = []
+        while draws:
+            low = draws & -draws
+            draws ^= low
+            drawn = field | low
+            found.append((low.bit_length() - 1, _table[drawn], _drop[drawn] >> 4))
+        if len(_DRAWS) >= MAX_DRAWS:
+            _DRAWS.clear()
+        found = _DRAWS[key] = tuple(found)
+    return found
+
+
+class OutsIndex:
+    # Initialize the index for a hand mask
+    def __init__(self, mask=0):
+        self.mask = mask
+        self.fields = [mask >> suit * SUIT_BITS & SUIT_FIELD for suit in range(4)]
+        self.rank_counts = [(mask & rank_mask).bit_count() for rank_mask in RANK_MASKS]
+        self._values = None
+        self._deadwood = None
+        self._discard_deadwood = None
+
+    # Update the index for a card added to the hand
+    def add(self, card):
+        self.mask |= card.bit
+        self.fields[card.suit_index] |= 1 << card.rank_index
+        self.rank_counts[card.rank_index] += 1
+        self._values = None
+        self._deadwood = None
+        self._discard_deadwood = None
+
+    # Update the index for a card removed from the hand
+    def remove(self, card):
+        self.mask &= ~card.bit
+        self.fields[card.suit_index] &= ~(1 << card.rank_index)
+        self.rank_counts[card.rank_index] -= 1
+        self._values = None
+        self._deadwood = None
+        self._discard_deadwood = None
+
+    # Minimum deadwood of the hand as it stands
+    @property
+    def deadwood(self):
+        if self._deadwood is None:
+            self._deadwood = deadwood(self.mask)
+        return self._deadwood
+
+    # Deadwood after drawing each card and discarding the best card, by card index; None for cards in the hand
+    @property
+    def values(self):
+        if self._values is None:
+            self._values = self._build()
+        return self._values
+
+    def _build(self, _table=_SUIT_DEADWOOD, _drop=_DROP):
+        mask, counts = self.mask, self.rank_counts
+
+        # Every way of melding the sets already in the hand, as in meld_engine.deadwood
+        removals = [0]
+        pairs = 0  # Ranks a draw would give a new set
+        for rank in range(SUIT_BITS):
+            if counts[rank] >= 2:
+                pairs |= 1 << rank
+                if counts[rank] >= 3:
+                    removals += [used | option for used in removals for option in _set_options(mask, rank)]
+        values = [NO_VALUE] * 52
+        draws = [SUIT_FIELD & ~field for field in self.fields]
+
+        for used in removals:
+            rest = mask ^ used
+            fields = [rest >> suit * SUIT_BITS & SUIT_FIELD for suit in range(4)]
+            suit_deadwood = [_table[field] for field in fields]
+            gains = [_drop[field] >> 4 for field in fields]
+            total = sum(suit_deadwood)
+            # The best gain of the other suits is the top gain, or the runner-up for the suit holding it
+            top = max(range(4), key=gains.__getitem__)
+            runner_up = max(gains[:top] + gains[top + 1:])
+            for suit in range(4):
+                shift = suit * SUIT_BITS
+                base = total - suit_deadwood[suit]
+                other = runner_up if suit == top else gains[top]
+                for rank, drawn_deadwood, gain in _suit_draws(fields[suit], draws[suit]):
+                    value = base + drawn_deadwood - (gain if gain > other else other)
+                    if value < values[shift + rank]:
+                        values[shift + rank] = value
+
+        # A card that gives its rank a set also gets that set's choices, with
+        # the other ranks melded every way the hand allows
+        while pairs:
+            low_rank = pairs & -pairs
+            pairs ^= low_rank
+            rank = low_rank.bit_length() - 1
+            rank_mask = RANK_MASKS[rank]
+            free = rank_mask & ~mask
+            while free:
+                low = free & -free
+                free ^= low
+                drawn = mask | low
+                options = _set_options(drawn, rank)
+                best = values[low.bit_length() - 1]
+                for used in removals:
+                    if used & rank_mask:
+                        continue
+                    for option in options:
+                        rest = drawn ^ used ^ option
+                        h = rest & SUIT_FIELD
+                        d = rest >> SUIT_BITS & SUIT_FIELD
+                        c = rest >> 2 * SUIT_BITS & SUIT_FIELD
+                        s = rest >> 3 * SUIT_BITS
+                        value = (_table[h] + _table[d] + _table[c] + _table[s]
+                                 - (max(_drop[h], _drop[d], _drop[c], _drop[s]) >> 4))
+                        if value < best:
+                            best = value
+                values[low.bit_length() - 1] = best
+        return [None if value >= NO_VALUE else value for value in values]
+
+    # Deadwood after drawing a card and discarding the best card
+    def value(self, card):
+        return self.values[card.index]
+
+    # Deadwood of the hand after discarding its best card
+    @property
+    def discard_deadwood(self):
+        if self._discard_deadwood is None:
+            self._discard_deadwood = best_discard(self.mask)[0] if self.mask else 0
+        return self._discard_deadwood
+
+    # Whether drawing a card lowers the deadwood with the card joining a meld.
+    # Left unmelded, a card at best replaces the hand's best discard, so a
+    # card scoring below that swap is melded.
+    def is_out(self, card):
+        value = self.values[card.index]
+        return value is not None and value < min(self.deadwood, self.discard_deadwood + card.value)
+
+    # The outs among a mask of unseen cards, as (card, deadwood after) pairs, best first
+    def outs(self, unseen=FULL_DECK):
+        values = self.values
+        found = [(CARDS[index], values[index]) for index in range(52)
+                 if unseen >> index & 1 and self.is_out(CARDS[index])]
+        found.sort(key=lambda item: item[1])
+        return found
+
+    # Mean deadwood after drawing one of the unseen cards uniformly at random
+    def expected(self, unseen):
+        values = self.values
+        total = count = 0
+        for index in range(52):
+            if unseen >> index & 1 and values[index] is not None:
+                total += values[index]
+                count += 1
+        return total / count if count else self.deadwood
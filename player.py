@@ -1,6 +1,20 @@
 import random
 from hand import Hand
-from best_melds import identify_melds, find_best_meld, card_value, find_possible_deadwood
+from best_melds import card_value
+from decision_table import default_table
+from meld_engine import FULL_DECK
+from profiling import instrument
+
+# With a card tracker, the bot avoids discards the opponent could meld with at least this probability
+FEED_RISK_LIMIT = 0.5
+
+# Default strategy parameters; sweep.py searches over them
+KNOCK_THRESHOLD = 10  # Knock once the deadwood left after the discard is at most this
+PICK_MARGIN = 0.0  # Take the top discard only if it beats the expected deck draw by more than this
+# Card to discard from a meld of four or more when going gin: 'random' (a random card of a
+# set, the top of a run), 'high' (the highest card) or 'low' (the lowest card)
+GIN_QUAD_POLICIES = ('random', 'high', 'low')
+GIN_QUAD_POLICY = 'random'
 
 # Define a player class
 class Player:
@@ -12,70 +26,120 @@ class Player:
 # Define a bot class that inherits from player
 class Bot(Player):
 
-    def __init__(self, gin_rummy_instance):
+    def __init__(self, gin_rummy_instance, rng=None, knock_threshold=KNOCK_THRESHOLD, pick_margin=PICK_MARGIN,
+                 gin_quad_policy=GIN_QUAD_POLICY):
         super().__init__()  # Call the parent class's initializer
+        if gin_quad_policy not in GIN_QUAD_POLICIES:
+            raise ValueError(f'unknown gin quad policy {gin_quad_policy!r}')
         self.gin_rummy = gin_rummy_instance  # Instance of the game
+        self.rng = rng or random  # Random source for tie-breaking choices
+        self.knock_threshold = knock_threshold
+        self.pick_margin = pick_margin
+        self.gin_quad_policy = gin_quad_policy
+        self.tracker = None  # Optional card_tracker.CardTracker; see card_tracker.track()
         self.current_deadwood_sum = self.calculate_deadwood_sum()  # Current sum of deadwood
 
 
     # Method to calculate sum of deadwood
+    @instrument
     def calculate_deadwood_sum(self):
-        melds = identify_melds(self.hand.cards)
-        chosen_melds, non_meld_cards  = find_best_meld(melds, self.hand.cards)
-        possible_deadwood, complete_deadwood = find_possible_deadwood(non_meld_cards)
-        return sum(card_value(card) for card in possible_deadwood + complete_deadwood)
+        # Possible and complete deadwood together are every unmelded card
+        return self.hand.analysis.deadwood
     
 
     # Method to update sum of deadwood
+    @instrument
     def update_deadwood_sum(self):
         self.current_deadwood_sum = self.calculate_deadwood_sum()
 
 
-    # Method to choose a card to pick from the deck or discard pile
+    # Method to check if the top discard beats a draw from the deck. The hand's
+    # outs index holds the deadwood after drawing any card and making the best
+    # discard, so the top discard is compared with the mean over the cards the
+    # bot has not seen, each equally likely to be the next from the deck. Only
+    # a card that joins a meld is taken, so it is never discarded straight back.
+    def wants_discard(self, discard_pile):
+        outs = self.hand.analysis.outs
+        top = discard_pile[-1]
+        return outs.is_out(top) and outs.value(top) + self.pick_margin < outs.expected(self.unseen_mask(discard_pile))
+
+
+    # Method to get the mask of cards the bot has not seen: not in its hand or
+    # the discard pile, nor (with a tracker) seen picked up by the opponent
+    def unseen_mask(self, discard_pile):
+        if self.tracker is not None:
+            return self.tracker.unknown_mask()
+        seen = self.hand.mask
+        for card in discard_pile:
+            seen |= card.bit
+        return FULL_DECK & ~seen
+
+
+    # Method to choose where to draw from: 'pile' for the top discard or 'deck'.
+    # Bots that search their draw override this; choose_card_to_pick and
+    # agents.BotAgent both draw from the source it picks.
+    @instrument
+    def choose_draw_source(self, discard_pile, deck):
+        # If there are cards in the discard pile, bot checks if the top card beats a deck draw
+        if discard_pile and self.wants_discard(discard_pile):
+            return 'pile'
+        return 'deck'
+
+
+    # Method to choose a card to pick from the deck or discard pile; returns the source drawn from
+    @instrument
     def choose_card_to_pick(self, discard_pile, deck):
-        # If there are cards in the discard pile, bot checks if the top card can improve its hand
-        if discard_pile:
-            top_discard = discard_pile[-1]
-            self.hand.add_card(top_discard)
-
-            melds = identify_melds(self.hand.cards)
-            chosen_melds, non_meld_cards  = find_best_meld(melds, self.hand.cards)
-            possible_deadwood, complete_deadwood = find_possible_deadwood(non_meld_cards)
-            new_deadwood_sum = sum(card_value(card) for card in possible_deadwood + complete_deadwood)
-
-            if new_deadwood_sum < self.current_deadwood_sum:  # If the new deadwood sum is less than current, bot keeps the card
-                self.current_deadwood_sum = new_deadwood_sum
-                discard_pile.pop()
-                return
-            else:
-                self.hand.discard_card(top_discard)  # If not, bot discards the card
+        if self.choose_draw_source(discard_pile, deck) == 'pile':
+            self.hand.add_card(discard_pile.pop())
+            self.update_deadwood_sum()
+            return 'pile'
 
         # If deck is empty, reshuffle the discard pile into the deck
         if not deck.cards:
-            print("Deck is empty! Reshuffling discarded pile into the deck.")
+            if self.gin_rummy.verbose:
+                print("Deck is empty! Reshuffling discarded pile into the deck.")
             deck.cards.extend(discard_pile)
             deck.shuffle()
             discard_pile.clear()
 
         self.hand.add_card(deck.deal_card())
         self.hand.sort()  # Sort the bot's hand
+        return 'deck'
 
 
-    # Method to choose a card to discard
+    # Method to choose a card to discard, from the decision table when one is loaded
+    @instrument
     def choose_card_to_discard(self):
-        melds = identify_melds(self.hand.cards)
-        chosen_melds, non_meld_cards  = find_best_meld(melds, self.hand.cards)
-        possible_deadwood, complete_deadwood = find_possible_deadwood(non_meld_cards)
+        # The table holds tracker-free decisions at the default knock threshold,
+        # so a tracking or retuned bot always searches
+        if self.tracker is None and self.knock_threshold == KNOCK_THRESHOLD:
+            table = default_table()
+            if table is not None:
+                deadwood_mask = self.hand.analysis.deadwood_mask
+                decision = table.lookup(deadwood_mask) if deadwood_mask else None
+                if decision is not None:
+                    return decision
+        return self.search_discard()
+
+
+    # Method to search for the card to discard
+    def search_discard(self):
+        analysis = self.hand.analysis
+        possible_deadwood, complete_deadwood = analysis.possible_deadwood, analysis.complete_deadwood
 
         all_deadwood = complete_deadwood + possible_deadwood  # Sum of all deadwood
         all_deadwood.sort(key=card_value)
 
         # If there is no deadwood, bot considers to declare "gin"
         if len(all_deadwood) == 0:
-            for meld in chosen_melds:
+            for meld in analysis.chosen_melds:
                 if len(meld) > 3:
+                    if self.gin_quad_policy == 'high':
+                        return ("gin", max(meld, key=card_value))
+                    if self.gin_quad_policy == 'low':
+                        return ("gin", min(meld, key=card_value))
                     if all(card.rank == meld[0].rank for card in meld):
-                        return ("gin", random.choice(meld))
+                        return ("gin", self.rng.choice(meld))
                     else:
                         return ("gin", max(meld, key=card_value))
 
@@ -85,13 +149,27 @@ class Bot(Player):
 
         total_deadwood_score = sum(card_value(card) for card in all_deadwood[:-1])
 
-        # If total score of deadwood is less than or equal to 10, bot considers to "knock"
-        if total_deadwood_score <= 10:
+        # If total score of deadwood is at most the knock threshold, bot considers to "knock"
+        if total_deadwood_score <= self.knock_threshold:
             return ("knock", all_deadwood[-1])
 
         # If there is complete deadwood, bot discards the card with highest value
         if complete_deadwood:
-            return ("discard", max(complete_deadwood, key=card_value))
+            return ("discard", self.highest_safe_card(complete_deadwood))
 
         # If no complete deadwood, bot discards the card from possible deadwood with highest value
-        return ("discard", max(possible_deadwood, key=card_value))
+        return ("discard", self.highest_safe_card(possible_deadwood))
+
+
+    # Method to release anything the bot holds between decisions; the greedy bot holds nothing
+    def close(self):
+        pass
+
+
+    # Method to pick the highest-value card, skipping cards the tracker expects to feed the opponent's melds
+    def highest_safe_card(self, cards):
+        if self.tracker is not None:
+            safe = [card for card in cards if self.tracker.feed_risk(card) < FEED_RISK_LIMIT]
+            if safe:
+                cards = safe
+        return max(cards, key=card_value)
@@ -0,0 +1,158 @@
+import functools
+import json
+import random
+import time
+
+# Opt-in instrumentation for the game engine's hot paths
+#
+# Functions decorated with @instrument are timed only while profiling is
+# enabled; when it is off the wrapper costs a single flag check. For every
+# instrumented function the layer keeps the call count, cumulative time and a
+# bounded reservoir of call durations for percentiles, plus the self time of
+# every instrumented call stack for flame graphs.
+
+MAX_SAMPLES = 100000  # Durations kept per function for percentiles
+PERCENTILES = (50, 90, 99)
+
+enabled = False
+_stats = {}  # name -> [calls, total seconds, max seconds, samples]
+_collapsed = {}  # 'outer;inner' stack -> self seconds
+_stack = []  # Active instrumented frames: [name, seconds spent in children]
+_sampler = random.Random(0)
+
+
+# Start recording instrumented calls
+def enable():
+    global enabled
+    enabled = True
+
+
+# Stop recording instrumented calls; results recorded so far are kept
+def disable():
+    global enabled
+    enabled = False
+
+
+# Drop every recorded result
+def reset():
+    _stats.clear()
+    _collapsed.clear()
+    _stack.clear()
+
+
+# Record one finished call
+def _record(name, path, elapsed, self_time):
+    stats = _stats.get(name)
+    if stats is None:
+        stats = _stats[name] = [0, 0.0, 0.0, []]
+    stats[0] += 1
+    stats[1] += elapsed
+    if elapsed > stats[2]:
+        stats[2] = elapsed
+
+    # Reservoir sampling keeps an unbiased sample of at most MAX_SAMPLES durations
+    samples = stats[3]
+    if len(samples) < MAX_SAMPLES:
+        samples.append(elapsed)
+    else:
+        slot = _sampler.randrange(stats[0])
+        if slot < MAX_SAMPLES:
+            samples[slot] = elapsed
+
+    _collapsed[path] = _collapsed.get(path, 0.0) + self_time
+
+
+# Decorate a function so its calls are timed while profiling is enabled
+def instrument(function):
+    name = f'{function.__module__}.{function.__qualname__}'
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not enabled:
+            return function(*args, **kwargs)
+
+        frame = [name, 0.0]
+        _stack.append(frame)
+        path = ';'.join(active[0] for active in _stack)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            _stack.pop()
+            if _stack:
+                _stack[-1][1] += elapsed
+            _record(name, path, elapsed, elapsed - frame[1])
+
+    return wrapper
+
+
+# Get the recorded results as plain, picklable data for merging across processes
+def snapshot():
+    return {
+        'stats': {name: [calls, total, longest, list(samples)] for name, (calls, total, longest, samples) in _stats.items()},
+        'collapsed': dict(_collapsed),
+    }
+
+
+# Merge two reservoirs of durations, each a uniform sample of its own calls
+#
+# The merged reservoir should be a uniform sample of all the calls, so the
+# number it keeps from each side follows how many of MAX_SAMPLES calls drawn
+# from the union fall on that side, not the order the reservoirs arrive in.
+def _merge_samples(mine, mine_calls, theirs, their_calls):
+    if len(mine) + len(theirs) <= MAX_SAMPLES:
+        return mine + theirs
+    drawn = _sampler.sample(range(mine_calls + their_calls), MAX_SAMPLES)
+    from_mine = sum(1 for call in drawn if call < mine_calls)
+    from_mine = min(max(from_mine, MAX_SAMPLES - len(theirs)), len(mine))
+    return _sampler.sample(mine, from_mine) + _sampler.sample(theirs, MAX_SAMPLES - from_mine)
+
+
+# Merge results recorded elsewhere (e.g. by a worker process) into this process
+def merge(other):
+    for name, (calls, total, longest, samples) in other['stats'].items():
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = [0, 0.0, 0.0, []]
+        stats[3] = _merge_samples(stats[3], stats[0], samples, calls)
+        stats[0] += calls
+        stats[1] += total
+        stats[2] = max(stats[2], longest)
+    for path, seconds in other['collapsed'].items():
+        _collapsed[path] = _collapsed.get(path, 0.0) + seconds
+
+
+# Get the nearest-rank percentile of sorted durations
+def _percentile(ordered, percent):
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-percent * len(ordered) // 100))
+    return ordered[rank - 1]
+
+
+# Summarize the recorded calls per function, times in microseconds
+def report():
+    summary = {}
+    for name, (calls, total, longest, samples) in sorted(_stats.items()):
+        ordered = sorted(samples)
+        entry = {
+            'calls': calls,
+            'total_s': total,
+            'mean_us': total / calls * 1e6 if calls else 0.0,
+            'max_us': longest * 1e6,
+        }
+        for percent in PERCENTILES:
+            entry[f'p{percent}_us'] = _percentile(ordered, percent) * 1e6
+        summary[name] = entry
+    return summary
+
+
+# Write the report as JSON and the stacks as a flame-graph collapsed-stack file
+def dump(json_path, collapsed_path):
+    with open(json_path, 'w') as json_file:
+        json.dump(report(), json_file, indent=2)
+    with open(collapsed_path, 'w') as collapsed_file:
+        for path, seconds in sorted(_collapsed.items()):
+            # flamegraph.pl and speedscope expect integer sample weights; use microseconds
+            collapsed_file.write(f'{path} {round(seconds * 1e6)}\n')
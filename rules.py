@@ -0,0 +1,179 @@
+from card import cards_in_mask
+from hand import Hand
+from layoff import best_layoff
+from meld_engine import solve_canonical
+
+# Gin Rummy rules as a pure state machine
+#
+# A RoundState holds one round: both hands, the discard pile, the deck, the
+# seat to move and whether it must draw or discard. legal_actions() lists
+# the moves open to that seat, apply() plays one, and once a seat knocks or
+# declares gin the round is terminal and its RoundOutcome is scored with
+# layoffs, exactly as GinRummy.handle_end_game scores it. Nothing here
+# prints, prompts or formats a string, so a round can be driven in a tight
+# loop; agents.py connects agents and observers to it.
+#
+# An action is a (kind, card) pair. Draws carry the card they take when it
+# is known (the top of the discard pile) and None for the deck.
+
+DRAW_DECK = 0
+DRAW_PILE = 1
+DISCARD = 2
+KNOCK = 3  # Discard the card and knock
+GIN = 4  # Discard the card and declare gin
+ACTION_NAMES = ('draw deck', 'draw pile', 'discard', 'knock', 'gin')
+
+# Phases of a turn
+DRAW = 0
+DISCARDING = 1
+
+KNOCK_LIMIT = 10
+GIN_BONUS = 25
+UNDERCUT_BONUS = 15
+
+
+# Kind of a finished round and the points it awards, from the knocker's deadwood and the defender's after layoff
+def round_points(knocker_deadwood, opponent_deadwood):
+    if knocker_deadwood == 0:
+        return 'gin', GIN_BONUS + opponent_deadwood
+    if knocker_deadwood > KNOCK_LIMIT:
+        return None, 0
+    if knocker_deadwood < opponent_deadwood:
+        return 'knock', opponent_deadwood - knocker_deadwood
+    return 'undercut', knocker_deadwood - opponent_deadwood + UNDERCUT_BONUS
+
+
+# Result of a finished round, by seat
+class RoundOutcome:
+    def __init__(self, knocker, kind, points, knocker_deadwood, opponent_deadwood, layoff_cards):
+        self.knocker = knocker  # Seat that knocked or declared gin
+        self.kind = kind  # 'gin', 'knock' or 'undercut'
+        self.points = points
+        self.knocker_deadwood = knocker_deadwood
+        self.opponent_deadwood = opponent_deadwood  # After laying off
+        self.layoff_cards = layoff_cards
+
+    # Seat awarded the points
+    @property
+    def winner(self):
+        return 1 - self.knocker if self.kind == 'undercut' else self.knocker
+
+
+# Score a round from the knocker's deadwood and melds, laying the opponent's cards (a mask) off onto them
+def _score(knocker, knocker_deadwood, knocker_melds, opponent_mask):
+    opponent_deadwood, laid = best_layoff(knocker_melds, opponent_mask)
+    kind, points = round_points(knocker_deadwood, opponent_deadwood)
+    return RoundOutcome(knocker, kind, points, knocker_deadwood, opponent_deadwood, cards_in_mask(laid))
+
+
+# Score a round ended by the knocker's hand, laying the opponent's cards off onto it
+def score_round(knocker, knocker_hand, opponent_hand):
+    analysis = knocker_hand.analysis
+    return _score(knocker, analysis.deadwood, analysis.meld_masks, opponent_hand.mask)
+
+
+# Score a round from hand masks, exactly as score_round scores the same hands
+def score_masks(knocker, knocker_mask, opponent_mask):
+    knocker_deadwood, knocker_melds = solve_canonical(knocker_mask)
+    return _score(knocker, knocker_deadwood, knocker_melds, opponent_mask)
+
+
+class RoundState:
+    # Start a round on a deck (see deck.SeededDeck); call deal() before playing
+    def __init__(self, deck, first=0, hands=None):
+        self.deck = deck
+        self.hands = hands or [Hand(), Hand()]
+        self.discard_pile = []
+        self.to_move = first  # Seat whose turn it is
+        self.phase = DRAW
+        self.turns = 0  # Completed turns
+        self.outcome = None  # RoundOutcome once the round is over
+        self.reshuffles = 0
+
+    # Deal ten cards to each seat from the deck's next deal
+    def deal(self):
+        self.deck.reset()
+        for hand, cards in zip(self.hands, self.deck.deal_hands(2, 10)):
+            for card in cards:
+                hand.add_card(card)
+
+    @property
+    def terminal(self):
+        return self.outcome is not None
+
+    # Every action open to the seat to move
+    def legal_actions(self):
+        if self.outcome is not None:
+            return []
+        if self.phase == DRAW:
+            actions = [(DRAW_DECK, None)]
+            if self.discard_pile:
+                actions.append((DRAW_PILE, self.discard_pile[-1]))
+            return actions
+
+        hand = self.hands[self.to_move]
+        actions = []
+        for card in hand.cards:
+            actions.append((DISCARD, card))
+            hand.discard_card(card)
+            deadwood = hand.analysis.deadwood
+            hand.add_card(card)
+            if deadwood <= KNOCK_LIMIT:
+                actions.append((KNOCK, card))
+            if deadwood == 0:
+                actions.append((GIN, card))
+        return actions
+
+    # Whether an action is open to the seat to move
+    def is_legal(self, action):
+        kind, card = action
+        if self.outcome is not None:
+            return False
+        if self.phase == DRAW:
+            if kind == DRAW_DECK:
+                return True
+            return kind == DRAW_PILE and bool(self.discard_pile) and card in (None, self.discard_pile[-1])
+        hand = self.hands[self.to_move]
+        if kind not in (DISCARD, KNOCK, GIN) or card is None or card not in hand:
+            return False
+        if kind == DISCARD:
+            return True
+        hand.discard_card(card)
+        deadwood = hand.analysis.deadwood
+        hand.add_card(card)
+        return deadwood == 0 if kind == GIN else deadwood <= KNOCK_LIMIT
+
+    # Play an action for the seat to move; returns the card drawn or discarded
+    def apply(self, action):
+        if not self.is_legal(action):
+            raise ValueError(f'illegal action {action!r}')
+        kind, card = action
+        hand = self.hands[self.to_move]
+
+        if kind == DRAW_PILE:
+            card = self.discard_pile.pop()
+            hand.add_card(card)
+            self.phase = DISCARDING
+            return card
+        if kind == DRAW_DECK:
+            deck = self.deck
+            if not deck.cards:
+                # The deck ran out: the discard pile is shuffled back into it
+                deck.cards.extend(self.discard_pile)
+                deck.shuffle()
+                self.discard_pile.clear()
+                self.reshuffles += 1
+            card = deck.deal_card()
+            hand.add_card(card)
+            self.phase = DISCARDING
+            return card
+
+        hand.discard_card(card)
+        self.discard_pile.append(card)
+        self.turns += 1
+        if kind == DISCARD:
+            self.to_move = 1 - self.to_move
+            self.phase = DRAW
+        else:
+            self.outcome = score_round(self.to_move, hand, self.hands[1 - self.to_move])
+        return card
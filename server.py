@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import random
+
+from card import Card
+from gin_rummy import GinRummy
+from hand import Hand
+from player import Bot
+from simulation import TARGET_SCORE
+
+# Asyncio server for many concurrent human-vs-bot tables
+#
+# Every TCP connection gets its own table: a GinRummy game with the console
+# game's rules, scoring and layoff, driven by commands instead of input().
+# The client sends one command per line and the server answers with one JSON
+# object per line. Commands:
+#
+#     draw deck | draw pile            draw a card
+#     discard CARD                     discard a card, e.g. 'discard QH'
+#     knock CARD | gin CARD            discard a card and knock or declare gin
+#     state                            resend the table state
+#     new                              start a new match once one is over
+#     quit                             close the table
+#
+# Messages have an "event" key: "state" (the player's view of the table and
+# whose move it is), "bot" (the bot's draw and discard), "round" (a round's
+# result), "match" (the winner once a player reaches the target) and "error".
+#
+# The bot's moves run in an executor, so a slow decision on one table never
+# stalls the event loop serving the others. Each table handles one command
+# at a time, so the game is never touched by two threads at once.
+#
+# Serve from the repository root, then connect with e.g. `nc localhost 7777`:
+#     python server.py --port 7777
+
+DRAW = 'draw'  # The player's move: draw a card
+DISCARD = 'discard'  # The player's move: discard a card
+BOT = 'bot'  # The bot is moving
+OVER = 'over'  # The match is over
+
+
+class TableError(Exception):
+    pass
+
+
+# Parse a card name such as 'QH' or '10S'
+def parse_card(name):
+    try:
+        return Card(name[:-1].upper(), name[-1:].upper())
+    except ValueError:
+        raise TableError(f'unknown card: {name}') from None
+
+
+def _names(cards):
+    return [repr(card) for card in cards]
+
+
+# One human-vs-bot game, advanced by the player's commands and the bot's turns
+class Table:
+    def __init__(self, seed=None, target=TARGET_SCORE):
+        rng = random.Random(seed)
+        self.game = GinRummy(verbose=False, rng=rng)
+        self.game.set_bot(Bot(self.game, rng))
+        self.target = target
+        self._view = None  # (hand mask, hand names, meld names, deadwood) of the player's last state
+        self.new_match()
+
+    # Reset the scores and deal the first round
+    def new_match(self):
+        self.game.player.score = 0
+        self.game.bot.score = 0
+        self.start_round()
+
+    # Deal a new round, with the player to move first as in the console game
+    def start_round(self):
+        game = self.game
+        game.game_ended = False
+        game.player_knocked = False
+        game.player.hand = Hand()
+        game.bot.hand = Hand()
+        game.discard_pile = []
+        game.deal_initial_hands()
+        self.phase = DRAW
+
+    # Raise a TableError unless the table is waiting for the given move
+    def expect(self, phase):
+        if self.phase != phase:
+            raise TableError(f'cannot do that now; waiting for {self.phase}')
+
+    # The player draws from the deck or the discard pile
+    def draw(self, source):
+        self.expect(DRAW)
+        game = self.game
+        if source == 'pile':
+            if not game.discard_pile:
+                raise TableError('the discard pile is empty')
+            card = game.discard_pile.pop()
+        elif source == 'deck':
+            if not game.deck.cards:
+                game.notify('on_reshuffle', list(game.discard_pile))
+                game.deck.cards.extend(game.discard_pile)
+                game.deck.shuffle()
+                game.discard_pile.clear()
+            card = game.deck.deal_card()
+        else:
+            raise TableError("draw from 'deck' or 'pile'")
+        game.player.hand.add_card(card)
+        game.notify('on_draw', game.player, card, source == 'pile')
+        self.phase = DISCARD
+
+    # The player discards a card, optionally knocking or declaring gin; returns the round result if it ended
+    def discard(self, card, action='discard'):
+        self.expect(DISCARD)
+        game = self.game
+        hand = game.player.hand
+        if card not in hand:
+            raise TableError(f'{card} is not in your hand')
+
+        hand.discard_card(card)
+        if (action == 'knock' and not game.is_valid_knock(hand)) or (action == 'gin' and not game.is_gin(hand)):
+            hand.add_card(card)
+            raise TableError(f'not a valid {action}')
+        game.discard_pile.append(card)
+        game.notify('on_discard', game.player, card)
+
+        if action == 'discard':
+            self.phase = BOT
+            return None
+        game.player_knocked = True
+        game.game_ended = True
+        return self.end_round()
+
+    # Play the bot's turn; returns (its move, the round result if it ended). Runs in an executor.
+    def bot_turn(self):
+        self.expect(BOT)
+        game, bot = self.game, self.game.bot
+        bot.update_deadwood_sum()
+        source = game.agent_draw(bot)
+
+        action, card = bot.choose_card_to_discard()
+        bot.hand.discard_card(card)
+        game.discard_pile.append(card)
+        game.notify('on_discard', bot, card)
+        move = {'event': 'bot', 'draw': source, 'discard': repr(card), 'action': 'discard'}
+
+        if (action == 'knock' and game.is_valid_knock(bot.hand)) or (action == 'gin' and game.is_gin(bot.hand)):
+            move['action'] = action
+            game.player_knocked = False
+            game.game_ended = True
+            return move, self.end_round()
+        self.phase = DRAW
+        return move, None
+
+    # Score the round, then deal the next one unless the match is over; returns the round result message
+    def end_round(self):
+        game = self.game
+        bot_hand = _names(game.bot.hand.cards)
+        result = game.handle_end_game()
+        message = {
+            'event': 'round',
+            'kind': result.kind,
+            'knocker': 'player' if result.knocker is game.player else 'bot',
+            'winner': 'player' if result.winner is game.player else 'bot',
+            'points': result.points,
+            'knocker_deadwood': result.knocker_deadwood,
+            'opponent_deadwood': result.opponent_deadwood,
+            'layoff': _names(result.layoff_cards),
+            'bot_hand': bot_hand,
+            'scores': self.scores(),
+        }
+        if max(game.player.score, game.bot.score) >= self.target:
+            self.phase = OVER
+        else:
+            self.start_round()
+        return message
+
+    def scores(self):
+        return {'player': self.game.player.score, 'bot': self.game.bot.score}
+
+    # The player's view of the table, with the player assist; the hand's part is only rebuilt after it changes
+    def state(self):
+        game = self.game
+        hand = game.player.hand
+        if self._view is None or self._view[0] != hand.mask:
+            analysis = hand.analysis
+            self._view = (hand.mask, _names(hand.cards), [_names(meld) for meld in analysis.chosen_melds],
+                          analysis.deadwood)
+        _, hand_names, meld_names, deadwood = self._view
+        return {
+            'event': 'state',
+            'phase': self.phase,
+            'hand': hand_names,
+            'melds': meld_names,
+            'deadwood': deadwood,
+            'discard_pile': _names(game.discard_pile),
+            'deck': len(game.deck.cards),
+            'scores': self.scores(),
+        }
+
+    # The match result message
+    def match_result(self):
+        scores = self.scores()
+        return {'event': 'match', 'winner': max(scores, key=scores.get), 'scores': scores}
+
+
+# Serves one table per connection
+class GameServer:
+    def __init__(self, executor=None, seed=None, target=TARGET_SCORE):
+        self.executor = executor  # None uses the event loop's default executor
+        self.seed = seed  # Table n is seeded with seed + n, or randomly without a seed
+        self.target = target
+        self.tables = 0  # Tables opened so far
+        self.open_tables = 0
+
+    # Run one command on a table and return the messages to send back
+    async def command(self, table, words):
+        if not words:
+            raise TableError('empty command')
+        verb, args = words[0].lower(), words[1:]
+        messages = []
+        if verb == 'state':
+            return [table.state()]
+        if verb == 'new':
+            table.expect(OVER)
+            table.new_match()
+            return [table.state()]
+        if verb == 'draw':
+            table.draw(args[0].lower() if args else '')
+            return [table.state()]
+        if verb not in ('discard', 'knock', 'gin'):
+            raise TableError(f'unknown command: {verb}')
+        if len(args) != 1:
+            raise TableError(f'usage: {verb} CARD')
+
+        result = table.discard(parse_card(args[0]), verb)
+        if result is not None:
+            messages.append(result)
+        elif table.phase == BOT:
+            move, result = await asyncio.get_running_loop().run_in_executor(self.executor, table.bot_turn)
+            messages.append(move)
+            if result is not None:
+                messages.append(result)
+        if table.phase == OVER:
+            messages.append(table.match_result())
+        messages.append(table.state())
+        return messages
+
+    # Serve one connection
+    async def handle(self, reader, writer):
+        seed = None if self.seed is None else self.seed + self.tables
+        self.tables += 1
+        self.open_tables += 1
+        table = Table(seed, self.target)
+        try:
+            writer.write(json.dumps(table.state()).encode() + b'\n')
+            await writer.drain()
+            while True:
+                line = await reader.readline()
+                words = line.decode(errors='replace').split()
+                if not line or words and words[0].lower() == 'quit':
+                    break
+                try:
+                    messages = await self.command(table, words)
+                except TableError as error:
+                    messages = [{'event': 'error', 'message': str(error)}]
+                writer.write(b''.join(json.dumps(message).encode() + b'\n' for message in messages))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.open_tables -= 1
+            writer.close()
+
+    # Start listening; returns the asyncio server
+    async def start(self, host='127.0.0.1', port=7777, backlog=4096):
+        return await asyncio.start_server(self.handle, host, port, backlog=backlog)
+
+
+async def serve(host, port, workers, seed):
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        server = await GameServer(executor, seed).start(host, port)
+        print(f"serving on {', '.join(str(sock.getsockname()) for sock in server.sockets)}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Host human-vs-bot tables over a line-oriented TCP protocol.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--workers', type=int, default=None, help='threads running bot moves')
+    parser.add_argument('--seed', type=int, default=None, help='seed table n with seed + n for reproducible deals')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.seed))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
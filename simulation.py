@@ -0,0 +1,134 @@
+import argparse
+import random
+import time
+
+import profiling
+from agents import DEFAULT_MAX_TURNS, BotAgent
+from gin_rummy import GinRummy
+from player import Bot
+
+# Headless bot-vs-bot simulation
+#
+# HeadlessGinRummy drives two Bot-style agents through full rounds on the
+# same round driver as the console game (agents.play_round on the rules.py
+# state machine), so the same rules, scoring and layoff, but without any
+# console I/O. An agent is built by a factory called as factory(game, rng)
+# and must provide update_deadwood_sum(), choose_draw_source(discard_pile,
+# deck) and choose_card_to_discard() like player.Bot.
+
+TARGET_SCORE = 100
+# A match with no winner after this many rounds ends on the current scores
+DEFAULT_MAX_ROUNDS = 200
+
+
+# Structured outcome of one headless match. Per-seat lists are ordered
+# (first player, second player); the first player starts every round.
+class MatchResult:
+    def __init__(self, seed):
+        self.seed = seed
+        self.winner = None  # 0, 1 or None for a tie
+        self.scores = [0, 0]
+        self.rounds = 0
+        self.dead_rounds = 0  # Rounds abandoned after the turn limit
+        self.turns = 0
+        self.knocks = [0, 0]  # Rounds won by knocking
+        self.gins = [0, 0]  # Rounds won by declaring gin
+        self.undercuts = [0, 0]  # Rounds won by undercutting the knocker
+
+    # Convert the result to a plain dictionary
+    def to_dict(self):
+        return dict(vars(self))
+
+
+class HeadlessGinRummy(GinRummy):
+    # Initialize a silent game with its own seeded random sources and two agents
+    def __init__(self, seed=None, agents=(Bot, Bot), max_turns=DEFAULT_MAX_TURNS):
+        rng = random.Random(seed)
+        super().__init__(verbose=False, rng=rng, seed=0)
+        self.max_turns = max_turns
+        self.player = agents[0](self, rng)
+        self.bot = agents[1](self, rng)
+        self.reset(seed)
+
+    # Reseed the game so the next match is the one played from this seed. The
+    # agents' random source is reseeded too, but the deck has its own, so
+    # round n of the match is dealt the same whatever the agents draw.
+    def reset(self, seed):
+        self.seed = seed
+        self.rng.seed(seed)
+        self.deck.reseed(self.rng.getrandbits(32) if seed is None else seed)
+
+    # Release what the agents hold, such as a Monte Carlo bot's worker pool
+    def close(self):
+        self.player.close()
+        self.bot.close()
+
+    # Play a single round; returns (RoundResult or None for a dead round, turns taken)
+    def play_round(self):
+        return self.play_agents_round((BotAgent(self.player), BotAgent(self.bot)), max_turns=self.max_turns)
+
+    # Play rounds until a player reaches the target score
+    def play_match(self, target=TARGET_SCORE, max_rounds=DEFAULT_MAX_ROUNDS):
+        result = MatchResult(self.seed)
+        self.player.score = 0
+        self.bot.score = 0
+        seats = (self.player, self.bot)
+
+        while self.player.score < target and self.bot.score < target and result.rounds < max_rounds:
+            round_result, turns = self.play_round()
+            result.rounds += 1
+            result.turns += turns
+            if round_result is None:
+                result.dead_rounds += 1
+                continue
+
+            winner = seats.index(round_result.winner)
+            if round_result.kind == 'gin':
+                result.gins[winner] += 1
+            elif round_result.kind == 'knock':
+                result.knocks[winner] += 1
+            elif round_result.kind == 'undercut':
+                result.undercuts[winner] += 1
+
+        result.scores = [self.player.score, self.bot.score]
+        if self.player.score != self.bot.score:
+            result.winner = 0 if self.player.score > self.bot.score else 1
+        return result
+
+
+# Play one seeded headless match and return its MatchResult
+def play_match(seed, agents=(Bot, Bot), target=TARGET_SCORE, max_turns=DEFAULT_MAX_TURNS):
+    return HeadlessGinRummy(seed, agents, max_turns).play_match(target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play headless bot-vs-bot matches.')
+    parser.add_argument('--matches', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first match; match i uses seed + i')
+    parser.add_argument('--profile', metavar='PREFIX',
+                        help='instrument the engine and write PREFIX.json and PREFIX.collapsed')
+    args = parser.parse_args()
+
+    if args.profile:
+        profiling.enable()
+
+    wins = [0, 0]
+    rounds = turns = 0
+    start = time.perf_counter()
+    for i in range(args.matches):
+        result = play_match(args.seed + i)
+        if result.winner is not None:
+            wins[result.winner] += 1
+        rounds += result.rounds
+        turns += result.turns
+    elapsed = time.perf_counter() - start
+
+    print(f'{args.matches} matches, {rounds} rounds, {turns} turns in {elapsed:.2f}s')
+    print(f'wins: first player {wins[0]}, second player {wins[1]}')
+    print(f'{rounds / elapsed * 3600:,.0f} hands/hour')
+    if args.profile:
+        profiling.dump(f'{args.profile}.json', f'{args.profile}.collapsed')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+import argparse
+import itertools
+import math
+import multiprocessing
+import os
+import random
+import time
+from functools import partial
+
+from player import KNOCK_THRESHOLD, PICK_MARGIN, Bot
+from simulation import DEFAULT_MAX_TURNS, TARGET_SCORE, HeadlessGinRummy
+from tournament import mean_interval
+
+# Parameter sweep over the bot's strategy constants
+#
+# A configuration is a dict of keyword arguments for player.Bot. Each one is
+# scored against the default bot on duplicate deals: deal i is the match
+# played from seed base_seed + i, once from each seat, and its score is the
+# configuration's points minus the default bot's over both matches. Every
+# configuration plays the same deals (common random numbers), so the luck of
+# the cards cancels out of the comparison between configurations and far
+# fewer deals separate them than with independent seeds.
+#
+# Deals are split into fixed-size chunks played across a process pool, and
+# chunk totals are integers, so scores do not depend on the worker count.
+#
+# Grid and random search play every configuration on the same number of
+# deals. Successive halving plays all of them on a few deals, keeps the best
+# 1/eta, plays the survivors on eta times as many deals (reusing the deals
+# already played), and repeats until one is left.
+#
+# Run from the repository root:
+#     python sweep.py halving --min-deals 8 --eta 3
+
+# Levels searched for each parameter; the defaults are among them. The gin
+# quad policy is left out: the card discarded when going gin never changes
+# the round's score, so it would only multiply the grid.
+SPACE = {
+    'knock_threshold': (0, 2, 4, 6, 8, KNOCK_THRESHOLD),
+    'pick_margin': (-2.0, -1.0, PICK_MARGIN, 1.0, 2.0, 4.0),
+}
+DEFAULTS = {'knock_threshold': KNOCK_THRESHOLD, 'pick_margin': PICK_MARGIN}
+DEFAULT_CHUNK_SIZE = 10  # Deals per task
+
+
+# Every configuration of a space, in grid order
+def grid_configurations(space=SPACE):
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*space.values())]
+
+
+# Distinct configurations drawn at random from a space
+def random_configurations(count, rng, space=SPACE):
+    grid = grid_configurations(space)
+    return rng.sample(grid, min(count, len(grid)))
+
+
+# Short label for a configuration
+def describe(config):
+    return ' '.join(f'{name}={value}' for name, value in config.items())
+
+
+# Integer totals of a configuration's duplicate deals against the default bot
+class SweepScore:
+    def __init__(self, config):
+        self.config = config
+        self.deals = 0
+        self.points = 0  # Sum over deals of the configuration's points minus the default bot's
+        self.points_squared = 0
+        self.wins = 0  # Matches won, out of two per deal
+        self.losses = 0
+
+    # Add another group's totals of the same configuration
+    def merge(self, other):
+        self.deals += other.deals
+        self.points += other.points
+        self.points_squared += other.points_squared
+        self.wins += other.wins
+        self.losses += other.losses
+
+    # Mean point margin per deal and its 95% half-width
+    @property
+    def margin(self):
+        return mean_interval(self.points, self.points_squared, self.deals)
+
+    @property
+    def win_rate(self):
+        return self.wins / (2 * self.deals) if self.deals else 0.0
+
+
+# Play deals [start, stop) of a configuration from both seats; returns (configuration index, SweepScore)
+def _play_deals(task):
+    index, config, base_seed, start, stop, target, max_turns = task
+    candidate = partial(Bot, **config)
+    games = (HeadlessGinRummy(None, (candidate, Bot), max_turns), HeadlessGinRummy(None, (Bot, candidate), max_turns))
+    score = SweepScore(config)
+    for deal in range(start, stop):
+        points = 0
+        for seat, game in enumerate(games):
+            game.reset(base_seed + deal)
+            result = game.play_match(target)
+            game.close()
+            points += result.scores[seat] - result.scores[1 - seat]
+            if result.winner == seat:
+                score.wins += 1
+            elif result.winner is not None:
+                score.losses += 1
+        score.deals += 1
+        score.points += points
+        score.points_squared += points * points
+    return index, score
+
+
+# Runs sweeps on one process pool, created on first use and released by close()
+class Sweep:
+    def __init__(self, workers=None, seed=0, target=TARGET_SCORE, max_turns=DEFAULT_MAX_TURNS,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.seed = seed
+        self.target = target
+        self.max_turns = max_turns
+        self.chunk_size = chunk_size
+        self.deals_played = 0  # Deals played by all configurations together
+        self._pool = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Play deals [start, stop) for every score, merging the totals in place
+    def evaluate(self, scores, start, stop):
+        tasks = [(index, score.config, self.seed, chunk, min(chunk + self.chunk_size, stop), self.target, self.max_turns)
+                 for index, score in enumerate(scores) for chunk in range(start, stop, self.chunk_size)]
+        if self.workers == 1:
+            results = map(_play_deals, tasks)
+        else:
+            if self._pool is None:
+                # Forked workers inherit the imported modules and the precomputed meld tables
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+                self._pool = context.Pool(self.workers)
+            results = self._pool.imap(_play_deals, tasks)
+        for index, chunk_score in results:
+            scores[index].merge(chunk_score)
+        self.deals_played += max(stop - start, 0) * len(scores)
+
+    # Score every configuration on the same deals; returns SweepScores, best first
+    def search(self, configs, deals):
+        scores = [SweepScore(config) for config in configs]
+        self.evaluate(scores, 0, deals)
+        return ranked(scores)
+
+    # Successive halving from min_deals deals per configuration; returns the
+    # SweepScores, best first, survivors of later rungs ahead of those dropped
+    def halving(self, configs, min_deals, eta=3, max_deals=None):
+        alive = [SweepScore(config) for config in configs]
+        dropped = []
+        deals = 0
+        rung_deals = min_deals
+        while True:
+            if max_deals is not None:
+                rung_deals = min(rung_deals, max_deals)
+            self.evaluate(alive, deals, rung_deals)
+            deals = rung_deals
+            alive = ranked(alive)
+            if len(alive) == 1 or deals == max_deals:
+                return alive + dropped
+            keep = max(1, math.ceil(len(alive) / eta))
+            dropped = alive[keep:] + dropped
+            alive = alive[:keep]
+            rung_deals *= eta
+
+
+# Scores sorted by mean point margin, best first; ties keep their order
+def ranked(scores):
+    return sorted(scores, key=lambda score: -score.margin[0])
+
+
+def print_scores(scores, limit):
+    for score in scores[:limit]:
+        mean, half_width = score.margin
+        print(f'{mean:+7.2f} +/- {half_width:5.2f} points/deal, win rate {score.win_rate:.3f} '
+              f'over {score.deals:>4} deals: {describe(score.config)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Search the bot strategy parameters by self-play.')
+    parser.add_argument('method', choices=('grid', 'random', 'halving'))
+    parser.add_argument('--deals', type=int, default=100, help='deals per configuration for grid and random search')
+    parser.add_argument('--samples', type=int, default=20, help='configurations drawn by random search')
+    parser.add_argument('--min-deals', type=int, default=8, help='deals per configuration in the first halving rung')
+    parser.add_argument('--max-deals', type=int, default=None, help='cap on deals per configuration when halving')
+    parser.add_argument('--eta', type=int, default=3, help='halving keeps 1/eta of the configurations per rung')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=0, help='deal i is played from seed + i')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='deals per task')
+    parser.add_argument('--top', type=int, default=10, help='configurations to print')
+    args = parser.parse_args()
+
+    if args.method == 'random':
+        configs = random_configurations(args.samples, random.Random(args.seed))
+    else:
+        configs = grid_configurations()
+
+    start = time.perf_counter()
+    with Sweep(args.workers, args.seed, chunk_size=args.chunk_size) as sweep:
+        if args.method == 'halving':
+            scores = sweep.halving(configs, args.min_deals, args.eta, args.max_deals)
+        else:
+            scores = sweep.search(configs, args.deals)
+    elapsed = time.perf_counter() - start
+
+    print_scores(scores, args.top)
+    best = scores[0]
+    # A grid giving every configuration the deals the winner played
+    naive = best.deals * len(configs)
+    print(f'{len(configs)} configurations, {sweep.deals_played} deals ({2 * sweep.deals_played} matches) '
+          f'in {elapsed:.1f}s; the same deals for every configuration would take {naive} '
+          f'({sweep.deals_played / naive:.0%})')
+    default = describe(DEFAULTS)
+    print(f"best: {describe(best.config)}{' (the defaults)' if describe(best.config) == default else ''}")
+
+
+if __name__ == '__main__':
+    main()
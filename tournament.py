@@ -0,0 +1,238 @@
+import argparse
+import math
+import multiprocessing
+import os
+import time
+
+import profiling
+from game_log import GameLogWriter, GameRecorder
+from player import Bot
+from simulation import DEFAULT_MAX_TURNS, TARGET_SCORE, HeadlessGinRummy
+
+# Multi-core tournament runner
+#
+# Match i of a tournament is always played from seed base_seed + i. Matches
+# are grouped into fixed-size chunks that do not depend on the number of
+# workers, each chunk is reduced to integer totals in a worker, and the
+# parent merges chunk totals in chunk order. The merged statistics are
+# therefore identical whatever the worker count. With a log path, every
+# worker also records its chunk's events (see game_log.py), and the parent
+# appends the chunks to the log in chunk order.
+
+DEFAULT_CHUNK_SIZE = 50
+Z_95 = 1.959963984540054
+
+
+# Integer totals over a group of matches, mergeable in any grouping
+class TournamentStats:
+    def __init__(self):
+        self.matches = 0
+        self.ties = 0
+        self.rounds = 0
+        self.dead_rounds = 0
+        self.turns = 0
+        self.wins = [0, 0]
+        self.points = [0, 0]  # Sum of final match scores per seat
+        self.points_squared = [0, 0]  # Sum of squared final match scores per seat
+        self.knocks = [0, 0]
+        self.gins = [0, 0]
+        self.undercuts = [0, 0]
+
+    # Add one MatchResult to the totals
+    def add(self, result):
+        self.matches += 1
+        self.rounds += result.rounds
+        self.dead_rounds += result.dead_rounds
+        self.turns += result.turns
+        if result.winner is None:
+            self.ties += 1
+        else:
+            self.wins[result.winner] += 1
+        for seat in (0, 1):
+            self.points[seat] += result.scores[seat]
+            self.points_squared[seat] += result.scores[seat] ** 2
+            self.knocks[seat] += result.knocks[seat]
+            self.gins[seat] += result.gins[seat]
+            self.undercuts[seat] += result.undercuts[seat]
+
+    # Merge another group's totals into these
+    def merge(self, other):
+        for name, value in vars(other).items():
+            if isinstance(value, list):
+                mine = getattr(self, name)
+                for seat in (0, 1):
+                    mine[seat] += value[seat]
+            else:
+                setattr(self, name, getattr(self, name) + value)
+
+    # Win rate, points per game and 95% confidence intervals for each seat
+    def summary(self):
+        seats = []
+        for seat in (0, 1):
+            low, high = wilson_interval(self.wins[seat], self.matches)
+            mean, half_width = mean_interval(self.points[seat], self.points_squared[seat], self.matches)
+            seats.append({
+                'win_rate': self.wins[seat] / self.matches if self.matches else 0.0,
+                'win_rate_ci': (low, high),
+                'points_per_game': mean,
+                'points_per_game_ci': (mean - half_width, mean + half_width),
+                'knocks': self.knocks[seat],
+                'gins': self.gins[seat],
+                'undercuts': self.undercuts[seat],
+            })
+        return {
+            'matches': self.matches,
+            'ties': self.ties,
+            'rounds': self.rounds,
+            'dead_rounds': self.dead_rounds,
+            'turns': self.turns,
+            'seats': seats,
+        }
+
+
+# Wilson score interval for a binomial proportion
+def wilson_interval(successes, trials, z=Z_95):
+    if not trials:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return centre - half_width, centre + half_width
+
+
+# Mean and normal-approximation half-width from a sum and a sum of squares
+def mean_interval(total, total_squared, count, z=Z_95):
+    if not count:
+        return 0.0, 0.0
+    mean = total / count
+    if count < 2:
+        return mean, 0.0
+    variance = max(total_squared - total * total / count, 0) / (count - 1)
+    return mean, z * math.sqrt(variance / count)
+
+
+# Split matches [0, matches) into fixed-size (start, stop) chunks
+def make_chunks(matches, chunk_size):
+    return [(start, min(start + chunk_size, matches)) for start in range(0, matches, chunk_size)]
+
+
+# Game object reused by every match a worker plays
+_worker_game = None
+_worker_target = TARGET_SCORE
+_worker_recorder = None
+
+
+# Build the worker's game once, so matches only reseed and reshuffle it
+def _init_worker(agents, target, max_turns, profile, log=False):
+    global _worker_game, _worker_target, _worker_recorder
+    _worker_game = HeadlessGinRummy(None, agents, max_turns)
+    _worker_target = target
+    _worker_recorder = None
+    if log:
+        _worker_recorder = GameRecorder()
+        _worker_game.add_listener(_worker_recorder)
+    if profile:
+        profiling.enable()
+
+
+# Play one chunk of matches and reduce it to totals, plus the chunk's profile
+# and log records if enabled
+def _play_chunk(task):
+    base_seed, start, stop = task
+    stats = TournamentStats()
+    for index in range(start, stop):
+        _worker_game.reset(base_seed + index)
+        if _worker_recorder is not None:
+            _worker_recorder.start_match(index)
+        stats.add(_worker_game.play_match(_worker_target))
+
+    profile = None
+    if profiling.enabled:
+        profile = profiling.snapshot()
+        profiling.reset()
+    log = _worker_recorder.take() if _worker_recorder is not None else None
+    return stats, profile, log
+
+
+# Run a tournament and return the merged TournamentStats. With profile=True
+# every worker's instrumentation is merged into this process's profiling data;
+# with a log_path every match's events are written to that game log.
+def run_tournament(matches, workers=None, seed=0, agents=(Bot, Bot), target=TARGET_SCORE,
+                   max_turns=DEFAULT_MAX_TURNS, chunk_size=DEFAULT_CHUNK_SIZE, profile=False, log_path=None):
+    workers = workers or os.cpu_count() or 1
+    tasks = [(seed, start, stop) for start, stop in make_chunks(matches, chunk_size)]
+    initargs = (agents, target, max_turns, profile, log_path is not None)
+    stats = TournamentStats()
+    profiles = []
+    log = GameLogWriter(log_path, seed) if log_path is not None else None
+
+    # Merge one chunk's results, in chunk order
+    def collect(result):
+        chunk_stats, chunk_profile, chunk_log = result
+        stats.merge(chunk_stats)
+        profiles.append(chunk_profile)
+        if log is not None:
+            log.write(chunk_log)
+
+    try:
+        if workers == 1:
+            was_enabled = profiling.enabled
+            _init_worker(*initargs)
+            for task in tasks:
+                collect(_play_chunk(task))
+            if not was_enabled:
+                profiling.disable()
+        else:
+            # Forked workers inherit the imported modules and the precomputed meld tables
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            with context.Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+                for result in pool.imap(_play_chunk, tasks):
+                    collect(result)
+    finally:
+        if log is not None:
+            log.close()
+
+    for chunk_profile in profiles:
+        if chunk_profile is not None:
+            profiling.merge(chunk_profile)
+    return stats
+
+
+# Print a tournament summary
+def print_summary(summary, elapsed):
+    print(f"{summary['matches']} matches ({summary['ties']} ties), {summary['rounds']} rounds "
+          f"({summary['dead_rounds']} dead), {summary['turns']} turns in {elapsed:.2f}s")
+    for seat, name in enumerate(('first player', 'second player')):
+        stats = summary['seats'][seat]
+        low, high = stats['win_rate_ci']
+        points_low, points_high = stats['points_per_game_ci']
+        print(f"{name}: win rate {stats['win_rate']:.3f} [{low:.3f}, {high:.3f}], "
+              f"points/game {stats['points_per_game']:.1f} [{points_low:.1f}, {points_high:.1f}], "
+              f"knocks {stats['knocks']}, gins {stats['gins']}, undercuts {stats['undercuts']}")
+    if elapsed:
+        print(f"{summary['matches'] / elapsed:,.1f} matches/s, {summary['rounds'] / elapsed * 3600:,.0f} hands/hour")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a seeded bot-vs-bot tournament across a process pool.')
+    parser.add_argument('--matches', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=0, help='match i is played from seed + i')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='matches per task')
+    parser.add_argument('--profile', metavar='PREFIX',
+                        help='instrument the engine and write PREFIX.json and PREFIX.collapsed')
+    parser.add_argument('--log', metavar='PATH', help='record every event to a binary game log')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = run_tournament(args.matches, args.workers, args.seed, chunk_size=args.chunk_size,
+                           profile=bool(args.profile), log_path=args.log)
+    print_summary(stats.summary(), time.perf_counter() - start)
+    if args.profile:
+        profiling.dump(f'{args.profile}.json', f'{args.profile}.collapsed')
+
+
+if __name__ == '__main__':
+    main()